@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+需求文档预处理：章节哈希和内容寻址的图片缓存
+清洗需求（clean-requirement）前运行：把需求目录下的markdown按标题拆成章节，计算每个章节的哈希
+（章节文本 + 其中引用图片的内容哈希），与上一次预处理的记录比较，报告哪些章节是新增/修改的，
+清洗时只需重新处理这些章节。
+
+图片（.assets/下的截图等）按内容的SHA-256缓存：多个需求中相同的图片只处理、保存一次。
+缓存中保存的是派生文件：安装了Pillow时为缩小到最长边不超过1600像素的PNG，否则为原图的副本；
+同时记录宽高等信息。没变化的图片（大小和修改时间与上次相同）不再重新读取计算哈希。
+缓存总大小有上限，超出时按最近使用时间淘汰（LRU，命中时更新文件的修改时间）。
+
+用法：
+    python asset_cache.py <需求目录或requirements目录>... [--json] [--cache-dir 目录] [--cache-size 256]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+from urllib.parse import unquote
+
+from result_cache import atomic_copy, file_digest
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'requirement-assets')
+DEFAULT_MAX_MB = 256
+MAX_IMAGE_SIDE = 1600
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+FENCE_RE = re.compile(r'^\s*(```|~~~)')
+IMAGE_RE = re.compile(r'!\[[^\]]*\]\(\s*<?([^)>]+?)>?(?:\s+"[^"]*")?\s*\)'
+                      r'|<img\b[^>]*?\bsrc\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def split_sections(text):
+    """
+    按标题行拆分markdown（代码块中的#不算标题；第一个标题之前的内容为标题为空的章节）
+
+    Args:
+        text: markdown文本
+
+    Returns:
+        章节列表，每项为(标题, 级别, 起始行号, 文本)
+    """
+    sections = []
+    title, level, start, lines = '', 0, 1, []
+    in_fence = False
+    for line_no, line in enumerate(text.splitlines(), 1):
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_RE.match(line)
+        if match:
+            if lines and (title or any(l.strip() for l in lines)):
+                sections.append((title, level, start, '\n'.join(lines)))
+            title, level, start, lines = match.group(2), len(match.group(1)), line_no, []
+        lines.append(line)
+    if lines and (title or any(l.strip() for l in lines)):
+        sections.append((title, level, start, '\n'.join(lines)))
+    return sections
+
+
+def image_refs(section_text, base_dir):
+    """
+    章节中引用的本地图片
+
+    Returns:
+        [(引用文本, 绝对路径)]（网络图片忽略）
+    """
+    refs = []
+    for match in IMAGE_RE.finditer(section_text):
+        ref = (match.group(1) or match.group(2)).strip()
+        if re.match(r'^[a-z][a-z0-9+.-]*:', ref, re.IGNORECASE):
+            continue
+        refs.append((ref, os.path.normpath(os.path.join(base_dir, unquote(ref)))))
+    return refs
+
+
+def png_size(path):
+    """从PNG文件头读取(宽, 高)，不是PNG时返回(None, None)"""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if len(header) < 24 or not header.startswith(PNG_SIGNATURE) or header[12:16] != b'IHDR':
+        return None, None
+    return struct.unpack('>II', header[16:24])
+
+
+def derivative_variant():
+    """派生文件的类型：有Pillow时缩小，否则保留原图"""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return 'original'
+    return f'max{MAX_IMAGE_SIDE}'
+
+
+class AssetCache(object):
+    """
+    内容寻址的图片缓存
+
+    缓存目录中每张图片由两个文件组成（<key>为图片内容哈希和派生类型的哈希）：
+        <key>.<扩展名>  派生文件（缩小后的PNG或原图副本）
+        <key>.json      图片信息：sha256、原始大小、宽高、派生文件名和大小
+    manifests/下保存每个markdown上一次预处理的记录（章节哈希、图片的大小/修改时间/哈希）。
+
+    Attributes:
+        cache_dir: 缓存目录
+        max_bytes: 派生文件的总大小上限（字节）
+        variant: 派生类型
+        touched: 本次运行中取出或生成过的缓存键（淘汰时保留）
+    """
+
+    def __init__(self, cache_dir=None, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.variant = derivative_variant()
+        self.touched = set()
+        os.makedirs(os.path.join(self.cache_dir, 'manifests'), exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def key_of(self, digest):
+        """图片内容哈希 -> 缓存键"""
+        return hashlib.sha256(f'{digest}:{self.variant}'.encode('utf-8')).hexdigest()
+
+    def get_image(self, path, digest):
+        """
+        取出图片的缓存条目，没有时生成派生文件并保存
+
+        Args:
+            path: 图片路径
+            digest: 图片内容的SHA-256
+
+        Returns:
+            (条目信息字典（含derived：派生文件路径）, 是否命中)
+        """
+        key = self.key_of(digest)
+        self.touched.add(key)
+        entry = self._read_entry(key)
+        if entry is not None:
+            os.utime(self._path(entry['derived']))
+            return dict(entry, derived=self._path(entry['derived'])), True
+
+        ext = os.path.splitext(path)[1].lower() or '.bin'
+        width, height = png_size(path)
+        if self.variant == 'original':
+            name = key + ext
+            atomic_copy(path, self._path(name))
+        else:
+            name, width, height = self._downscale(path, key, ext)
+        entry = {
+            'sha256': digest,
+            'size': os.path.getsize(path),
+            'width': width,
+            'height': height,
+            'derived': name,
+            'derived_size': os.path.getsize(self._path(name)),
+            'created': time.time(),
+        }
+        self._write_json(self._path(key + '.json'), entry)
+        return dict(entry, derived=self._path(name)), False
+
+    def _downscale(self, path, key, ext):
+        """用Pillow把图片缩小到最长边不超过MAX_IMAGE_SIDE（无法识别的文件保留原样）"""
+        from PIL import Image
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+                if max(width, height) <= MAX_IMAGE_SIDE and ext == '.png':
+                    atomic_copy(path, self._path(key + ext))
+                    return key + ext, width, height
+                image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+                fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+                os.close(fd)
+                try:
+                    image.save(tmp_path, format='PNG', optimize=True)
+                    os.replace(tmp_path, self._path(key + '.png'))
+                except OSError:
+                    os.remove(tmp_path)
+                    raise
+                return key + '.png', width, height
+        except OSError:
+            atomic_copy(path, self._path(key + ext))
+            return (key + ext,) + png_size(path)
+
+    def _read_entry(self, key):
+        try:
+            with open(self._path(key + '.json'), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not os.path.exists(self._path(entry['derived'])):
+            return None
+        return entry
+
+    def _write_json(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def manifest_path(self, md_file):
+        """markdown文件对应的预处理记录路径"""
+        digest = hashlib.sha256(os.path.abspath(md_file).encode('utf-8')).hexdigest()
+        return self._path(os.path.join('manifests', digest + '.json'))
+
+    def load_manifest(self, md_file):
+        """上一次的预处理记录（没有时返回None）"""
+        try:
+            with open(self.manifest_path(md_file), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_manifest(self, md_file, manifest):
+        """保存预处理记录"""
+        self._write_json(self.manifest_path(md_file), manifest)
+
+    def evict(self):
+        """
+        派生文件总大小超出上限时，从最久未使用的图片开始删除
+        本次运行中用到的图片（touched）不删除，即使因此仍超出上限
+
+        Returns:
+            删除的图片数
+        """
+        entries = []
+        for meta_path in glob.glob(self._path('*.json')):
+            key = os.path.basename(meta_path)[:-len('.json')]
+            entry = self._read_entry(key)
+            if entry is None:
+                continue
+            try:
+                stat = os.stat(self._path(entry['derived']))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, key, entry['derived']))
+        entries.sort()
+
+        total = sum(size for _, size, _, _ in entries)
+        evicted = 0
+        for _, size, key, derived in entries:
+            if total <= self.max_bytes:
+                break
+            if key in self.touched:
+                continue
+            for name in (key + '.json', derived):
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        """
+        缓存目录的概况
+
+        Returns:
+            字典：images、bytes、max_bytes、variant
+        """
+        sizes = []
+        for meta_path in glob.glob(self._path('*.json')):
+            entry = self._read_entry(os.path.basename(meta_path)[:-len('.json')])
+            if entry is not None:
+                sizes.append(entry['derived_size'])
+        return {'images': len(sizes), 'bytes': sum(sizes), 'max_bytes': self.max_bytes, 'variant': self.variant}
+
+
+def image_digest(path, previous):
+    """
+    图片内容哈希：大小和修改时间与上次记录相同时直接使用上次的哈希
+
+    Args:
+        path: 图片路径
+        previous: 上次记录的{路径: {size, mtime_ns, sha256}}
+
+    Returns:
+        (sha256, {size, mtime_ns, sha256}, 是否重新计算了哈希)
+    """
+    stat = os.stat(path)
+    old = previous.get(path)
+    if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+        return old['sha256'], old, False
+    digest = file_digest(path)
+    return digest, {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}, True
+
+
+def preprocess_document(md_file, cache, seen_digests):
+    """
+    预处理一个markdown文件
+
+    Args:
+        md_file: markdown文件路径
+        cache: AssetCache对象
+        seen_digests: 本次运行中已处理过的图片哈希集合（用于统计重复的图片），会被更新
+
+    Returns:
+        结果字典：file、sections（每项：title、level、line、sha256、status new/changed/unchanged、images）、
+        removed_sections、counters
+    """
+    with open(md_file, encoding='utf-8') as f:
+        text = f.read()
+    base_dir = os.path.dirname(os.path.abspath(md_file))
+    manifest = cache.load_manifest(md_file) or {}
+    previous_images = manifest.get('images', {})
+    previous_sections = manifest.get('sections', [])
+    previous_hashes = {section['sha256'] for section in previous_sections}
+    previous_titles = {section['title'] for section in previous_sections}
+
+    counters = {'sections': 0, 'changed_sections': 0, 'images': 0, 'hashed': 0,
+                'cache_hits': 0, 'cache_misses': 0, 'duplicates': 0, 'missing_images': 0}
+    images_state = {}
+    sections = []
+    for title, level, line, section_text in split_sections(text):
+        digest = hashlib.sha256(section_text.encode('utf-8'))
+        images = []
+        for ref, path in image_refs(section_text, base_dir):
+            counters['images'] += 1
+            if not os.path.isfile(path):
+                counters['missing_images'] += 1
+                images.append({'ref': ref, 'missing': True})
+                continue
+            sha, state, hashed = image_digest(path, previous_images)
+            images_state[path] = state
+            counters['hashed'] += hashed
+            digest.update(sha.encode('ascii'))
+            if sha in seen_digests:
+                counters['duplicates'] += 1
+            seen_digests.add(sha)
+            entry, hit = cache.get_image(path, sha)
+            counters['cache_hits' if hit else 'cache_misses'] += 1
+            images.append({'ref': ref, 'sha256': sha, 'derived': entry['derived'],
+                           'width': entry['width'], 'height': entry['height'], 'cached': hit})
+        section_hash = digest.hexdigest()
+        if not manifest:
+            status = 'new'
+        elif section_hash in previous_hashes:
+            status = 'unchanged'
+        else:
+            status = 'changed' if title in previous_titles else 'new'
+        counters['sections'] += 1
+        counters['changed_sections'] += status != 'unchanged'
+        sections.append({'title': title, 'level': level, 'line': line, 'sha256': section_hash,
+                         'status': status, 'images': images})
+
+    current_hashes = {section['sha256'] for section in sections}
+    current_titles = {section['title'] for section in sections}
+    removed = [section['title'] for section in previous_sections
+               if section['sha256'] not in current_hashes and section['title'] not in current_titles]
+    cache.save_manifest(md_file, {
+        'file': os.path.abspath(md_file),
+        'updated': time.time(),
+        'sections': [{'title': s['title'], 'sha256': s['sha256']} for s in sections],
+        'images': images_state,
+    })
+    return {'file': md_file, 'sections': sections, 'removed_sections': removed, 'counters': counters}
+
+
+def collect_requirement_dirs(paths):
+    """
+    展开输入为需求目录列表：本身含有markdown的目录为需求目录，否则取其下含有markdown的子目录
+
+    Returns:
+        排序后的目录路径列表
+    """
+    dirs = []
+    for path in paths:
+        if glob.glob(os.path.join(path, '*.md')):
+            dirs.append(path)
+        else:
+            dirs.extend(sub for sub in sorted(glob.glob(os.path.join(path, '*')))
+                        if os.path.isdir(sub) and glob.glob(os.path.join(sub, '*.md')))
+    return sorted(set(dirs))
+
+
+def preprocess_requirements(paths, cache):
+    """
+    预处理多个需求目录下的全部markdown，最后按大小上限淘汰缓存
+
+    Args:
+        paths: 需求目录或其上级目录列表
+        cache: AssetCache对象
+
+    Returns:
+        结果字典：requirements（[{dir, documents}]）、counters（合计）、evicted、cache（缓存概况）
+    """
+    seen_digests = set()
+    totals = {}
+    requirements = []
+    for req_dir in collect_requirement_dirs(paths):
+        documents = []
+        for md_file in sorted(glob.glob(os.path.join(req_dir, '*.md'))):
+            result = preprocess_document(md_file, cache, seen_digests)
+            for name, value in result['counters'].items():
+                totals[name] = totals.get(name, 0) + value
+            documents.append(result)
+        requirements.append({'dir': req_dir, 'documents': documents})
+    evicted = cache.evict()
+    return {'requirements': requirements, 'counters': totals, 'evicted': evicted, 'cache': cache.stats()}
+
+
+def format_report(result):
+    """把preprocess_requirements()的结果转为文本（列出新增/修改的章节）"""
+    lines = []
+    for requirement in result['requirements']:
+        lines.append(f"{os.path.basename(os.path.normpath(requirement['dir']))}:")
+        for doc in requirement['documents']:
+            counters = doc['counters']
+            lines.append(f"  {os.path.basename(doc['file'])}: {counters['sections']} 个章节"
+                         f"（新增/修改 {counters['changed_sections']}），{counters['images']} 张图片"
+                         f"（缓存命中 {counters['cache_hits']}，新处理 {counters['cache_misses']}）")
+            for section in doc['sections']:
+                if section['status'] != 'unchanged':
+                    label = '新增' if section['status'] == 'new' else '修改'
+                    lines.append(f"    [{label}] 第{section['line']}行 {section['title'] or '（标题前的内容）'}")
+            for title in doc['removed_sections']:
+                lines.append(f"    [删除] {title}")
+    counters = result['counters']
+    cache = result['cache']
+    lines.append('')
+    lines.append(f"合计: {counters.get('sections', 0)} 个章节，新增/修改 {counters.get('changed_sections', 0)} 个；"
+                 f"{counters.get('images', 0)} 张图片，重复 {counters.get('duplicates', 0)} 张，"
+                 f"缓存命中 {counters.get('cache_hits', 0)}，新处理 {counters.get('cache_misses', 0)}，"
+                 f"重新计算哈希 {counters.get('hashed', 0)}")
+    if counters.get('missing_images'):
+        lines.append(f"❌ 有 {counters['missing_images']} 个图片引用找不到文件")
+    lines.append(f"缓存: {cache['images']} 张图片，{cache['bytes'] / 1024 / 1024:.1f}MB / "
+                 f"{cache['max_bytes'] / 1024 / 1024:.0f}MB（派生类型 {cache['variant']}），本次淘汰 {result['evicted']} 张")
+    return '\n'.join(lines)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='需求文档预处理：章节哈希和内容寻址的图片缓存')
+    parser.add_argument('paths', nargs='+', help='需求目录，或包含多个需求目录的requirements目录')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help=f'缓存目录（默认 {DEFAULT_CACHE_DIR}）')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_MB,
+                        help=f'缓存大小上限MB，超出时淘汰最久未使用的图片（默认{DEFAULT_MAX_MB}）')
+    parser.add_argument('--json', action='store_true', help='输出JSON（含每个章节的哈希、状态和图片的缓存路径）')
+    args = parser.parse_args()
+
+    missing = [path for path in args.paths if not os.path.isdir(path)]
+    if missing:
+        print(f"错误: 目录不存在: {', '.join(missing)}")
+        sys.exit(1)
+
+    result = preprocess_requirements(args.paths, AssetCache(args.cache_dir, args.cache_size))
+    if not result['requirements']:
+        print("错误: 没有找到包含markdown的需求目录")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(result))
+
+
+if __name__ == '__main__':
+    main()
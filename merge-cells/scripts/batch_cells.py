@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+批量合并/拆分Excel测试用例脚本
+一次启动解释器，用进程池并发处理整个目录（或glob匹配）下的工作簿，
+逐个文件返回处理结果，最后输出吞吐汇总
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from instrumentation import Recorder
+from merge_cells import merge_cells
+from result_cache import ResultCache, add_cache_arguments
+from split_cells import split_cells
+
+
+TRANSFORMS = {
+    'merge': merge_cells,
+    'split': split_cells,
+}
+
+
+def collect_input_files(patterns):
+    """
+    展开输入的目录或glob模式为xlsx文件列表
+
+    Args:
+        patterns: 目录、文件或glob模式列表
+
+    Returns:
+        去重并排序后的文件路径列表（忽略~$开头的Office锁文件）
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.xlsx'))
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        for path in matches:
+            if os.path.basename(path).startswith('~$') or not os.path.isfile(path):
+                continue
+            files.append(os.path.abspath(path))
+    return sorted(set(files))
+
+
+def output_path_for(input_file, output_dir):
+    """
+    计算输出文件路径
+
+    Args:
+        input_file: 输入文件路径
+        output_dir: 输出目录（为None时覆盖原文件）
+
+    Returns:
+        输出文件路径
+    """
+    if output_dir is None:
+        return input_file
+    return os.path.join(output_dir, os.path.basename(input_file))
+
+
+def process_file(mode, input_file, output_file, engine, cache_options=None):
+    """
+    在工作进程中处理单个文件，脚本本身的输出被捕获，不干扰批量进度
+
+    Args:
+        mode: 'merge' 或 'split'
+        input_file: 输入文件路径
+        output_file: 输出文件路径
+        engine: 处理引擎
+        cache_options: 启用结果缓存时为(缓存目录, 大小上限MB)，否则为None
+
+    Returns:
+        结果字典：file、output、ok、seconds、size、error、cache（hit/miss，未启用缓存时为None）、
+        stages（各阶段耗时，见instrumentation.Recorder）
+    """
+    recorder = Recorder(f'{mode}_cells', quiet=True)
+    cache = ResultCache(*cache_options) if cache_options else None
+    start = time.perf_counter()
+    error = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            TRANSFORMS[mode](input_file, output_file, engine=engine, recorder=recorder, cache=cache)
+    except SystemExit:
+        # 脚本遇到错误时记录原因并sys.exit(1)
+        error = recorder.report['error'] or '处理失败'
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+
+    return {
+        'file': input_file,
+        'output': output_file,
+        'ok': error is None,
+        'seconds': round(time.perf_counter() - start, 3),
+        'size': os.path.getsize(input_file),
+        'error': error,
+        'cache': recorder.report.get('cache', {}).get('status'),
+        'stages': recorder.report['stages'],
+    }
+
+
+def run_batch(mode, files, output_dir=None, workers=None, engine='full', cache_options=None):
+    """
+    用进程池批量处理文件，结果按完成顺序逐个产出
+
+    Args:
+        mode: 'merge' 或 'split'
+        files: 输入文件路径列表
+        output_dir: 输出目录（为None时覆盖原文件）
+        workers: 进程数（默认CPU核数）
+        engine: 处理引擎
+        cache_options: 启用结果缓存时为(缓存目录, 大小上限MB)
+
+    Yields:
+        每个文件的结果字典（见process_file）
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_file, mode, path, output_path_for(path, output_dir), engine, cache_options): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # 工作进程异常退出等情况
+                yield {
+                    'file': futures[future],
+                    'output': None,
+                    'ok': False,
+                    'seconds': 0.0,
+                    'size': os.path.getsize(futures[future]),
+                    'error': f'{type(e).__name__}: {e}',
+                    'cache': None,
+                    'stages': [],
+                }
+
+
+def summarize(results, wall_seconds, workers):
+    """
+    汇总批量处理结果
+
+    Args:
+        results: 结果字典列表
+        wall_seconds: 总耗时（秒）
+        workers: 进程数
+
+    Returns:
+        汇总字典
+    """
+    succeeded = [r for r in results if r['ok']]
+    total_bytes = sum(r['size'] for r in results)
+    return {
+        'files': len(results),
+        'succeeded': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'workers': workers,
+        'wall_seconds': round(wall_seconds, 3),
+        'cpu_seconds': round(sum(r['seconds'] for r in results), 3),
+        'files_per_second': round(len(results) / wall_seconds, 2) if wall_seconds else None,
+        'mb_per_second': round(total_bytes / 1024 / 1024 / wall_seconds, 2) if wall_seconds else None,
+        'cache_hits': sum(1 for r in results if r['cache'] == 'hit'),
+        'cache_misses': sum(1 for r in results if r['cache'] == 'miss'),
+        'failures': [{'file': r['file'], 'error': r['error']} for r in results if not r['ok']],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量合并/拆分Excel测试用例单元格')
+    parser.add_argument('mode', choices=sorted(TRANSFORMS), help='merge合并 或 split拆分')
+    parser.add_argument('inputs', nargs='+', help='输入目录、文件或glob模式（如"testcases/**/*.xlsx"）')
+    parser.add_argument('-o', '--output-dir', default=None, help='输出目录（可选，默认覆盖原文件）')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='并发进程数（默认CPU核数）')
+    parser.add_argument('--engine', choices=['full', 'stream', 'xml'], default='full',
+                        help='处理引擎（xml只用于merge）')
+    parser.add_argument('--summary', default=None, help='把结果和吞吐汇总写入JSON文件（可选）')
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    if args.engine == 'xml' and args.mode != 'merge':
+        parser.error('xml 引擎只支持 merge')
+
+    files = collect_input_files(args.inputs)
+    if not files:
+        print("错误: 没有找到需要处理的xlsx文件")
+        sys.exit(1)
+
+    if args.output_dir is not None:
+        names = [os.path.basename(path) for path in files]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            print(f"错误: 多个输入文件同名，无法输出到同一目录: {duplicates}")
+            sys.exit(1)
+
+    print(f"共 {len(files)} 个文件，使用 {args.workers} 个进程{'合并' if args.mode == 'merge' else '拆分'}...")
+
+    start = time.perf_counter()
+    results = []
+    cache_options = (args.cache_dir, args.cache_size) if args.cache else None
+    for result in run_batch(args.mode, files, args.output_dir, args.workers, args.engine, cache_options):
+        results.append(result)
+        if result['ok']:
+            cached = '，缓存命中' if result['cache'] == 'hit' else ''
+            print(f"  ✅ [{len(results)}/{len(files)}] {result['file']} ({result['seconds']:.2f}秒{cached})")
+        else:
+            print(f"  ❌ [{len(results)}/{len(files)}] {result['file']}: {result['error']}")
+    summary = summarize(results, time.perf_counter() - start, args.workers)
+
+    print(f"\n处理完成: 成功 {summary['succeeded']} 个，失败 {summary['failed']} 个，"
+          f"总耗时 {summary['wall_seconds']:.2f} 秒，{summary['files_per_second']} 个文件/秒")
+    if args.cache:
+        print(f"缓存: 命中 {summary['cache_hits']} 个，未命中 {summary['cache_misses']} 个")
+
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"汇总已写入: {args.summary}")
+
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
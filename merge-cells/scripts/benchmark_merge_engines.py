@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+合并变换的实现对比：逐行实现（pipeline.merge_model） vs pandas向量化实现
+在内存中生成指定行数的用例表模型，分别用两种实现完成合并变换，
+对比耗时，并校验两者输出的单元格值和统计是否完全一致。
+
+pandas实现不作为引擎提供：实测（10万行、每个用例4个步骤）逐行实现0.34秒、pandas 0.62秒，
+object类型的字符串操作在pandas中仍逐个元素执行，向量化没有收益。
+本脚本保留这一对比，逐行实现或pandas版本变化后可以重新确认。
+pandas用例块编号为用例名称非空掩码的累加（相当于向前填充），#号前缀为向量化字符串运算，
+块内拼接用np.add.reduceat一次完成，空行用布尔掩码一次删除。
+
+用法：
+    python benchmark_merge_engines.py [-n 100000] [--steps 4] [--repeat 3]
+"""
+
+import argparse
+import copy
+import sys
+import time
+
+from instrumentation import Recorder
+from pipeline import MERGE_STEPS, merge_model
+from sheet_model import FIRST_DATA_ROW, SheetModel, detect_columns
+
+
+HEADER = ('ID', '一级模块', '二级模块', '用例名称', '前置条件', '步骤描述', '预期结果', '优先级')
+
+
+def import_pandas():
+    """
+    导入pandas，未安装时给出安装提示
+
+    Returns:
+        pandas模块
+
+    Raises:
+        ImportError: 未安装pandas
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("对比pandas实现需要安装pandas: pip install pandas")
+    return pd
+
+
+def is_string_like(series):
+    """
+    列中是否含有字符串（全是数字、日期或空值的列不能使用.str访问器）
+
+    Args:
+        series: object类型的Series
+
+    Returns:
+        含有字符串返回True
+    """
+    try:
+        series.str
+    except AttributeError:
+        return False
+    return True
+
+
+def text_series(series):
+    """
+    单元格值的标准化文本（同cell_text），空值为空字符串
+
+    Args:
+        series: object类型的Series
+
+    Returns:
+        去掉首尾空白后的字符串Series（object类型）
+    """
+    if not is_string_like(series):
+        return series.map(str, na_action='ignore').str.strip().fillna('')
+    text = series.str.strip()
+    # 数字、日期等非字符串值先转为字符串
+    others = text.isna() & series.notna()
+    if others.any():
+        text[others] = series[others].map(str).str.strip()
+    return text.fillna('')
+
+
+def non_empty_mask(series):
+    """
+    单元格是否非空（同is_row_empty的判断：非字符串值都算非空）
+
+    Args:
+        series: object类型的Series
+
+    Returns:
+        布尔Series
+    """
+    if not is_string_like(series):
+        return series.notna()
+    return series.notna() & (series.str.strip() != '')
+
+
+def merge_model_pandas(model, columns, recorder=None):
+    """
+    在内存模型上完成合并的全部变换（merge_model的pandas向量化实现，只用于对比）
+
+    Args:
+        model: SheetModel对象
+        columns: detect_columns()的返回值
+        recorder: Recorder对象（可选），记录每个步骤的耗时
+
+    Returns:
+        统计字典，同merge_model
+    """
+    pd = import_pandas()
+    import numpy as np
+    recorder = recorder or Recorder('merge_model_pandas', quiet=True)
+    step_desc_col = columns['step_desc']
+    expected_result_col = columns['expected_result']
+    rows_before = model.n_rows + 1
+
+    # 第一步：加#号前缀（空单元格变为#），已有#号的保持原值
+    with recorder.stage('step1', MERGE_STEPS['step1']):
+        df = pd.DataFrame({col: pd.Series(values, dtype=object)
+                           for col, values in enumerate(model.columns, start=1)})
+
+        # 用例名称有值的行开始一个新块；第一个用例名称之前的行块编号为0，不参与合并
+        is_case_row = text_series(df[columns['case_name']]) != ''
+        block_ids = is_case_row.cumsum()
+        in_block = block_ids > 0
+        case_rows = is_case_row.to_numpy().nonzero()[0]
+
+        prefixed = 0
+        prefixed_columns = {}
+        for col in (step_desc_col, expected_result_col):
+            text = text_series(df[col])
+            has_hash = text.str.startswith('#')
+            prefixed += int((~has_hash).sum())
+            new_text = text.where(has_hash, '#' + text)
+            values = df[col].where(has_hash, new_text).to_numpy(dtype=object, copy=True)
+            prefixed_columns[col] = (new_text.to_numpy(dtype=object), values)
+
+    # 第二步：按块拼接到块首行，块内其余行清空；块是连续的行区间，用reduceat一次完成字符串拼接
+    with recorder.stage('step2', MERGE_STEPS['step2']):
+        for col, (new_text, values) in prefixed_columns.items():
+            if len(case_rows):
+                joined = np.add.reduceat(new_text, case_rows)
+                values[in_block.to_numpy() & ~is_case_row.to_numpy()] = None
+                values[case_rows] = joined
+            model.columns[col - 1] = values.tolist()
+
+        # 加了前缀后块内每一行都贡献一个片段，多于一行的块就是发生了合并的块
+        merged_blocks = []
+        block_sizes = np.diff(np.append(case_rows, model.n_rows))
+        for idx, size in zip(case_rows.tolist(), block_sizes.tolist()):
+            if size > 1:
+                merged_blocks.append((idx + FIRST_DATA_ROW, size, size, size - 1))
+
+    # 第三步：删除全部空行（所有列都为空或只有空白字符）
+    with recorder.stage('step3', MERGE_STEPS['step3']):
+        df = pd.DataFrame({col: pd.Series(values, dtype=object)
+                           for col, values in enumerate(model.columns, start=1)})
+        non_empty = pd.concat([non_empty_mask(df[col]) for col in df.columns], axis=1).any(axis=1)
+        keep = non_empty.to_numpy().nonzero()[0].tolist()
+        deleted = model.n_rows - len(keep)
+        if deleted:
+            model.take_rows(keep)
+
+    return {
+        'rows_before': rows_before,
+        'prefixed': prefixed,
+        'case_rows': [idx + FIRST_DATA_ROW for idx in case_rows.tolist()],
+        'merged_blocks': merged_blocks,
+        'deleted': deleted,
+    }
+
+
+def build_model(n_rows, steps_per_case=4):
+    """
+    生成合并前的用例表模型：每个用例占steps_per_case行，只有首行填写用例信息
+
+    Args:
+        n_rows: 数据行数
+        steps_per_case: 每个用例的步骤数
+
+    Returns:
+        SheetModel对象
+    """
+    columns = [[] for _ in HEADER]
+    for idx in range(n_rows):
+        case_no, step_no = divmod(idx, steps_per_case)
+        first = step_no == 0
+        row_values = (
+            case_no + 1 if first else None,
+            f'模块{case_no // 200 + 1}' if first else None,
+            f'子模块{case_no // 20 + 1}' if first else None,
+            f'#{case_no + 1}-A{case_no % 1000:03d}-用例{case_no + 1}' if first else None,
+            '已登录系统' if first else None,
+            f'打开页面并执行操作{step_no + 1}',
+            f'操作{step_no + 1}成功' if step_no % 3 != 2 else None,
+            'P1' if first else None,
+        )
+        for column, value in zip(columns, row_values):
+            column.append(value)
+    return SheetModel('Sheet1', HEADER, columns, list(range(n_rows)))
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='对比合并变换的逐行实现与pandas向量化实现的耗时')
+    parser.add_argument('-n', '--rows', type=int, default=100000, help='数据行数（默认100000）')
+    parser.add_argument('--steps', type=int, default=4, help='每个用例的步骤数（默认4）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个引擎重复次数，取最快的一次（默认3）')
+    args = parser.parse_args()
+
+    try:
+        import_pandas()
+    except ImportError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    source = build_model(args.rows, args.steps)
+    columns = detect_columns(source.header)
+    print(f"数据行数: {args.rows}，每个用例 {args.steps} 个步骤")
+
+    results = {}
+    for name, transform in (('full', merge_model), ('pandas', merge_model_pandas)):
+        best = None
+        for _ in range(args.repeat):
+            model = copy.deepcopy(source)
+            start = time.perf_counter()
+            stats = transform(model, columns)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (model, stats, best)
+        print(f"  {name:<7} {best:.3f} 秒")
+
+    full_model, full_stats, full_seconds = results['full']
+    pandas_model, pandas_stats, pandas_seconds = results['pandas']
+    identical = (full_model.columns == pandas_model.columns
+                 and full_model.source_rows == pandas_model.source_rows
+                 and full_stats == pandas_stats)
+    print(f"加速比: {full_seconds / pandas_seconds:.2f}x，输出{'一致' if identical else '不一致'}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
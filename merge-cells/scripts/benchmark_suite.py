@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+合并/拆分/导出基准测试套件
+生成与测试用例导入模板相同14列布局（ID、一级模块……维护人）的合成工作簿，
+按不同规模分别运行merge_cells.py、split_cells.py的各个引擎以及read_excel.py，
+记录每次运行的耗时、峰值内存（RSS）和输出文件大小，结果写入JSON文件，
+可用--baseline与之前某次提交的结果对比。
+
+规模指展开后的行数（每个步骤一行）：merge的输入就是这种布局；
+split和导出的输入是合并后的布局（每个用例一行，步骤用#拼接），行数为规模/每个用例的步骤数。
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+
+HEADER = ('ID', '一级模块', '二级模块', '三级模块', '用例名称', '优先级', '用例类型',
+          '创建时间', '更新时间', '前置条件', '步骤描述', '预期结果', '备注', '维护人')
+
+# 各操作可用的引擎（dump为read_excel.py）
+OPERATIONS = {
+    'merge': ['full', 'stream', 'xml'],
+    'split': ['full', 'stream'],
+    'dump': ['read_excel'],
+}
+DEFAULT_ROWS = [1000, 10000, 100000, 500000]
+
+TEXT_POOL = ('订单状态流转至确认发船中订舱已航程类型字段直达中转录入导入导出查询列表'
+             '点击保存取消提示失败成功操作日志记录回传上游海运陆运模块弹窗默认选项')
+
+
+def sample_text(rng, length):
+    """生成指定长度的伪随机中文文本"""
+    return ''.join(rng.choice(TEXT_POOL) for _ in range(length))
+
+
+def iter_cases(n_cases, steps_per_case, text_length, seed=0):
+    """
+    生成用例数据（确定性的，相同参数每次结果相同）
+
+    Args:
+        n_cases: 用例数
+        steps_per_case: 每个用例的步骤数
+        text_length: 步骤描述/预期结果每一步的文本长度
+        seed: 随机种子
+
+    Yields:
+        (用例信息字典, 步骤列表, 预期结果列表)
+    """
+    rng = random.Random(seed)
+    for case_no in range(1, n_cases + 1):
+        case = {
+            'ID': case_no,
+            '一级模块': f'模块{(case_no - 1) // 500 + 1}',
+            '二级模块': f'子模块{(case_no - 1) // 50 + 1}',
+            '三级模块': f'#77879 功能{(case_no - 1) // 10 + 1}',
+            '用例名称': f'#77879-A{case_no:05d}-{sample_text(rng, 12)}',
+            '优先级': f'P{rng.randint(0, 3)}',
+            '用例类型': '功能测试',
+            '前置条件': sample_text(rng, 20) if case_no % 3 == 0 else '',
+            '维护人': '测试',
+        }
+        steps = [sample_text(rng, text_length) for _ in range(steps_per_case)]
+        results = [sample_text(rng, text_length) for _ in range(steps_per_case)]
+        yield case, steps, results
+
+
+def generate_workbook(path, layout, rows, steps_per_case, text_length):
+    """
+    生成合成工作簿（write_only模式，内存占用与规模无关）
+
+    Args:
+        path: 输出路径
+        layout: 'expanded'（每个步骤一行，merge的输入）或 'merged'（每个用例一行）
+        rows: 规模（展开后的行数）
+        steps_per_case: 每个用例的步骤数
+        text_length: 每一步的文本长度
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(HEADER)
+    n_cases = max(1, rows // steps_per_case)
+    for case, steps, results in iter_cases(n_cases, steps_per_case, text_length):
+        if layout == 'merged':
+            row_case = dict(case, 步骤描述=''.join('#' + step for step in steps),
+                            预期结果=''.join('#' + result for result in results))
+            ws.append([row_case.get(name) for name in HEADER])
+            continue
+        for step_no, (step, result) in enumerate(zip(steps, results)):
+            if step_no == 0:
+                row_case = dict(case, 步骤描述=step, 预期结果=result)
+                ws.append([row_case.get(name) for name in HEADER])
+            else:
+                ws.append([step if name == '步骤描述' else result if name == '预期结果' else None
+                           for name in HEADER])
+    wb.save(path)
+
+
+def input_path_for(workdir, operation, rows, steps_per_case, text_length):
+    """
+    获取（必要时生成）某个操作和规模的输入工作簿；已生成的文件直接复用
+
+    Returns:
+        输入文件路径
+    """
+    layout = 'expanded' if operation == 'merge' else 'merged'
+    path = os.path.join(workdir, f'{layout}-{rows}-s{steps_per_case}-t{text_length}.xlsx')
+    if not os.path.exists(path):
+        print(f"  生成输入: {os.path.basename(path)}")
+        tmp_path = path + '.tmp'
+        generate_workbook(tmp_path, layout, rows, steps_per_case, text_length)
+        os.replace(tmp_path, path)
+    return path
+
+
+def command_for(operation, engine, input_file, output_file):
+    """生成运行某个操作和引擎的命令行"""
+    if operation == 'dump':
+        return [sys.executable, os.path.join(REPO_ROOT, 'read_excel.py'), input_file, output_file]
+    script = os.path.join(SCRIPT_DIR, f'{operation}_cells.py')
+    return [sys.executable, script, input_file, output_file, '--engine', engine]
+
+
+def run_measured(cmd, timeout=None):
+    """
+    运行子进程，测量耗时和该子进程自己的峰值RSS
+
+    Args:
+        cmd: 命令行列表
+        timeout: 超时秒数（None表示不限）
+
+    Returns:
+        (是否成功, 耗时秒数, 峰值RSS MB, 错误信息)
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = start + timeout if timeout else None
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            break
+        if deadline and time.perf_counter() > deadline:
+            proc.kill()
+            pid, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = -1
+            return False, round(time.perf_counter() - start, 3), round(usage.ru_maxrss / 1024, 1), f'超时（{timeout}秒）'
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    stderr = proc.stderr.read().decode('utf-8', errors='replace').strip()
+    proc.stderr.close()
+    error = None
+    if proc.returncode != 0:
+        error = stderr.splitlines()[-1] if stderr else f'退出码 {proc.returncode}'
+    # Linux上ru_maxrss单位为KB
+    return error is None, round(elapsed, 3), round(usage.ru_maxrss / 1024, 1), error
+
+
+def git_commit():
+    """当前代码的git提交（不在git仓库中时返回None）"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_with_baseline(results, baseline_file):
+    """
+    与之前的结果文件对比，输出每一项的耗时和内存变化
+
+    Args:
+        results: 本次结果列表
+        baseline_file: 之前的结果JSON路径
+    """
+    with open(baseline_file, encoding='utf-8') as f:
+        baseline = json.load(f)
+    key = lambda r: (r['operation'], r['engine'], r['rows'], r['steps_per_case'], r['text_length'])
+    previous = {key(r): r for r in baseline['results'] if r['ok']}
+    print(f"\n与基线对比（{baseline.get('commit')} -> 本次）:")
+    for result in results:
+        old = previous.get(key(result))
+        if not result['ok'] or old is None:
+            continue
+        print(f"  {result['operation']:<6}{result['engine']:<11}{result['rows']:>8} 行: "
+              f"耗时 {old['wall_seconds']:.2f}s -> {result['wall_seconds']:.2f}s "
+              f"({result['wall_seconds'] / old['wall_seconds']:.2f}x)，"
+              f"内存 {old['peak_rss_mb']:.0f}MB -> {result['peak_rss_mb']:.0f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并/拆分/导出基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help=f'规模（展开后的行数），默认 {" ".join(map(str, DEFAULT_ROWS))}')
+    parser.add_argument('--steps', type=int, default=4, help='每个用例的步骤数（默认4）')
+    parser.add_argument('--text-length', type=int, default=30, help='每一步的文本长度（默认30个字符）')
+    parser.add_argument('--operations', nargs='+', choices=sorted(OPERATIONS), default=sorted(OPERATIONS),
+                        help='要测试的操作（默认全部）')
+    parser.add_argument('--engines', nargs='+', default=None, help='只测试这些引擎（默认各操作的全部引擎）')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'merge-cells-benchmark'),
+                        help='生成的输入和输出文件目录（默认系统临时目录下的merge-cells-benchmark，输入会被复用）')
+    parser.add_argument('--timeout', type=float, default=None, help='单次运行的超时秒数（默认不限）')
+    parser.add_argument('-o', '--output', default='benchmark-results.json', help='结果JSON路径')
+    parser.add_argument('--baseline', default=None, help='之前的结果JSON，用于对比')
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for rows in args.rows:
+        for operation in args.operations:
+            engines = [e for e in OPERATIONS[operation] if args.engines is None or e in args.engines]
+            if not engines:
+                continue
+            input_file = input_path_for(args.workdir, operation, rows, args.steps, args.text_length)
+            for engine in engines:
+                output_file = os.path.join(args.workdir, f'out-{operation}-{engine}-{rows}'
+                                           + ('.txt' if operation == 'dump' else '.xlsx'))
+                ok, seconds, rss_mb, error = run_measured(
+                    command_for(operation, engine, input_file, output_file), args.timeout)
+                result = {
+                    'operation': operation,
+                    'engine': engine,
+                    'rows': rows,
+                    'steps_per_case': args.steps,
+                    'text_length': args.text_length,
+                    'input_bytes': os.path.getsize(input_file),
+                    'ok': ok,
+                    'wall_seconds': seconds,
+                    'peak_rss_mb': rss_mb,
+                    'output_bytes': os.path.getsize(output_file) if ok and os.path.exists(output_file) else None,
+                    'error': error,
+                }
+                results.append(result)
+                if ok:
+                    output_mb = (f"{result['output_bytes'] / 1024 / 1024:.1f} MB"
+                                 if result['output_bytes'] is not None else '无')
+                    print(f"  ✅ {operation:<6}{engine:<11}{rows:>8} 行: {seconds:8.2f} 秒，"
+                          f"峰值内存 {rss_mb:7.1f} MB，输出 {output_mb}")
+                else:
+                    print(f"  ❌ {operation:<6}{engine:<11}{rows:>8} 行: {error}")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入: {args.output}")
+
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试用例的列式交换格式（JSONL / Parquet）导出与导入
+导出：流式读取合并后或拆分后的工作簿，每个用例一条记录，包含表头中的全部列（如导入模板的14列），
+      步骤描述、预期结果为步骤列表（不再是#拼接的字符串，两个列表按步骤对齐、长度相同，空的一侧为null），
+      其他列为文本（空单元格为null）。两种布局导出的结果相同。
+导入：把记录重新生成为工作簿（默认合并后的布局，--layout split为拆分后的布局），
+      可以在JSONL/Parquet上批量修改用例，最后只生成一次xlsx。
+
+格式按文件扩展名决定：.jsonl 或 .parquet（Parquet需要安装pyarrow，只在使用时导入）。
+
+用法：
+    python case_export.py export <Excel文件> <输出.jsonl|.parquet> [--sheet 名称]
+    python case_export.py import <输入.jsonl|.parquet> <输出Excel文件> [--layout merged|split]
+"""
+
+import argparse
+import json
+import os
+import sys
+import zipfile
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.exceptions import InvalidFileException
+
+from diff_cells import step_fragments
+from instrumentation import Recorder
+from sheet_model import FIRST_DATA_ROW, cell_text, detect_columns, missing_columns
+from stream_engine import fill_merged, read_merged_ranges
+
+
+FORMATS = {
+    '.jsonl': 'jsonl',
+    '.parquet': 'parquet',
+}
+# Parquet每次写入的记录数
+BATCH_SIZE = 5000
+
+
+def format_of(path):
+    """
+    按扩展名判断交换格式
+
+    Returns:
+        'jsonl' 或 'parquet'
+
+    Raises:
+        ValueError: 不支持的扩展名
+    """
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"不支持的格式: {path}（支持: {', '.join(FORMATS)}）")
+    return fmt
+
+
+def import_pyarrow():
+    """
+    导入pyarrow，未安装时给出安装提示
+
+    Returns:
+        (pyarrow模块, pyarrow.parquet模块)
+
+    Raises:
+        ImportError: 未安装pyarrow
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet格式需要安装pyarrow: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def iter_case_records(file_path, sheet=None):
+    """
+    流式读取工作簿中的用例记录（合并后和拆分后的布局都支持）
+
+    Args:
+        file_path: Excel文件路径
+        sheet: sheet名称，默认第一个sheet
+
+    Returns:
+        (列名列表, 步骤列名元组(步骤描述列名, 预期结果列名), 记录迭代器)；
+        记录为按列顺序的字典，步骤列为列表
+
+    Raises:
+        ValueError: 不是有效的xlsx文件，或找不到指定的sheet
+    """
+    try:
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile) as e:
+        raise ValueError(f"无法读取工作簿 {file_path}: {e}")
+    if sheet is None:
+        ws = wb.worksheets[0]
+    elif sheet in wb.sheetnames:
+        ws = wb[sheet]
+    else:
+        wb.close()
+        raise ValueError(f"找不到sheet: {sheet}")
+
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, ())
+    columns = detect_columns(header)
+    missing = missing_columns(columns)
+    if missing:
+        wb.close()
+        raise ValueError(f"找不到必需的列: {', '.join(missing)}")
+
+    names = [(idx, str(name).strip()) for idx, name in enumerate(header) if name is not None]
+    step_idx = columns['step_desc'] - 1
+    result_idx = columns['expected_result'] - 1
+    step_names = (str(header[step_idx]).strip(), str(header[result_idx]).strip())
+    merged_starts = read_merged_ranges(file_path, ws._worksheet_path)
+    return [name for _, name in names], step_names, _iter_records(
+        wb, rows, names, columns['case_name'] - 1, step_idx, result_idx, step_names, merged_starts)
+
+
+def _iter_records(wb, rows, names, name_idx, step_idx, result_idx, step_names, merged_starts):
+    """iter_case_records()的记录迭代器，读完后关闭工作簿"""
+    fill_cols = {idx for idx, _ in names if idx not in (name_idx, step_idx, result_idx)}
+    fills = {}
+    record = None
+    try:
+        for row_idx, values in enumerate(rows, FIRST_DATA_ROW):
+            if fills or row_idx in merged_starts:
+                values = fill_merged(values, row_idx, merged_starts.get(row_idx, ()), fills, fill_cols)
+            width = len(values)
+            if name_idx < width and cell_text(values[name_idx]) is not None:
+                if record is not None:
+                    yield record
+                record = {name: [] if idx in (step_idx, result_idx) else
+                          (cell_text(values[idx]) if idx < width else None) for idx, name in names}
+                steps, results = record[step_names[0]], record[step_names[1]]
+            elif record is None:
+                # 第一个用例之前的行
+                continue
+
+            row_steps = step_fragments(values[step_idx]) if step_idx < width else []
+            row_results = step_fragments(values[result_idx]) if result_idx < width else []
+            for i in range(max(len(row_steps), len(row_results))):
+                step = row_steps[i] if i < len(row_steps) else None
+                result = row_results[i] if i < len(row_results) else None
+                if step is not None or result is not None:
+                    steps.append(step)
+                    results.append(result)
+        if record is not None:
+            yield record
+    finally:
+        wb.close()
+
+
+def write_jsonl(path, records):
+    """每条记录写为一行JSON，返回记录数"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def write_parquet(path, columns, step_names, records):
+    """
+    按批写入Parquet（步骤列为list<string>，其他列为string），返回记录数
+    """
+    pa, pq = import_pyarrow()
+    schema = pa.schema([(name, pa.list_(pa.string()) if name in step_names else pa.string())
+                        for name in columns])
+    count = 0
+    batch = []
+    with pq.ParquetWriter(path, schema) as writer:
+        for record in records:
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def export_cases(file_path, output_path, sheet=None, recorder=None):
+    """
+    把工作簿中的用例导出为JSONL或Parquet
+
+    Args:
+        file_path: Excel文件路径（合并后或拆分后的布局）
+        output_path: 输出路径（.jsonl 或 .parquet）
+        sheet: sheet名称，默认第一个sheet
+        recorder: Recorder对象（可选），记录导出阶段的耗时
+
+    Returns:
+        导出的用例数
+    """
+    recorder = recorder or Recorder('export_cases', quiet=True)
+    fmt = format_of(output_path)
+    if fmt == 'parquet':
+        import_pyarrow()
+    with recorder.stage('export', f'导出{fmt}'):
+        columns, step_names, records = iter_case_records(file_path, sheet)
+        if fmt == 'jsonl':
+            count = write_jsonl(output_path, records)
+        else:
+            count = write_parquet(output_path, columns, step_names, records)
+    recorder.count(exported=count)
+    recorder.log(f"已导出 {count} 个用例到: {output_path}")
+    return count
+
+
+def export_result(file_path, export, recorder):
+    """
+    merge_cells/split_cells处理完成后按需导出结果中的用例
+
+    Args:
+        file_path: 处理结果的Excel文件路径
+        export: 导出路径（.jsonl 或 .parquet），为None时不导出
+        recorder: Recorder对象，导出失败时记录错误并退出
+    """
+    if not export:
+        return
+    try:
+        export_cases(file_path, export, recorder=recorder)
+    except (OSError, ValueError, ImportError) as e:
+        recorder.fail(f"\n❌ 导出用例时出错: {e}")
+
+
+def read_case_records(path):
+    """
+    读取JSONL或Parquet中的用例记录
+
+    Returns:
+        (列名列表, 记录迭代器)；JSONL的列名为第一条记录的键，其后记录中新出现的键追加在末尾
+        （因此JSONL需要先完整读一遍，Parquet按批读取）
+    """
+    if format_of(path) == 'parquet':
+        _, pq = import_pyarrow()
+        parquet_file = pq.ParquetFile(path)
+        columns = parquet_file.schema_arrow.names
+
+        def records():
+            for batch in parquet_file.iter_batches(batch_size=BATCH_SIZE):
+                yield from batch.to_pylist()
+        return columns, records()
+
+    columns = {}
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path} 第{line_no}行不是有效的JSON: {e}")
+            columns.update(dict.fromkeys(record))
+
+    def records():
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    return list(columns), records()
+
+
+def join_steps(steps):
+    """
+    步骤列表 -> 合并后布局中#拼接的单元格内容（去掉尾部的空步骤，全部为空时返回None）
+    """
+    steps = list(steps or ())
+    while steps and steps[-1] is None:
+        steps.pop()
+    if not steps:
+        return None
+    return ''.join('#' + (step or '') for step in steps)
+
+
+def append_row(ws, values, row_idx, height=None):
+    """向write_only worksheet追加一行，height不为None时设置行高"""
+    if height is None:
+        ws.append(values)
+        return
+    ws.row_dimensions[row_idx].height = height
+    ws.append(values)
+    del ws.row_dimensions[row_idx]
+
+
+def write_case_workbook(columns, records, output_file, layout='merged', sheet_title='Sheet1', extra_sheets=(),
+                        recorder=None, column_widths=None, row_height=None):
+    """
+    把用例记录写为工作簿（write_only模式，内存占用与用例数无关）
+
+    Args:
+        columns: 列名列表（第一行表头）
+        records: 用例记录迭代器（步骤列为列表，见iter_case_records()）
+        output_file: 输出Excel文件路径
+        layout: 'merged'（每个用例一行，步骤用#拼接）或 'split'（再按split_cells拆分为每个步骤一行）
+        sheet_title: 用例sheet的名称
+        extra_sheets: 追加在用例sheet之后的sheet，每项为(名称, 表头, 行迭代器)
+        recorder: Recorder对象（可选）
+        column_widths: 用例sheet的列宽，{列名: 宽度}（可选）
+        row_height: 用例sheet的行高（磅，可选；split布局由split_cells重写行高）
+
+    Returns:
+        写入的用例数
+
+    Raises:
+        ValueError: 列名中找不到用例名称、步骤描述或预期结果
+    """
+    recorder = recorder or Recorder('write_case_workbook', quiet=True)
+    detected = detect_columns(columns)
+    missing = missing_columns(detected)
+    if missing:
+        raise ValueError(f"找不到必需的列: {', '.join(missing)}")
+    step_names = {columns[detected['step_desc'] - 1], columns[detected['expected_result'] - 1]}
+
+    with recorder.stage('write', '生成工作簿'):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_title)
+        for idx, name in enumerate(columns, 1):
+            if column_widths and name in column_widths:
+                ws.column_dimensions[get_column_letter(idx)].width = column_widths[name]
+        append_row(ws, columns, 1, row_height)
+        count = 0
+        for record in records:
+            count += 1
+            append_row(ws, [join_steps(record.get(name)) if name in step_names else record.get(name)
+                            for name in columns], count + 1, row_height)
+        for title, header, rows in extra_sheets:
+            extra = wb.create_sheet(title)
+            extra.append(header)
+            for row in rows:
+                extra.append(row)
+        wb.save(output_file)
+
+    if layout == 'split':
+        from split_cells import split_sheet
+        split_sheet(output_file, output_file, recorder)
+    return count
+
+
+def import_cases(input_path, output_file, layout='merged', sheet_title='Sheet1', recorder=None):
+    """
+    把JSONL/Parquet中的用例记录生成为工作簿
+
+    Args:
+        input_path: 输入路径（.jsonl 或 .parquet）
+        output_file: 输出Excel文件路径
+        layout: 'merged'（每个用例一行，步骤用#拼接）或 'split'（再按split_cells拆分为每个步骤一行）
+        sheet_title: sheet名称
+        recorder: Recorder对象（可选）
+
+    Returns:
+        生成的用例数
+    """
+    recorder = recorder or Recorder('import_cases', quiet=True)
+    columns, records = read_case_records(input_path)
+    try:
+        count = write_case_workbook(columns, records, output_file, layout, sheet_title, recorder=recorder)
+    except ValueError as e:
+        raise ValueError(f"{input_path}: {e}")
+    recorder.count(imported=count)
+    recorder.log(f"已生成 {count} 个用例到: {output_file}")
+    return count
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='测试用例与JSONL/Parquet交换格式之间的导出和导入')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='把工作簿中的用例导出为JSONL/Parquet')
+    export_parser.add_argument('input_file', help='Excel文件路径（合并后或拆分后的布局）')
+    export_parser.add_argument('output_path', help='输出路径（.jsonl 或 .parquet）')
+    export_parser.add_argument('--sheet', default=None, help='sheet名称（默认第一个sheet）')
+
+    import_parser = subparsers.add_parser('import', help='把JSONL/Parquet中的用例生成为工作簿')
+    import_parser.add_argument('input_path', help='输入路径（.jsonl 或 .parquet）')
+    import_parser.add_argument('output_file', help='输出Excel文件路径')
+    import_parser.add_argument('--layout', choices=['merged', 'split'], default='merged',
+                               help='merged每个用例一行、步骤用#拼接（默认），split每个步骤一行')
+    import_parser.add_argument('--sheet-title', default='Sheet1', help='生成的sheet名称（默认Sheet1）')
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'export':
+            count = export_cases(args.input_file, args.output_path, args.sheet)
+            print(f"✅ 已导出 {count} 个用例到: {args.output_path}")
+        else:
+            count = import_cases(args.input_path, args.output_file, args.layout, args.sheet_title,
+                                 Recorder('import_cases', quiet=True))
+            print(f"✅ 已生成 {count} 个用例到: {args.output_file}")
+    except (OSError, ValueError, ImportError) as e:
+        print(f"❌ 错误: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
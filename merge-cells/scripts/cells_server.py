@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+常驻的合并/拆分/查看服务
+启动一次后保持openpyxl和各处理脚本已导入，工作进程池也已启动，
+之后每次请求只花实际处理的时间，不再重复付出conda激活、解释器启动和模块导入的开销。
+
+协议为JSON-RPC 2.0，每行一个请求/响应（UTF-8），可以通过Unix socket或标准输入/输出访问：
+    {"jsonrpc": "2.0", "id": 1, "method": "merge", "params": {"input_file": "a.xlsx", "output_file": "b.xlsx"}}
+    {"jsonrpc": "2.0", "id": 1, "result": {"file": "...", "ok": true, "seconds": 0.41, ...}}
+
+方法：
+    merge / split  params: input_file、output_file（默认覆盖原文件）、engine（默认full）、
+                   cache（是否使用结果缓存）、cache_dir、cache_size；结果同batch_cells.process_file
+    inspect        params: file_path、rows、sheet、max_width；结果同inspect_cells.inspect_workbook
+    ping           服务状态：pid、工作进程数、已处理请求数、运行时间
+    shutdown       处理完已收到的请求后退出
+
+同一连接上可以连续发送多个请求，由进程池并发处理，响应按完成顺序返回（用id对应）；
+客户端关闭写端后，服务写完这个连接上所有请求的响应才关闭连接。
+输入文件正是之前的请求还没写完的输出时，等那个请求完成后再处理，因此可以紧接着提交
+"merge a→b"和"split b→c"；输入文件是否存在在工作进程中开始处理时才检查。
+相对路径按服务进程的工作目录解析，建议使用绝对路径（call子命令会自动转换）。
+
+用法：
+    python cells_server.py serve [--socket 路径 | --stdio] [-j 进程数]
+    python cells_server.py call merge <输入文件> [<输出文件>] [--engine xml]
+    python cells_server.py call split <输入文件> [<输出文件>]
+    python cells_server.py call inspect <Excel文件> [-n 20]
+    python cells_server.py call ping|shutdown
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, wait
+
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(),
+                              f"merge-cells-{os.getuid() if hasattr(os, 'getuid') else 'user'}.sock")
+DEFAULT_WORKERS = 2
+
+# JSON-RPC错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+METHODS = ('merge', 'split', 'inspect', 'ping', 'shutdown')
+
+
+def warm_up():
+    """在工作进程中预先导入处理用到的模块（进程池的initializer）"""
+    import batch_cells  # noqa: F401  导入merge_cells、split_cells、openpyxl等
+    import inspect_cells  # noqa: F401
+    return os.getpid()
+
+
+def run_transform(mode, params):
+    """
+    在工作进程中执行合并/拆分
+
+    Args:
+        mode: 'merge' 或 'split'
+        params: 请求参数
+
+    Returns:
+        结果字典（见batch_cells.process_file）
+
+    Raises:
+        FileNotFoundError: 输入文件不存在（响应为INVALID_PARAMS）
+    """
+    from batch_cells import process_file
+
+    input_file = params['input_file']
+    if not os.path.isfile(input_file):
+        raise FileNotFoundError(f"输入文件不存在: {input_file}")
+    output_file = params.get('output_file') or input_file
+    cache_options = None
+    if params.get('cache'):
+        from result_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB
+        cache_options = (params.get('cache_dir') or DEFAULT_CACHE_DIR, params.get('cache_size') or DEFAULT_MAX_MB)
+    return process_file(mode, input_file, output_file, params.get('engine', 'full'), cache_options)
+
+
+def run_inspect(params):
+    """
+    在工作进程中查看工作簿
+
+    Args:
+        params: 请求参数
+
+    Returns:
+        inspect_cells.inspect_workbook()的结果
+
+    Raises:
+        FileNotFoundError: 文件不存在（响应为INVALID_PARAMS）
+    """
+    from inspect_cells import DEFAULT_MAX_WIDTH, DEFAULT_ROWS, inspect_workbook
+
+    if not os.path.isfile(params['file_path']):
+        raise FileNotFoundError(f"文件不存在: {params['file_path']}")
+
+    return inspect_workbook(params['file_path'], params.get('rows', DEFAULT_ROWS), params.get('sheet'),
+                            params.get('max_width', DEFAULT_MAX_WIDTH))
+
+
+def validate_params(method, params):
+    """
+    检查请求参数（文件是否存在在工作进程中检查，见run_transform、run_inspect）
+
+    Returns:
+        错误信息；参数正确时返回None
+    """
+    if not isinstance(params, dict):
+        return 'params必须是对象'
+    if method in ('merge', 'split'):
+        if not params.get('input_file'):
+            return '缺少input_file'
+        engines = ('full', 'stream', 'xml') if method == 'merge' else ('full', 'stream')
+        if params.get('engine', 'full') not in engines:
+            return f"{method}不支持引擎: {params.get('engine')}"
+    elif method == 'inspect':
+        if not params.get('file_path'):
+            return '缺少file_path'
+    return None
+
+
+class Server(object):
+    """
+    请求分发：解析JSON-RPC请求，把处理交给进程池，完成后通过回调写回响应
+
+    Attributes:
+        workers: 工作进程数
+        executor: 进程池
+        stopped: 收到shutdown后置位
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        from concurrent.futures import ProcessPoolExecutor
+
+        # 在父进程中先导入一次：fork启动的工作进程直接继承，spawn启动的由initializer导入
+        warm_up()
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+        # 提前启动所有工作进程，第一个请求不必等待进程启动
+        wait([self.executor.submit(warm_up) for _ in range(workers)])
+        self.stopped = threading.Event()
+        self._started = time.time()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._pending = 0
+        # 输出文件路径 -> 正在写它的请求（完成后置位的Future）
+        self._writing = {}
+        self._inflight = set()
+
+    def status(self):
+        """服务状态"""
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'workers': self.workers,
+                'requests': self._requests,
+                'pending': self._pending,
+                'uptime_seconds': round(time.time() - self._started, 1),
+            }
+
+    def handle_line(self, line, reply):
+        """
+        处理一行请求
+
+        Args:
+            line: 请求文本
+            reply: 写回响应的函数，参数为响应字典（可能在其他线程中调用）
+
+        Returns:
+            交给进程池的请求返回Future，响应写回后完成；其他请求已同步响应，返回None
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            reply(error_response(None, PARSE_ERROR, f'JSON解析失败: {e}'))
+            return
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            reply(error_response(None, INVALID_REQUEST, '请求必须是包含method的对象'))
+            return
+
+        request_id = request.get('id')
+        method = request['method']
+        params = request.get('params', {})
+        if method not in METHODS:
+            reply(error_response(request_id, METHOD_NOT_FOUND, f'未知方法: {method}'))
+            return
+        message = validate_params(method, params)
+        if message:
+            reply(error_response(request_id, INVALID_PARAMS, message))
+            return
+
+        with self._lock:
+            self._requests += 1
+        if method == 'ping':
+            reply(result_response(request_id, self.status()))
+            return
+        if method == 'shutdown':
+            reply(result_response(request_id, self.status()))
+            self.stopped.set()
+            return
+
+        # 输入正是之前某个请求还没写完的输出时，等那个请求完成后再提交
+        input_key = os.path.abspath(params['file_path' if method == 'inspect' else 'input_file'])
+        output_key = None
+        if method != 'inspect':
+            output_key = os.path.abspath(params.get('output_file') or params['input_file'])
+        replied = Future()
+        with self._lock:
+            self._pending += 1
+            after = self._writing.get(input_key)
+            if output_key:
+                self._writing[output_key] = replied
+            self._inflight.add(replied)
+
+        def done(future):
+            try:
+                reply(result_response(request_id, future.result()))
+            except FileNotFoundError as e:
+                reply(error_response(request_id, INVALID_PARAMS, str(e)))
+            except Exception as e:
+                reply(error_response(request_id, INTERNAL_ERROR, f'{type(e).__name__}: {e}'))
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    if output_key and self._writing.get(output_key) is replied:
+                        del self._writing[output_key]
+                    self._inflight.discard(replied)
+                replied.set_result(None)
+
+        def submit(_=None):
+            try:
+                if method == 'inspect':
+                    future = self.executor.submit(run_inspect, params)
+                else:
+                    future = self.executor.submit(run_transform, method, params)
+            except RuntimeError as e:
+                # 进程池已关闭
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(done)
+
+        if after is None:
+            submit()
+        else:
+            after.add_done_callback(submit)
+        return replied
+
+    def close(self):
+        """等待已收到的请求（包括等待前一个请求输出的请求）处理完并关闭进程池"""
+        with self._lock:
+            inflight = list(self._inflight)
+        wait(inflight)
+        self.executor.shutdown(wait=True)
+
+
+def result_response(request_id, result):
+    return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+
+def error_response(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def line_writer(stream):
+    """
+    返回线程安全的响应写出函数
+
+    Args:
+        stream: 二进制可写流
+    """
+    lock = threading.Lock()
+
+    def reply(response):
+        data = (json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8')
+        with lock:
+            try:
+                stream.write(data)
+                stream.flush()
+            except (BrokenPipeError, ConnectionResetError, ValueError):
+                # 客户端已断开
+                pass
+
+    return reply
+
+
+def serve_stdio(server):
+    """从标准输入逐行读取请求，响应写到标准输出；输入结束或收到shutdown后退出"""
+    reply = line_writer(sys.stdout.buffer)
+    for line in sys.stdin.buffer:
+        if line.strip():
+            server.handle_line(line.decode('utf-8'), reply)
+        if server.stopped.is_set():
+            break
+    server.close()
+
+
+def serve_socket(server, socket_path):
+    """
+    在Unix socket上监听，每个连接一个线程，连接上的请求交给进程池并发处理
+
+    Args:
+        server: Server对象
+        socket_path: socket文件路径
+    """
+    import socketserver
+
+    if os.path.exists(socket_path):
+        if ping_socket(socket_path):
+            print(f"❌ 服务已在运行: {socket_path}", file=sys.stderr)
+            server.close()
+            sys.exit(1)
+        # 上次异常退出留下的socket文件
+        os.remove(socket_path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            reply = line_writer(self.wfile)
+            pending = []
+            for line in self.rfile:
+                if line.strip():
+                    replied = server.handle_line(line.decode('utf-8'), reply)
+                    if replied is not None:
+                        pending.append(replied)
+                if server.stopped.is_set():
+                    break
+            # 客户端关闭写端后仍要写完已提交请求的响应，返回后连接即被关闭
+            wait(pending)
+
+    class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    previous_umask = os.umask(0o077)
+    try:
+        unix_server = UnixServer(socket_path, Handler)
+    finally:
+        os.umask(previous_umask)
+
+    watcher = threading.Thread(target=lambda: (server.stopped.wait(), unix_server.shutdown()), daemon=True)
+    watcher.start()
+    print(f"✅ 服务已启动: {socket_path}（{server.workers} 个工作进程，pid {os.getpid()}）", file=sys.stderr)
+    try:
+        unix_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        unix_server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server.close()
+    print("服务已停止", file=sys.stderr)
+
+
+def call(socket_path, method, params=None, timeout=None):
+    """
+    向服务发送一个请求并等待响应
+
+    Args:
+        socket_path: socket文件路径
+        method: 方法名
+        params: 参数字典
+        timeout: 超时秒数（None表示不限）
+
+    Returns:
+        响应字典（含result或error）
+    """
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params or {}}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError('服务没有返回响应')
+    return json.loads(line.decode('utf-8'))
+
+
+def ping_socket(socket_path):
+    """服务是否在该socket上运行"""
+    try:
+        return 'result' in call(socket_path, 'ping', timeout=5)
+    except (OSError, ValueError):
+        return False
+
+
+def call_params(args):
+    """把call子命令的参数转为请求参数（路径转为绝对路径）"""
+    params = json.loads(args.params) if args.params else {}
+    paths = [os.path.abspath(path) for path in args.paths]
+    if args.method in ('merge', 'split'):
+        if paths:
+            params['input_file'] = paths[0]
+        if len(paths) > 1:
+            params['output_file'] = paths[1]
+        if args.engine:
+            params['engine'] = args.engine
+        if args.cache:
+            params['cache'] = True
+    elif args.method == 'inspect':
+        if paths:
+            params['file_path'] = paths[0]
+        if args.rows is not None:
+            params['rows'] = args.rows
+    return params
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='常驻的合并/拆分/查看服务（JSON-RPC，Unix socket或标准输入输出）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='启动服务')
+    serve_parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f'Unix socket路径（默认 {DEFAULT_SOCKET}）')
+    serve_parser.add_argument('--stdio', action='store_true', help='改为从标准输入读取请求、响应写到标准输出')
+    serve_parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                              help=f'工作进程数（默认{DEFAULT_WORKERS}）')
+
+    call_parser = subparsers.add_parser('call', help='向运行中的服务发送一个请求，输出JSON结果')
+    call_parser.add_argument('method', choices=METHODS, help='方法名')
+    call_parser.add_argument('paths', nargs='*', help='merge/split: 输入文件 [输出文件]；inspect: Excel文件')
+    call_parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f'Unix socket路径（默认 {DEFAULT_SOCKET}）')
+    call_parser.add_argument('--engine', default=None, help='merge/split的处理引擎')
+    call_parser.add_argument('--cache', action='store_true', help='merge/split使用结果缓存')
+    call_parser.add_argument('-n', '--rows', type=int, default=None, help='inspect读取的行数')
+    call_parser.add_argument('--params', default=None, help='其他参数（JSON对象）')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        if not args.stdio and not hasattr(socket, 'AF_UNIX'):
+            parser.error('当前平台不支持Unix socket，请使用 --stdio')
+        server = Server(args.workers)
+        if args.stdio:
+            serve_stdio(server)
+        else:
+            serve_socket(server, args.socket)
+        return
+
+    try:
+        response = call(args.socket, args.method, call_params(args))
+    except (OSError, ValueError) as e:
+        print(f"❌ 无法连接服务 {args.socket}: {e}（先运行 cells_server.py serve）", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(response.get('result', response.get('error')), ensure_ascii=False))
+    if 'error' in response or response['result'].get('ok') is False:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
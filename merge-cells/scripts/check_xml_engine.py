@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+XML快速路径（--engine xml）与默认引擎的一致性检查
+生成带合并单元格、样式和共享字符串的合成用例表，分别用默认引擎和XML快速路径合并，
+逐个单元格对比值和样式，以及合并区域、列宽、行高和输出文件的权限（新建时与默认引擎相同，
+原地合并时保持原文件的权限）；不一致或快速路径回退时退出码为1。
+修改xml_engine.py后运行一次即可发现快速路径的回归。
+
+合成用例表覆盖快速路径需要原样保留或重写的内容：
+    二级/三级模块列按用例块纵向合并，部分用例的备注和维护人横向合并（合并后随行上移）
+    用例名称有字体、填充、边框和自动换行样式
+    文本单元格改为共享字符串（openpyxl保存时写的是内联字符串），其中一项为多段富文本，维护人列保留内联字符串
+    步骤描述/预期结果中有空单元格、只有空白的单元格、已有#号前缀、数字、
+    XML特殊字符（& < > "）、首尾空格和换行、重复出现的文本（共享字符串）
+    用例之间夹有空行，最后一个用例后还有带样式的空行
+
+用法：
+    python check_xml_engine.py [-n 用例数] [--seed 随机种子] [--rounds 轮数] [--keep 目录]
+"""
+
+import argparse
+import os
+import random
+import re
+import shutil
+import stat
+import sys
+import tempfile
+import zipfile
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+from instrumentation import Recorder
+from merge_cells import merge_cells
+from xml_engine import UnsupportedSheet, xml_merge_cells
+
+
+HEADER = ('ID', '一级模块', '二级模块', '三级模块', '用例名称', '优先级', '用例类型',
+          '前置条件', '步骤描述', '预期结果', '备注', '维护人')
+COLUMN_WIDTHS = {'A': 8.75, 'B': 20.75, 'C': 15.75, 'E': 40.75, 'I': 60.75, 'J': 60.75}
+# 步骤文本的取值：重复的文本走共享字符串，其余覆盖转义、空白和数字等情况
+STEP_TEXTS = ('打开订舱页面', '点击保存', '#已有前缀的步骤', '  首尾有空格  ', '第一行\n第二行',
+              '航程类型 & 订单 <直达> "中转"', '   ', 12345, 3.5, None)
+MODULES = ('订舱管理', '海运订单管理', '线上数据运维')
+MAX_DIFFS = 20
+# 原地合并前给输入文件设置的权限（合并后应保持不变）
+INPLACE_MODE = 0o640
+# 改为多段富文本的共享字符串
+RICH_TEXT = '点击保存'
+INLINE_CELL_RE = re.compile(
+    r'<c r="([A-Z]+)(\d+)"([^>]*?) t="inlineStr"><is><t(?: xml:space="preserve")?>(.*?)</t></is></c>', re.S)
+SHARED_STRINGS_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml'
+SHARED_STRINGS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings'
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+HEADER_FONT = Font(name='宋体', bold=True, size=11)
+CASE_FONT = Font(name='微软雅黑', color='FF1F4E79')
+CASE_FILL = PatternFill('solid', fgColor='FFDDEBF7')
+THIN = Side(style='thin', color='FF999999')
+CASE_BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+WRAP = Alignment(wrap_text=True, vertical='top')
+
+
+def build_workbook(path, n_cases, seed=0):
+    """
+    生成合成用例表（展开布局：每个步骤一行，合并的输入）
+
+    Args:
+        path: 输出路径
+        n_cases: 用例数
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '测试用例'
+    ws.append(HEADER)
+    for cell in ws[1]:
+        cell.font = HEADER_FONT
+        cell.fill = CASE_FILL
+    for letter, width in COLUMN_WIDTHS.items():
+        ws.column_dimensions[letter].width = width
+    ws.row_dimensions[1].height = 30
+
+    row = 2
+    for case_no in range(1, n_cases + 1):
+        steps = rng.randint(1, 5)
+        first = row
+        module = rng.choice(MODULES)
+        for step_no in range(steps):
+            if step_no == 0:
+                ws.cell(row, 1, case_no)
+                ws.cell(row, 2, module)
+                ws.cell(row, 3, f'{module}-功能{case_no % 7}')
+                name = ws.cell(row, 5, f'#77879-A{case_no:03d}-{module}')
+                name.font = CASE_FONT
+                name.fill = CASE_FILL
+                name.border = CASE_BORDER
+                name.alignment = WRAP
+                ws.cell(row, 6, rng.choice(('P0', 'P1', 'P2')))
+                ws.cell(row, 7, '功能测试')
+                ws.cell(row, 12, '张三')
+            for col in (9, 10):
+                cell = ws.cell(row, col, rng.choice(STEP_TEXTS))
+                cell.alignment = WRAP
+            if rng.random() < 0.3:
+                ws.row_dimensions[row].height = 52.5
+            row += 1
+        if steps > 1:
+            ws.merge_cells(start_row=first, start_column=2, end_row=row - 1, end_column=2)
+            ws.merge_cells(start_row=first, start_column=3, end_row=row - 1, end_column=3)
+        if rng.random() < 0.3:
+            ws.cell(first, 11, '备注横向合并')
+            ws.merge_cells(start_row=first, start_column=11, end_row=first, end_column=12)
+        if rng.random() < 0.2:
+            # 用例之间的空行（合并后删除）
+            row += 1
+    ws.cell(row + 1, 11).fill = CASE_FILL
+    wb.save(path)
+    share_strings(path)
+
+
+def share_strings(path):
+    """
+    把工作簿中的内联字符串改为共享字符串表（Excel保存的文件都是这种形式）
+
+    维护人列（L）保留内联字符串，RICH_TEXT写为多段富文本
+    """
+    with zipfile.ZipFile(path) as zf:
+        members = [(info, zf.read(info.filename)) for info in zf.infolist()]
+    strings = {}
+
+    def to_shared(match):
+        col, row, attrs, text = match.groups()
+        if col == 'L':
+            return match.group(0)
+        idx = strings.setdefault(text, len(strings))
+        return f'<c r="{col}{row}"{attrs} t="s"><v>{idx}</v></c>'
+
+    items = []
+    rewritten = []
+    for info, data in members:
+        if info.filename == 'xl/worksheets/sheet1.xml':
+            data = INLINE_CELL_RE.sub(to_shared, data.decode('utf-8')).encode('utf-8')
+        elif info.filename == '[Content_Types].xml':
+            data = data.replace(b'</Types>', f'<Override PartName="/xl/sharedStrings.xml" '
+                                             f'ContentType="{SHARED_STRINGS_TYPE}" /></Types>'.encode('utf-8'))
+        elif info.filename == 'xl/_rels/workbook.xml.rels':
+            data = data.replace(b'</Relationships>', f'<Relationship Type="{SHARED_STRINGS_REL}" '
+                                                     f'Target="sharedStrings.xml" Id="rIdSst" />'
+                                                     f'</Relationships>'.encode('utf-8'))
+        rewritten.append((info.filename, data))
+    for text in strings:
+        if text == RICH_TEXT:
+            items.append('<si><r><rPr><b/></rPr><t>点击</t></r><r><t xml:space="preserve">保存</t></r></si>')
+        else:
+            items.append(f'<si><t xml:space="preserve">{text}</t></si>')
+    rewritten.append(('xl/sharedStrings.xml',
+                      f'<sst xmlns="{MAIN_NS}" count="{len(items)}" uniqueCount="{len(items)}">{"".join(items)}</sst>'
+                      .encode('utf-8')))
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in rewritten:
+            zf.writestr(name, data)
+
+
+def cell_signature(cell):
+    """单元格的值和样式（用于对比）"""
+    return (cell.value, cell.data_type, cell.number_format, repr(cell.font), repr(cell.fill),
+            repr(cell.border), repr(cell.alignment), repr(cell.protection))
+
+
+def compare_workbooks(expected_file, actual_file):
+    """
+    逐个单元格对比两个工作簿第一个sheet的值和样式，以及合并区域、列宽、行高
+
+    Returns:
+        差异描述列表
+    """
+    diffs = []
+    expected_wb = load_workbook(expected_file)
+    actual_wb = load_workbook(actual_file)
+    expected, actual = expected_wb.worksheets[0], actual_wb.worksheets[0]
+
+    add = diffs.append
+    if expected.title != actual.title:
+        add(f"sheet名称: {expected.title!r} != {actual.title!r}")
+    if (expected.max_row, expected.max_column) != (actual.max_row, actual.max_column):
+        add(f"大小: {expected.max_row}x{expected.max_column} != {actual.max_row}x{actual.max_column}")
+    for expected_row, actual_row in zip(expected.iter_rows(), actual.iter_rows()):
+        for expected_cell, actual_cell in zip(expected_row, actual_row):
+            if expected_cell.value != actual_cell.value:
+                add(f"{expected_cell.coordinate}: {expected_cell.value!r} != {actual_cell.value!r}")
+            elif cell_signature(expected_cell) != cell_signature(actual_cell):
+                add(f"{expected_cell.coordinate}: 样式不同")
+    expected_ranges = sorted(str(rng) for rng in expected.merged_cells.ranges)
+    actual_ranges = sorted(str(rng) for rng in actual.merged_cells.ranges)
+    if expected_ranges != actual_ranges:
+        add(f"合并区域: {set(expected_ranges) ^ set(actual_ranges)}")
+    for letter in set(expected.column_dimensions) | set(actual.column_dimensions):
+        if expected.column_dimensions[letter].width != actual.column_dimensions[letter].width:
+            add(f"列宽 {letter}: {expected.column_dimensions[letter].width} != {actual.column_dimensions[letter].width}")
+    for row in range(1, expected.max_row + 1):
+        if expected.row_dimensions[row].height != actual.row_dimensions[row].height:
+            add(f"行高 {row}: {expected.row_dimensions[row].height} != {actual.row_dimensions[row].height}")
+    expected_wb.close()
+    actual_wb.close()
+    return diffs
+
+
+def check_round(workdir, n_cases, seed):
+    """
+    一轮检查：生成合成用例表，两种引擎分别合并后对比
+
+    Returns:
+        差异描述列表（快速路径回退时也作为差异返回）
+    """
+    input_file = os.path.join(workdir, f'input-{seed}.xlsx')
+    full_file = os.path.join(workdir, f'full-{seed}.xlsx')
+    xml_file = os.path.join(workdir, f'xml-{seed}.xlsx')
+    build_workbook(input_file, n_cases, seed)
+    merge_cells(input_file, full_file, engine='full', recorder=Recorder('merge_cells', quiet=True))
+    inplace_file = os.path.join(workdir, f'inplace-{seed}.xlsx')
+    shutil.copyfile(input_file, inplace_file)
+    os.chmod(inplace_file, INPLACE_MODE)
+    try:
+        xml_merge_cells(input_file, xml_file, Recorder('merge_cells', quiet=True))
+        xml_merge_cells(inplace_file, None, Recorder('merge_cells', quiet=True))
+    except UnsupportedSheet as e:
+        return [f"XML快速路径回退到了默认引擎: {e}"]
+    diffs = compare_workbooks(full_file, xml_file)
+    full_mode, xml_mode = file_mode(full_file), file_mode(xml_file)
+    if full_mode != xml_mode:
+        diffs.append(f"新建输出文件的权限: {full_mode:o} != {xml_mode:o}")
+    if file_mode(inplace_file) != INPLACE_MODE:
+        diffs.append(f"原地合并后的权限: {INPLACE_MODE:o} != {file_mode(inplace_file):o}")
+    return diffs
+
+
+def file_mode(path):
+    """文件的权限位"""
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='检查XML快速路径与默认引擎的合并结果是否一致')
+    parser.add_argument('-n', '--cases', type=int, default=300, help='每轮的用例数（默认300）')
+    parser.add_argument('--seed', type=int, default=0, help='第一轮的随机种子（默认0）')
+    parser.add_argument('--rounds', type=int, default=3, help='检查轮数，每轮换一个随机种子（默认3）')
+    parser.add_argument('--keep', default=None, help='把合成的输入和两种引擎的输出保存到该目录（默认用完即删）')
+    args = parser.parse_args()
+
+    workdir = args.keep or tempfile.mkdtemp(prefix='check-xml-engine-')
+    os.makedirs(workdir, exist_ok=True)
+    failed = 0
+    try:
+        for seed in range(args.seed, args.seed + args.rounds):
+            diffs = check_round(workdir, args.cases, seed)
+            if diffs:
+                failed += 1
+                print(f"❌ 种子 {seed}: {len(diffs)} 处不一致")
+                for diff in diffs[:MAX_DIFFS]:
+                    print(f"    {diff}")
+                if len(diffs) > MAX_DIFFS:
+                    print(f"    ... 等 {len(diffs) - MAX_DIFFS} 处")
+            else:
+                print(f"✅ 种子 {seed}: {args.cases} 个用例，两种引擎的结果一致")
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if failed:
+        print(f"\n❌ {failed}/{args.rounds} 轮不一致")
+        sys.exit(1)
+    print(f"\n✅ 全部 {args.rounds} 轮一致")
+
+
+if __name__ == '__main__':
+    main()
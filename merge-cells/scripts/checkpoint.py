@@ -0,0 +1,449 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分段、可断点续跑、可只处理一部分用例的合并/拆分（基于流式引擎，不保留样式）
+按用例块（见stream_engine.iter_case_blocks）分段，每chunk_size个用例为一段：
+    每处理完一段，把输出行写入检查点目录下的chunk-NNNNN.pkl，再更新state.json
+    （下一段从输入的第几行开始、已完成的段、累计统计）。
+    中途失败或被中断后用相同的参数重新运行，从state.json记录的行继续，已完成的段不再处理；
+    输入文件（大小、修改时间）、脚本版本或范围选项变化时检查点作废，从头开始。
+全部段完成后，按顺序把各段的输出行写入write_only工作簿，先保存为输出目录下的临时文件再替换输出文件：
+替换前输出文件（包括默认覆盖的输入文件）保持原样；保存失败时检查点保留，重新运行只需重做这一步。
+成功后删除检查点目录。不使用检查点时各段写在临时目录中，结束后删除。
+
+范围选择（只处理大表的一部分，输出中只有选中的用例）：
+    rows: Excel行号范围（如 "2:5000"），用例名称所在行在范围内的用例整块处理；读过范围的结尾后不再读取
+    modules: 模块条件列表，"值"匹配任一X级模块列，"二级模块=值"匹配指定的列，满足任一条件即选中
+    选择范围时每个用例第一行的X级模块列按合并区域向下补全（拆分后的布局中模块列通常跨多个用例合并，
+    否则选出的用例会缺少模块）。
+"""
+
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+
+from instrumentation import Recorder
+from pipeline import merge_columns_of
+from result_cache import scripts_version
+from sheet_model import FIRST_DATA_ROW, cell_text, parse_row_range
+from stream_engine import (
+    append_split_row,
+    blank_merged_runs,
+    drop_trailing_empty,
+    fill_merged,
+    iter_sheet_rows,
+    merge_stage,
+    merged_cell_ranges,
+    read_merged_ranges,
+    require_columns,
+    save_streaming,
+    split_stage,
+)
+
+
+STATE_FILE = 'state.json'
+STATE_VERSION = 1
+DEFAULT_CHUNK_CASES = 1000
+CHECKPOINT_SUFFIX = '.checkpoint'
+STATS_KEYS = {
+    'merge': ('rows_in', 'rows_out', 'prefixed', 'cases', 'merged', 'deleted'),
+    'split': ('rows_in', 'split', 'inserted', 'cleared', 'deleted'),
+}
+
+
+def resolve_module_filters(modules, header, columns):
+    """
+    把模块条件解析为列号
+
+    Args:
+        modules: 条件列表，"值" 或 "列名=值"
+        header: 表头tuple
+        columns: detect_columns()的返回值
+
+    Returns:
+        [(列号列表（1-based）, 值)]
+
+    Raises:
+        ValueError: 没有模块列，或指定的列不是模块列
+    """
+    if not columns['modules']:
+        raise ValueError("表头中没有X级模块列，不能按模块选择")
+    names = {str(header[col - 1]).strip(): col for col in columns['modules']}
+    filters = []
+    for spec in modules:
+        name, sep, value = spec.partition('=')
+        if not sep:
+            filters.append((columns['modules'], spec.strip()))
+        elif name.strip() in names:
+            filters.append(([names[name.strip()]], value.strip()))
+        else:
+            raise ValueError(f"'{name.strip()}' 不是模块列（模块列: {', '.join(names)}）")
+    return filters
+
+
+def iter_numbered_blocks(rows, columns, end_row=None, merged_starts=None):
+    """
+    按用例块读取数据行，附带每块的起始行号
+
+    Args:
+        rows: 数据行迭代器（从第FIRST_DATA_ROW行开始）
+        columns: detect_columns()的返回值
+        end_row: 用例名称所在行超过这一行时停止读取
+        merged_starts: read_merged_ranges()的结果；给出时每块第一行的X级模块列按合并区域补全
+
+    Yields:
+        (起始行号, 行列表)
+    """
+    case_idx = columns['case_name'] - 1
+    fill_cols = {col - 1 for col in columns['modules']}
+    fills = {}
+    block, block_start = [], FIRST_DATA_ROW
+    for row_idx, row_values in enumerate(rows, FIRST_DATA_ROW):
+        first_values = row_values
+        if merged_starts and (fills or row_idx in merged_starts):
+            first_values = tuple(fill_merged(row_values, row_idx, merged_starts.get(row_idx, ()), fills, fill_cols))
+        if cell_text(row_values[case_idx]):
+            if block:
+                yield block_start, block
+            if end_row is not None and row_idx > end_row:
+                return
+            block, block_start = [first_values], row_idx
+            continue
+        block.append(row_values)
+    if block:
+        yield block_start, block
+
+
+def block_selected(start_row, block, case_idx, row_range=None, module_filters=None):
+    """
+    用例块是否在选择范围内（块的起始行在行范围内，且第一行满足任一模块条件）
+    """
+    start, end = row_range or (None, None)
+    if (start is not None and start_row < start) or (end is not None and start_row > end):
+        return False
+    if module_filters:
+        first = block[0]
+        if not cell_text(first[case_idx]):
+            return False
+        return any(cell_text(first[col - 1]) == value for cols, value in module_filters for col in cols)
+    return True
+
+
+def default_checkpoint_dir(output_file):
+    """默认检查点目录：<输出文件>.checkpoint"""
+    return os.path.abspath(output_file) + CHECKPOINT_SUFFIX
+
+
+def load_state(checkpoint_dir, signature):
+    """读取检查点状态（不存在、损坏或与本次运行的输入、选项不符时返回None）"""
+    try:
+        with open(os.path.join(checkpoint_dir, STATE_FILE), encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('signature') != signature:
+        return None
+    if not all(os.path.exists(os.path.join(checkpoint_dir, chunk['file'])) for chunk in state['chunks']):
+        return None
+    return state
+
+
+def save_state(checkpoint_dir, state):
+    """写入检查点状态（先写临时文件再替换）"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=checkpoint_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(checkpoint_dir, STATE_FILE))
+
+
+def write_chunk(checkpoint_dir, index, rows):
+    """
+    把一段的输出行写入检查点目录（先写临时文件再替换）
+
+    Returns:
+        段文件名
+    """
+    name = f'chunk-{index:05d}.pkl'
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=checkpoint_dir)
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, os.path.join(checkpoint_dir, name))
+    return name
+
+
+def iter_chunk_rows(checkpoint_dir, chunks):
+    """按顺序逐段读出各段的输出行"""
+    for chunk in chunks:
+        with open(os.path.join(checkpoint_dir, chunk['file']), 'rb') as f:
+            yield from pickle.load(f)
+
+
+def chunked_process(mode, input_file, output_file=None, recorder=None, checkpoint_dir=None,
+                    chunk_size=DEFAULT_CHUNK_CASES, rows=None, modules=None):
+    """
+    分段合并/拆分第一个sheet（处理逻辑同流式引擎），可从检查点继续，可只处理选中的用例
+
+    Args:
+        mode: 'merge' 或 'split'
+        input_file: 输入Excel文件路径
+        output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        recorder: Recorder对象（可选）
+        checkpoint_dir: 检查点目录（None表示不保留检查点，中断后需要从头处理）
+        chunk_size: 每段的用例数
+        rows: 行范围字符串（如 "2:5000"），只处理用例名称所在行在范围内的用例
+        modules: 模块条件列表（"值" 或 "列名=值"），只处理满足任一条件的用例
+    """
+    recorder = recorder or Recorder('merge_cells' if mode == 'merge' else 'split_cells')
+    if output_file is None:
+        output_file = input_file
+    try:
+        row_range = parse_row_range(rows) if rows else None
+    except ValueError as e:
+        recorder.fail(f"错误: {e}")
+
+    stat = os.stat(input_file)
+    signature = {
+        'version': STATE_VERSION,
+        'mode': mode,
+        'input': os.path.abspath(input_file),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'scripts': scripts_version(),
+        'rows': rows,
+        'modules': list(modules or ()),
+    }
+    keep = checkpoint_dir is not None
+    if keep:
+        state = load_state(checkpoint_dir, signature)
+        if state is None and os.path.isdir(checkpoint_dir):
+            shutil.rmtree(checkpoint_dir)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    else:
+        state = None
+        checkpoint_dir = tempfile.mkdtemp(suffix=CHECKPOINT_SUFFIX, dir=os.path.dirname(os.path.abspath(output_file)))
+    recorder.set(engine='stream', chunked={'checkpoint': checkpoint_dir if keep else None, 'chunk_size': chunk_size,
+                                           'rows': rows, 'modules': modules})
+
+    try:
+        resumed = state is not None
+        if state is None:
+            state = {'signature': signature, 'sheet': None, 'header': None, 'next_row': FIRST_DATA_ROW,
+                     'complete': False, 'chunks': [], 'skipped_cases': 0,
+                     'stats': dict.fromkeys(STATS_KEYS[mode], 0)}
+        resumed_chunks = len(state['chunks'])
+        if resumed:
+            recorder.log(f"从检查点继续: 已完成 {resumed_chunks} 段，"
+                         + ("只需保存文件" if state['complete'] else f"从第{state['next_row']}行继续处理"))
+        if not state['complete']:
+            process_chunks(mode, input_file, state, checkpoint_dir, chunk_size, row_range, modules, keep, recorder)
+        save_chunks(mode, output_file, state, checkpoint_dir, keep, recorder)
+        recorder.count(chunks=len(state['chunks']), resumed_chunks=resumed_chunks,
+                       skipped_cases=state['skipped_cases'])
+    except BaseException:
+        # 出错或中断时保留检查点（临时目录除外）
+        if not keep:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        raise
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+
+def process_chunks(mode, input_file, state, checkpoint_dir, chunk_size, row_range, modules, keep, recorder):
+    """
+    读取输入并逐段处理、写入检查点，全部完成后把state标记为complete
+
+    Args:
+        mode: 'merge' 或 'split'
+        input_file: 输入Excel文件路径
+        state: 检查点状态，会被更新
+        checkpoint_dir: 检查点目录
+        chunk_size: 每段的用例数
+        row_range: (起始行, 结束行) 或 None
+        modules: 模块条件列表或None
+        keep: 是否保留检查点（出错时提示重新运行）
+        recorder: Recorder对象
+    """
+    with recorder.stage('load', '打开工作簿（只读流式）'):
+        in_wb = load_workbook(input_file, read_only=True, data_only=True, keep_vba=False)
+        in_ws = in_wb.active
+        header, data_rows = iter_sheet_rows(in_ws)
+    recorder.set(sheet=in_ws.title)
+    recorder.log(f"处理Sheet: {in_ws.title}（分段流式模式，每段 {chunk_size} 个用例）")
+
+    columns = require_columns(header, recorder)
+    case_idx = columns['case_name'] - 1
+    step_desc_col = columns['step_desc']
+    expected_result_col = columns['expected_result']
+    module_filters = None
+    merged_starts = None
+    if row_range or modules:
+        try:
+            module_filters = resolve_module_filters(modules, header, columns) if modules else None
+        except ValueError as e:
+            in_wb.close()
+            recorder.fail(f"错误: {e}")
+        merged_starts = read_merged_ranges(input_file, in_ws._worksheet_path)
+    state['sheet'] = in_ws.title
+    state['header'] = list(header)
+
+    def flush(blocks, next_row):
+        chunk_stats = dict.fromkeys(STATS_KEYS[mode], 0)
+        if mode == 'merge':
+            out_rows = list(merge_stage(blocks, columns['case_name'], step_desc_col, expected_result_col, chunk_stats))
+        else:
+            out_rows = list(split_stage(blocks, step_desc_col, expected_result_col, chunk_stats))
+        name = write_chunk(checkpoint_dir, len(state['chunks']), out_rows)
+        state['chunks'].append({'file': name, 'first_row': first_row, 'rows': len(out_rows)})
+        for key, value in chunk_stats.items():
+            state['stats'][key] += value
+        state['next_row'] = next_row
+        if keep:
+            save_state(checkpoint_dir, state)
+
+    end_row = row_range[1] if row_range else None
+    pending = []
+    pending_cases = 0
+    skipped = 0
+    first_row = state['next_row']
+    start_row = first_row
+    with recorder.stage('steps', '逐段读取、处理并写入检查点'):
+        try:
+            for start_row, block in iter_numbered_blocks(data_rows, columns, end_row, merged_starts):
+                if start_row < state['next_row']:
+                    continue
+                if not block_selected(start_row, block, case_idx, row_range, module_filters):
+                    skipped += 1 if cell_text(block[0][case_idx]) else 0
+                    continue
+                if not pending:
+                    first_row = start_row
+                pending.append(block)
+                pending_cases += 1
+                if pending_cases >= chunk_size:
+                    state['skipped_cases'] += skipped
+                    skipped = 0
+                    flush(pending, start_row + len(block))
+                    recorder.log(f"  第{len(state['chunks'])}段完成（第{first_row}-{start_row + len(block) - 1}行）")
+                    pending, pending_cases = [], 0
+            if pending:
+                flush(pending, start_row + len(pending[-1]))
+                recorder.log(f"  第{len(state['chunks'])}段完成（第{first_row}行起）")
+        except Exception as e:
+            hint = f"，已完成的段保存在检查点 {checkpoint_dir} 中，修正后重新运行将从第{state['next_row']}行继续" if keep else ''
+            error_row = first_row if pending else start_row
+            recorder.fail(f"\n❌ 处理第{error_row}行起的用例时出错: {type(e).__name__}: {e}{hint}")
+        finally:
+            in_wb.close()
+    state['skipped_cases'] += skipped
+    state['complete'] = True
+    if keep:
+        save_state(checkpoint_dir, state)
+
+
+def save_chunks(mode, output_file, state, checkpoint_dir, keep, recorder):
+    """
+    把各段的输出行按顺序写入新工作簿并原子地替换输出文件
+
+    Args:
+        mode: 'merge' 或 'split'
+        output_file: 输出Excel文件路径
+        state: 已完成的检查点状态
+        checkpoint_dir: 检查点目录
+        keep: 是否保留检查点（保存失败时提示重新运行）
+        recorder: Recorder对象
+    """
+    header = tuple(state['header'])
+    stats = dict(state['stats'])
+    out_wb = Workbook(write_only=True)
+    out_ws = out_wb.create_sheet(state['sheet'])
+    rows = iter_chunk_rows(checkpoint_dir, state['chunks'])
+    try:
+        with recorder.stage('save', '按顺序写出各段并保存文件'):
+            if mode == 'merge':
+                out_ws.append(header)
+                for row_values in rows:
+                    out_ws.append(row_values)
+                row_idx = stats['rows_out'] + 1
+            else:
+                merge_cols = merge_columns_of(require_columns(header, recorder))
+                recorder.log(f"需要合并的列: {[get_column_letter(col) for col in merge_cols]}")
+                ranges = []
+                append_split_row(out_ws, header, 1)
+                row_idx = 1
+                for row_values in blank_merged_runs(drop_trailing_empty(rows, stats), merge_cols, ranges):
+                    row_idx += 1
+                    append_split_row(out_ws, row_values, row_idx)
+                out_ws.merged_cells = merged_cell_ranges(ranges)
+                stats['merged_ranges'] = len(ranges)
+            save_streaming(out_wb, output_file)
+    except Exception as e:
+        hint = f"\n检查点保存在 {checkpoint_dir} 中，重新运行相同的命令将直接从保存这一步继续" if keep else ''
+        recorder.fail(f"\n❌ 保存文件时出错: {e}{hint}")
+
+    if mode == 'merge':
+        recorder.log(f"已为 {stats['prefixed']} 个单元格添加#号前缀")
+        recorder.log(f"找到 {stats['cases']} 个用例名称有值的行，共合并了 {stats['merged']} 组内容")
+        recorder.log(f"删除了 {stats['deleted']} 个空行（处理行数: {stats['rows_in']}, 输出行数: {row_idx}）")
+        recorder.count(rows_before=stats['rows_in'] + 1, rows_after=row_idx, columns=len(header),
+                       prefixed=stats['prefixed'], cases=stats['cases'], merged_blocks=stats['merged'],
+                       deleted=stats['deleted'])
+    else:
+        recorder.log(f"拆分了 {stats['split']} 行，共插入 {stats['inserted']} 行新数据")
+        recorder.log(f"清空了 {stats['cleared']} 个单元格中的#号")
+        recorder.log(f"合并了 {stats['merged_ranges']} 组单元格，已设置 {row_idx} 行的行高为50磅")
+        recorder.log(f"删除了 {stats['deleted']} 个尾部空行")
+        recorder.count(rows_before=stats['rows_in'] + 1, rows_after=row_idx, columns=len(header),
+                       split=stats['split'], inserted=stats['inserted'], cleared=stats['cleared'],
+                       merged_ranges=stats['merged_ranges'], deleted=stats['deleted'])
+    if state['skipped_cases']:
+        recorder.log(f"未选中的用例: {state['skipped_cases']} 个（不在输出中）")
+    recorder.log(f"\n✅ 处理完成！文件已保存到: {output_file}")
+
+
+def add_checkpoint_arguments(parser):
+    """给命令行加上--checkpoint、--checkpoint-dir、--chunk-size、--rows和--module参数"""
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='分段处理并保存检查点，中断或出错后重新运行相同的命令从中断处继续（基于流式引擎，不保留样式）')
+    parser.add_argument('--checkpoint-dir', default=None, help=f'检查点目录（默认 <输出文件>{CHECKPOINT_SUFFIX}）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_CASES,
+                        help=f'每段的用例数（默认{DEFAULT_CHUNK_CASES}）')
+    parser.add_argument('--rows', default=None,
+                        help='只处理用例名称所在行在此范围内的用例（Excel行号，如 2:5000、100:），输出中只有选中的用例')
+    parser.add_argument('--module', action='append', default=None, metavar='[列名=]值',
+                        help='只处理X级模块等于该值的用例（如 录入SO 或 二级模块=录入SO），可多次指定，满足任一即可')
+
+
+def check_checkpoint_arguments(parser, args, engines=('full', 'stream')):
+    """
+    检查分段处理参数与其他参数的组合（不合法时parser.error退出）
+
+    Returns:
+        是否使用分段处理
+    """
+    if not (args.checkpoint or args.checkpoint_dir or args.rows or args.module):
+        return False
+    if args.engine not in engines or args.all_sheets or getattr(args, 'incremental', False):
+        parser.error('--checkpoint/--rows/--module 基于流式引擎，不能与 --all-sheets、--incremental 或其他引擎同时使用')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size 应大于0')
+    if args.rows:
+        try:
+            parse_row_range(args.rows)
+        except ValueError as e:
+            parser.error(str(e))
+    if (args.rows or args.module) and (args.output_file is None or (
+            os.path.exists(args.output_file) and os.path.samefile(args.input_file, args.output_file))):
+        parser.error('--rows/--module 的输出中只有选中的用例，需要指定与输入不同的输出文件')
+    return True
+
+
+def checkpoint_dir_from_args(args):
+    """按命令行参数确定检查点目录（未启用检查点时返回None）"""
+    if args.checkpoint_dir:
+        return args.checkpoint_dir
+    if args.checkpoint:
+        return default_checkpoint_dir(args.output_file or args.input_file)
+    return None
@@ -0,0 +1,441 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+跨工作簿的重复、近似重复测试用例检测（MinHash + LSH）
+每个用例取步骤描述、预期结果按#拆分后的片段（split_by_hash，合并后和拆分后的布局都支持），
+去掉空白和步骤序号后：
+    完全相同的用例：按文本摘要分组
+    近似重复的用例：文本的3字符shingle集合计算64个MinHash值，分成16段（每段4个值），
+        任一段完全相同的用例成为候选，再用MinHash估计的Jaccard相似度（相同位置的值相等的比例）
+        确认是否达到阈值，用并查集合并成组
+每个用例只与同一个桶中的第一个用例比较，总耗时与用例数大致成线性，不需要两两比较。
+
+索引（每个工作簿的用例名称、文本摘要和MinHash签名）保存在JSON文件中，按大小和修改时间判断工作簿是否变化，
+只重新读取新增或变化的工作簿；已不存在的工作簿从索引中删除。多次运行时传入新的目录或文件即可把它们加入
+语料库，报告覆盖索引中的全部工作簿（--new-only只报告包含本次新增/变化用例的组）。
+
+用法：
+    python dedup_cases.py [工作簿、目录或glob模式...] [--threshold 0.8] [--new-only] [--json]
+                          [--index 索引文件] [--limit 20] [-j 进程数]
+    （默认目录 sea-gen-testcases/testcases）
+"""
+
+import argparse
+import base64
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from case_export import iter_case_records
+from sheet_model import detect_columns
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.dirname(SCRIPT_DIR)), 'sea-gen-testcases', 'testcases')
+DEFAULT_INDEX = os.path.join(os.path.expanduser('~'), '.cache', 'merge-cells', 'dedup-index.json')
+INDEX_VERSION = 1
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.8
+DIGEST_SIZE = 8
+# MinHash的哈希函数 (a * x + b) mod PRIME，系数固定，索引在多次运行之间可以复用
+PRIME = np.uint64(4294967291)
+_COEFFICIENTS = np.random.RandomState(20240601).randint(1, 2 ** 31 - 1, size=(2, NUM_PERM)).astype(np.uint64)
+HASH_A = _COEFFICIENTS[0][:, None]
+HASH_B = _COEFFICIENTS[1][:, None]
+# 一次计算签名的shingle数上限（控制中间矩阵的内存）
+CHUNK_SHINGLES = 200000
+
+STEP_NUMBER_RE = re.compile(r'^(?:步骤)?\d+[、.．:：)）]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_fragment(fragment):
+    """片段归一化：去掉空白和开头的步骤序号（如 "1、"），统一小写"""
+    text = WHITESPACE_RE.sub('', fragment)
+    return STEP_NUMBER_RE.sub('', text).lower()
+
+
+def case_text(steps, results):
+    """
+    用例的比较文本：步骤描述、预期结果的片段归一化后拼接
+
+    Returns:
+        文本，没有任何步骤内容时返回空字符串
+    """
+    parts = [normalize_fragment(part) for part in steps if part]
+    parts.append('\x1e')
+    parts.extend(normalize_fragment(part) for part in results if part)
+    text = '\x1f'.join(part for part in parts if part)
+    return '' if text == '\x1e' else text
+
+
+def shingle_hashes(text):
+    """文本的SHINGLE_SIZE字符shingle的32位哈希（numpy数组，文本比shingle短时为整个文本的哈希）"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < SHINGLE_SIZE:
+        codes = np.concatenate([codes, np.zeros(SHINGLE_SIZE - len(codes), dtype=np.uint64)])
+    h = np.zeros(len(codes) - SHINGLE_SIZE + 1, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for offset in range(SHINGLE_SIZE):
+            h = (h ^ codes[offset:len(codes) - SHINGLE_SIZE + 1 + offset]) * np.uint64(0x100000001B3)
+    return (h >> np.uint64(32)) % PRIME
+
+
+def minhash_signatures(texts):
+    """
+    批量计算MinHash签名
+
+    Args:
+        texts: 文本列表（不能为空字符串）
+
+    Returns:
+        uint32数组，形状为(len(texts), NUM_PERM)
+    """
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        hashes, offsets, total = [], [], 0
+        end = start
+        while end < len(texts) and (total == 0 or total < CHUNK_SHINGLES):
+            h = shingle_hashes(texts[end])
+            offsets.append(total)
+            hashes.append(h)
+            total += len(h)
+            end += 1
+        x = np.concatenate(hashes)[None, :]
+        with np.errstate(over='ignore'):
+            permuted = (HASH_A * x + HASH_B) % PRIME
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def parse_workbook(path):
+    """
+    读取工作簿中的用例，计算文本摘要和MinHash签名（在工作进程中运行）
+
+    Returns:
+        索引项数据：count（用例数）、names（用例名称按行拼接）、
+        digests、signatures（base64编码的二进制数组，与names一一对应）、skipped（没有步骤内容的用例数）
+    """
+    columns, step_names, records = iter_case_records(path)
+    name_key = columns[detect_columns(columns)['case_name'] - 1]
+    names, texts = [], []
+    skipped = 0
+    for record in records:
+        text = case_text(record[step_names[0]], record[step_names[1]])
+        if not text:
+            skipped += 1
+            continue
+        names.append(' '.join((record[name_key] or '').split()))
+        texts.append(text)
+    digests = b''.join(hashlib.blake2b(text.encode('utf-8'), digest_size=DIGEST_SIZE).digest() for text in texts)
+    signatures = minhash_signatures(texts) if texts else np.empty((0, NUM_PERM), dtype=np.uint32)
+    return {
+        'count': len(names),
+        'names': '\n'.join(names),
+        'digests': base64.b64encode(digests).decode('ascii'),
+        'signatures': base64.b64encode(signatures.tobytes()).decode('ascii'),
+        'skipped': skipped,
+    }
+
+
+def parse_job(path):
+    """parse_workbook()的进程池包装（不抛出异常）"""
+    try:
+        return path, parse_workbook(path), None
+    except Exception as e:
+        return path, None, f'{type(e).__name__}: {e}'
+
+
+def run_parse(paths, workers=None):
+    """
+    并发读取多个工作簿（只有一个文件或workers为1时在当前进程中读取）
+
+    Yields:
+        (文件路径, 索引项数据, 错误信息)（按完成顺序）
+    """
+    if len(paths) <= 1 or workers == 1:
+        for path in paths:
+            yield parse_job(path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_job, path) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def collect_workbooks(patterns):
+    """
+    展开输入的目录或glob模式为工作簿列表（目录下递归匹配*.xlsx，跳过~$开头的临时文件）
+
+    Returns:
+        {文件路径: (大小, 修改时间ns)}
+    """
+    found = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '**', '*.xlsx'), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        for path in matches:
+            if os.path.basename(path).startswith(('~$', '.')) or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            found[os.path.abspath(path)] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+def load_index(index_file):
+    """读取索引文件（不存在、损坏、版本或MinHash参数不同时返回空索引）"""
+    params = [SHINGLE_SIZE, NUM_PERM, BANDS]
+    try:
+        with open(index_file, encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION and index.get('params') == params:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {'version': INDEX_VERSION, 'params': params, 'files': {}}
+
+
+def save_index(index, index_file):
+    """写入索引文件（先写临时文件再替换）"""
+    os.makedirs(os.path.dirname(os.path.abspath(index_file)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(index_file)))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_file)
+
+
+def update_index(patterns, index_file=DEFAULT_INDEX, workers=None):
+    """
+    增量更新索引：加入输入中新增或变化的工作簿，重新读取索引中已变化的工作簿，删除已不存在的工作簿
+
+    Args:
+        patterns: 工作簿、目录或glob模式列表
+        index_file: 索引文件路径
+        workers: 并发进程数（变化的工作簿只有一个或为1时在当前进程中读取）
+
+    Returns:
+        (索引, 变化统计{added, updated, removed, changed_files, errors})
+    """
+    index = load_index(index_file)
+    files = index['files']
+    changes = {'added': 0, 'updated': 0, 'removed': 0, 'changed_files': [], 'errors': []}
+
+    current = {}
+    for path in list(files):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            del files[path]
+            changes['removed'] += 1
+            continue
+        current[path] = (stat.st_size, stat.st_mtime_ns)
+    current.update(collect_workbooks(patterns))
+
+    stale = [path for path, (size, mtime_ns) in current.items()
+             if path not in files or files[path]['size'] != size or files[path]['mtime_ns'] != mtime_ns]
+    for path, data, error in run_parse(stale, workers):
+        if error:
+            changes['errors'].append((path, error))
+        changes['updated' if path in files else 'added'] += 1
+        changes['changed_files'].append(path)
+        size, mtime_ns = current[path]
+        files[path] = {'size': size, 'mtime_ns': mtime_ns, 'data': data, 'error': error}
+
+    if stale or changes['removed'] or not os.path.exists(index_file):
+        index['updated'] = time.time()
+        save_index(index, index_file)
+    return index, changes
+
+
+def load_corpus(index):
+    """
+    把索引中的全部用例拼成数组
+
+    Returns:
+        (用例位置列表[(文件路径, 用例名称)], 摘要数组uint64, 签名矩阵uint32 (用例数, NUM_PERM))
+    """
+    cases, digests, signatures = [], [], []
+    for path in sorted(index['files']):
+        data = index['files'][path]['data']
+        if not data or not data['count']:
+            continue
+        cases.extend((path, name) for name in data['names'].split('\n'))
+        digests.append(np.frombuffer(base64.b64decode(data['digests']), dtype=np.uint64))
+        signatures.append(np.frombuffer(base64.b64decode(data['signatures']), dtype=np.uint32).reshape(-1, NUM_PERM))
+    if not cases:
+        return [], np.empty(0, dtype=np.uint64), np.empty((0, NUM_PERM), dtype=np.uint32)
+    return cases, np.concatenate(digests), np.concatenate(signatures)
+
+
+def find_duplicates(digests, signatures, threshold=DEFAULT_THRESHOLD):
+    """
+    完全相同和近似重复的用例分组
+
+    Args:
+        digests: 文本摘要数组
+        signatures: MinHash签名矩阵
+        threshold: 近似重复的Jaccard相似度阈值（低于约0.5时LSH的召回率明显下降）
+
+    Returns:
+        组列表，每组为[(用例序号, 与组内第一个用例的估计相似度)]，第一个用例相似度为1.0；
+        组按用例数从多到少排序
+    """
+    if not len(digests):
+        return []
+    unique_digests, first, inverse = np.unique(digests, return_index=True, return_inverse=True)
+    reps = signatures[first]
+    parent = list(range(len(first)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        keys = np.ascontiguousarray(reps[:, band * ROWS:(band + 1) * ROWS]).view(np.dtype((np.void, ROWS * 4))).ravel()
+        _, bucket_of, bucket_sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        bucket_of = bucket_of.ravel()
+        members = np.nonzero(bucket_sizes[bucket_of] > 1)[0]
+        if not len(members):
+            continue
+        members = members[np.argsort(bucket_of[members], kind='stable')]
+        bounds = np.nonzero(np.diff(bucket_of[members]))[0] + 1
+        for bucket in np.split(members, bounds):
+            anchor = bucket[0]
+            similarity = (reps[bucket[1:]] == reps[anchor]).mean(axis=1)
+            root = find(anchor)
+            for member in bucket[1:][similarity >= threshold]:
+                member_root = find(member)
+                if member_root != root:
+                    parent[member_root] = root
+
+    clusters = {}
+    for rep in range(len(first)):
+        clusters.setdefault(find(rep), []).append(rep)
+    order = np.argsort(inverse.ravel(), kind='stable')
+    bounds = np.nonzero(np.diff(inverse.ravel()[order]))[0] + 1
+    cases_of = np.split(order, bounds)
+
+    groups = []
+    for rep_list in clusters.values():
+        if len(rep_list) == 1 and len(cases_of[rep_list[0]]) == 1:
+            continue
+        anchor = rep_list[0]
+        group = []
+        for rep in rep_list:
+            similarity = 1.0 if rep == anchor else float((reps[rep] == reps[anchor]).mean())
+            group.extend((int(case), similarity) for case in cases_of[rep])
+        groups.append(group)
+    groups.sort(key=lambda group: (-len(group), group[0][0]))
+    return groups
+
+
+def dedup_report(index, threshold=DEFAULT_THRESHOLD, changed_files=None):
+    """
+    在索引上检测重复用例
+
+    Args:
+        index: update_index()返回的索引
+        threshold: 近似重复的相似度阈值
+        changed_files: 只保留包含这些工作簿中用例的组（None表示全部）
+
+    Returns:
+        结果字典：cases、unique_texts、exact_duplicates（与其他用例完全相同的用例数，不含每组保留的一个）、
+        groups（[{size, exact, cases: [{file, name, similarity}]}]）
+    """
+    cases, digests, signatures = load_corpus(index)
+    groups = find_duplicates(digests, signatures, threshold)
+    if changed_files is not None:
+        changed = set(changed_files)
+        groups = [group for group in groups if any(cases[case][0] in changed for case, _ in group)]
+    unique_texts = len(np.unique(digests))
+    return {
+        'cases': len(cases),
+        'unique_texts': unique_texts,
+        'exact_duplicates': len(cases) - unique_texts,
+        'threshold': threshold,
+        'groups': [{
+            'size': len(group),
+            'exact': all(similarity == 1.0 for _, similarity in group),
+            'cases': [{'file': cases[case][0], 'name': cases[case][1], 'similarity': round(similarity, 3)}
+                      for case, similarity in group],
+        } for group in groups],
+    }
+
+
+def format_report(result, limit=20, max_cases=10):
+    """把dedup_report()的结果转为文本（最多列出limit组、每组max_cases个用例，0表示全部）"""
+    groups = result['groups']
+    lines = [f"共 {result['cases']} 个用例，{result['unique_texts']} 种不同的步骤内容，"
+             f"完全重复 {result['exact_duplicates']} 个；相似度≥{result['threshold']:.2f}的重复组 {len(groups)} 组"]
+    for idx, group in enumerate(groups[:limit] if limit else groups, 1):
+        label = '完全相同' if group['exact'] else '近似重复'
+        lines.append(f"\n[{idx}] {label}，{group['size']} 个用例")
+        for case in group['cases'][:max_cases] if max_cases else group['cases']:
+            lines.append(f"  {case['similarity']:.2f}  {os.path.basename(case['file'])}: {case['name'] or '（无名称）'}")
+        if max_cases and group['size'] > max_cases:
+            lines.append(f"  ... 等 {group['size']} 个用例")
+    if limit and len(groups) > limit:
+        lines.append(f"\n... 还有 {len(groups) - limit} 组（--limit 0 列出全部，或使用 --json）")
+    return '\n'.join(lines)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='跨工作簿的重复、近似重复测试用例检测（MinHash + LSH）')
+    parser.add_argument('inputs', nargs='*', default=[DEFAULT_INPUT],
+                        help='加入索引的工作簿、目录（递归匹配*.xlsx）或glob模式（默认 sea-gen-testcases/testcases）')
+    parser.add_argument('--index', default=DEFAULT_INDEX, help=f'索引文件（默认 {DEFAULT_INDEX}）')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'近似重复的相似度阈值0-1（默认{DEFAULT_THRESHOLD}，建议不低于0.5）')
+    parser.add_argument('--new-only', action='store_true', help='只报告包含本次新增或变化的工作簿中用例的组')
+    parser.add_argument('--limit', type=int, default=20, help='最多列出的组数（默认20，0表示全部）')
+    parser.add_argument('--json', action='store_true', help='输出JSON（全部组）')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='读取工作簿的并发进程数（默认CPU核数）')
+    args = parser.parse_args()
+
+    if not 0 < args.threshold <= 1:
+        print("错误: --threshold 应在0到1之间")
+        sys.exit(1)
+    missing = [path for path in args.inputs if not glob.glob(path)]
+    if missing:
+        print(f"错误: 找不到: {', '.join(missing)}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    index, changes = update_index(args.inputs, args.index, args.workers)
+    update_seconds = time.perf_counter() - start
+    for path, error in changes['errors']:
+        print(f"❌ {path}: {error}", file=sys.stderr)
+
+    result = dedup_report(index, args.threshold, changes['changed_files'] if args.new_only else None)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"索引: {len(index['files'])} 个工作簿（新增 {changes['added']}，更新 {changes['updated']}，"
+              f"删除 {changes['removed']}，{update_seconds:.2f}秒）")
+        print(format_report(result, args.limit))
+        print(f"\n总耗时 {time.perf_counter() - start:.2f} 秒")
+    if changes['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
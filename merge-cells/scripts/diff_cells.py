@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+比较两个测试用例工作簿的差异（按用例而不是按行）
+以ID列（没有ID列或ID为空时用用例名称）为键，把每个用例归一化为：
+    字段：用例名称行上除步骤描述、预期结果以外各列的值（按表头名称对应，列顺序不影响比较）
+    步骤：(步骤描述, 预期结果)列表，合并后的布局（#拼接在一个单元格）和拆分后的布局（每步一行）
+          归一化后相同，因此可以直接比较 split_cells(merge_cells(x)) 与 x
+报告新增、删除、修改的用例，以及修改的用例中具体变化的字段和步骤。
+
+两个工作簿都用openpyxl只读模式流式读取，第一遍只保存每个用例的哈希，
+有修改的用例才在第二遍读取其内容，内存占用与文件大小基本无关。
+
+退出码：0表示没有差异，1表示有差异，2表示出错（可直接用作回归检查）。
+
+用法：
+    python diff_cells.py <旧文件> <新文件> [--key auto|id|name] [--ignore-columns 创建时间,更新时间]
+                         [--format text|json] [-o 输出文件]
+"""
+
+import argparse
+import difflib
+import json
+import sys
+import zipfile
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from sheet_model import FIRST_DATA_ROW, cell_text, detect_columns, missing_columns, split_by_hash
+from stream_engine import fill_merged, read_merged_ranges
+
+
+ID_HEADERS = ('ID', '用例ID', '用例编号')
+
+
+class DiffError(Exception):
+    """无法比较（文件或表头不符合要求）"""
+
+
+def step_fragments(value):
+    """
+    把步骤描述/预期结果单元格拆成去掉#号的片段
+
+    "#步骤1#步骤2" -> ["步骤1", "步骤2"]；没有#号的内容整体为一个片段；
+    只有#号的片段（合并时空单元格补的#）为None
+
+    Args:
+        value: 单元格值
+
+    Returns:
+        片段列表
+    """
+    text = cell_text(value)
+    if text is None:
+        return []
+    parts = split_by_hash(text)
+    prefix = text[:text.find('#')] if parts else text
+    if prefix.strip():
+        parts.insert(0, prefix)
+    return [part.lstrip('#').strip() or None for part in parts]
+
+
+def find_id_column(header):
+    """ID列的列号（1-based），找不到返回None"""
+    for col_idx, value in enumerate(header, start=1):
+        if value is not None and str(value).strip().upper() in ID_HEADERS:
+            return col_idx
+    return None
+
+
+def iter_cases(file_path, sheet=None, key='auto', ignore_columns=()):
+    """
+    流式读取工作簿中的用例
+
+    拆分后的布局中用例名称行上的字段合并了整个用例的行，合并区域内非左上角的单元格为空，
+    这里把字段列按合并区域补上左上角的值（用例名称、步骤描述、预期结果列不补）。
+
+    Args:
+        file_path: Excel文件路径
+        sheet: sheet名称，默认第一个sheet
+        key: 'id'（按ID列）、'name'（按用例名称）或 'auto'（有ID列时按ID，ID为空的用例按用例名称）
+        ignore_columns: 不参与比较的列名
+
+    Yields:
+        (键, 用例名称所在行号, 字段字典{表头: 值}, 步骤列表[(步骤描述, 预期结果)])
+    """
+    try:
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile) as e:
+        raise DiffError(f"{file_path}: 无法读取工作簿: {e}")
+    try:
+        if sheet is None:
+            ws = wb.worksheets[0]
+        elif sheet in wb.sheetnames:
+            ws = wb[sheet]
+        else:
+            raise DiffError(f"{file_path}: 找不到sheet: {sheet}")
+
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, ())
+        columns = detect_columns(header)
+        missing = missing_columns(columns)
+        if missing:
+            raise DiffError(f"{file_path}: 找不到必需的列: {', '.join(missing)}")
+        id_col = find_id_column(header)
+        if key == 'id' and id_col is None:
+            raise DiffError(f"{file_path}: 没有ID列，无法按ID比较")
+        use_id = key != 'name' and id_col is not None
+
+        name_idx = columns['case_name'] - 1
+        step_idx = columns['step_desc'] - 1
+        result_idx = columns['expected_result'] - 1
+        id_idx = id_col - 1 if id_col else None
+        field_cols = [(idx, str(name).strip()) for idx, name in enumerate(header)
+                      if name is not None and idx not in (step_idx, result_idx)
+                      and str(name).strip() not in ignore_columns]
+        merged_starts = read_merged_ranges(file_path, ws._worksheet_path)
+        fill_cols = {idx for idx, _ in field_cols if idx != name_idx}
+        # 列下标 -> (合并区域结束行号, 左上角的值)
+        fills = {}
+
+        case = None
+        for row_idx, values in enumerate(rows, FIRST_DATA_ROW):
+            width = len(values)
+            if fills or row_idx in merged_starts:
+                values = fill_merged(values, row_idx, merged_starts.get(row_idx, ()), fills, fill_cols)
+                width = len(values)
+            name = cell_text(values[name_idx]) if name_idx < width else None
+            if name is not None:
+                if case is not None:
+                    yield case
+                case_key = name
+                if use_id and id_idx < width and cell_text(values[id_idx]) is not None:
+                    case_key = cell_text(values[id_idx])
+                fields = {col_name: cell_text(values[idx]) if idx < width else None for idx, col_name in field_cols}
+                case = (case_key, row_idx, fields, [])
+            elif case is None:
+                # 第一个用例之前的行
+                continue
+
+            steps = step_fragments(values[step_idx]) if step_idx < width else []
+            results = step_fragments(values[result_idx]) if result_idx < width else []
+            for i in range(max(len(steps), len(results))):
+                pair = (steps[i] if i < len(steps) else None, results[i] if i < len(results) else None)
+                if pair != (None, None):
+                    case[3].append(pair)
+        if case is not None:
+            yield case
+    finally:
+        wb.close()
+
+
+def unique_keys(cases):
+    """
+    给重复的键加上序号（"名称 [2]"），保证每个用例的键唯一
+
+    Yields:
+        与iter_cases()相同，键已去重
+    """
+    counts = {}
+    for key, row, fields, steps in cases:
+        counts[key] = counts.get(key, 0) + 1
+        if counts[key] > 1:
+            key = f'{key} [{counts[key]}]'
+        yield key, row, fields, steps
+
+
+def case_hashes(file_path, sheet, key, ignore_columns):
+    """
+    第一遍：每个用例的行号、字段哈希和步骤哈希
+
+    Returns:
+        有序字典{键: (行号, 字段哈希, 步骤哈希)}
+    """
+    hashes = {}
+    for case_key, row, fields, steps in unique_keys(iter_cases(file_path, sheet, key, ignore_columns)):
+        hashes[case_key] = (row, hash(tuple(sorted(fields.items()))), hash(tuple(steps)))
+    return hashes
+
+
+def load_cases(file_path, sheet, key, ignore_columns, wanted):
+    """
+    第二遍：只读取指定用例的内容
+
+    Returns:
+        {键: (字段字典, 步骤列表)}
+    """
+    found = {}
+    for case_key, _, fields, steps in unique_keys(iter_cases(file_path, sheet, key, ignore_columns)):
+        if case_key in wanted:
+            found[case_key] = (fields, steps)
+    return found
+
+
+def steps_as_dicts(steps):
+    """[(步骤描述, 预期结果)] -> [{step, result}]"""
+    return [{'step': step, 'result': result} for step, result in steps]
+
+
+def diff_steps(old_steps, new_steps):
+    """
+    对齐两个步骤列表，列出变化的步骤
+
+    Returns:
+        变化列表，每项：op（replace/insert/delete）、old_start/new_start（从1开始的步骤序号）、
+        old、new（[{step, result}]）
+    """
+    changes = []
+    matcher = difflib.SequenceMatcher(None, old_steps, new_steps, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == 'equal':
+            continue
+        changes.append({
+            'op': op,
+            'old_start': i1 + 1,
+            'new_start': j1 + 1,
+            'old': steps_as_dicts(old_steps[i1:i2]),
+            'new': steps_as_dicts(new_steps[j1:j2]),
+        })
+    return changes
+
+
+def diff_workbooks(old_file, new_file, sheet=None, key='auto', ignore_columns=()):
+    """
+    比较两个工作簿
+
+    Args:
+        old_file: 旧文件路径
+        new_file: 新文件路径
+        sheet: sheet名称，默认各自的第一个sheet
+        key: 见iter_cases()
+        ignore_columns: 不参与比较的列名
+
+    Returns:
+        结果字典：old、new、equal、summary（各类用例数）、order_changed、
+        added、removed（[{key, row}]）、modified（[{key, old_row, new_row, fields, steps}]）
+    """
+    old_hashes = case_hashes(old_file, sheet, key, ignore_columns)
+    new_hashes = case_hashes(new_file, sheet, key, ignore_columns)
+
+    added = [{'key': k, 'row': new_hashes[k][0]} for k in new_hashes if k not in old_hashes]
+    removed = [{'key': k, 'row': old_hashes[k][0]} for k in old_hashes if k not in new_hashes]
+    common = [k for k in old_hashes if k in new_hashes]
+    changed = {k for k in common if old_hashes[k][1:] != new_hashes[k][1:]}
+    order_changed = common != [k for k in new_hashes if k in old_hashes]
+
+    modified = []
+    if changed:
+        old_cases = load_cases(old_file, sheet, key, ignore_columns, changed)
+        new_cases = load_cases(new_file, sheet, key, ignore_columns, changed)
+        for k in common:
+            if k not in changed:
+                continue
+            old_fields, old_steps = old_cases[k]
+            new_fields, new_steps = new_cases[k]
+            fields = {name: {'old': old_fields.get(name), 'new': new_fields.get(name)}
+                      for name in list(old_fields) + [n for n in new_fields if n not in old_fields]
+                      if old_fields.get(name) != new_fields.get(name)}
+            modified.append({
+                'key': k,
+                'old_row': old_hashes[k][0],
+                'new_row': new_hashes[k][0],
+                'fields': fields,
+                'steps': diff_steps(old_steps, new_steps),
+            })
+
+    return {
+        'old': old_file,
+        'new': new_file,
+        'equal': not (added or removed or modified or order_changed),
+        'summary': {
+            'old_cases': len(old_hashes),
+            'new_cases': len(new_hashes),
+            'added': len(added),
+            'removed': len(removed),
+            'modified': len(modified),
+            'unchanged': len(common) - len(modified),
+        },
+        'order_changed': order_changed,
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+    }
+
+
+def clip(text, max_width):
+    """超过max_width个字符时截断"""
+    if text is None or len(text) <= max_width:
+        return text
+    return text[:max_width] + '…'
+
+
+def format_text(result, max_width=80):
+    """把diff_workbooks()的结果转为文本"""
+    summary = result['summary']
+    lines = [f"旧: {result['old']}（{summary['old_cases']} 个用例）",
+             f"新: {result['new']}（{summary['new_cases']} 个用例）"]
+    if result['equal']:
+        lines.append("✅ 没有差异")
+        return '\n'.join(lines)
+
+    lines.append(f"❌ 新增 {summary['added']} 个，删除 {summary['removed']} 个，修改 {summary['modified']} 个，"
+                 f"未变 {summary['unchanged']} 个" + ('，用例顺序有变化' if result['order_changed'] else ''))
+    for case in result['added']:
+        lines.append(f"+ {case['key']}（新文件第{case['row']}行）")
+    for case in result['removed']:
+        lines.append(f"- {case['key']}（旧文件第{case['row']}行）")
+    for case in result['modified']:
+        lines.append(f"~ {case['key']}（旧文件第{case['old_row']}行，新文件第{case['new_row']}行）")
+        for name, change in case['fields'].items():
+            lines.append(f"    {name}: {clip(change['old'], max_width)!r} → {clip(change['new'], max_width)!r}")
+        for change in case['steps']:
+            for offset, step in enumerate(change['old']):
+                lines.append(f"    - 步骤{change['old_start'] + offset}: {clip(step['step'], max_width)!r} / {clip(step['result'], max_width)!r}")
+            for offset, step in enumerate(change['new']):
+                lines.append(f"    + 步骤{change['new_start'] + offset}: {clip(step['step'], max_width)!r} / {clip(step['result'], max_width)!r}")
+    return '\n'.join(lines)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='按用例比较两个测试用例工作簿（退出码：0无差异，1有差异，2出错）')
+    parser.add_argument('old_file', help='旧文件路径')
+    parser.add_argument('new_file', help='新文件路径')
+    parser.add_argument('--sheet', default=None, help='sheet名称（默认第一个sheet）')
+    parser.add_argument('--key', choices=['auto', 'id', 'name'], default='auto',
+                        help='用例的键：auto有ID列时按ID（ID为空的按用例名称），id按ID，name按用例名称（默认auto）')
+    parser.add_argument('--ignore-columns', default='', help='不参与比较的列，逗号分隔（如 创建时间,更新时间）')
+    parser.add_argument('--format', dest='fmt', choices=['text', 'json'], default='text', help='输出格式（默认text）')
+    parser.add_argument('-o', '--output', default=None, help='输出文件（默认标准输出）')
+    args = parser.parse_args()
+
+    ignore_columns = tuple(name.strip() for name in args.ignore_columns.split(',') if name.strip())
+    try:
+        result = diff_workbooks(args.old_file, args.new_file, args.sheet, args.key, ignore_columns)
+    except (OSError, DiffError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.fmt == 'json':
+        text = json.dumps(result, ensure_ascii=False, indent=2, default=str)
+    else:
+        text = format_text(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    sys.exit(0 if result['equal'] else 1)
+
+
+if __name__ == "__main__":
+    main()
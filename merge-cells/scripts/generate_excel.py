@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+由清洗后的需求JSON（cleaned/*-cleaned.json）生成测试用例工作簿（gen-test-case的生成步骤）
+输出文件已存在时跳过（加 --force 覆盖）；旧格式（requirements[].test_points）的JSON跳过并给出提示。
+每个business_functions[].scenarios[]生成一个用例，字段映射：
+    一级模块: requirement.module_name
+    二级模块: function_name（function_level为表头中的其他模块列时放在该列）
+    用例名称: {req_id}-{scenario_id}-{function_name}，如 #77879-A001-录入SO
+    优先级: 场景的priority（没有时用功能的function_priority）
+    用例类型: 固定为"功能测试"
+    步骤描述/预期结果: test_steps按step_order排序后用#拼接（与merge_cells合并后的布局相同），
+                       --layout split时生成split_cells拆分后的布局
+    前置条件、备注、维护人: 空
+表头默认为测试用例导入模板的12列，--template指定模板时使用模板第一行的表头。
+加 --rules-sheet 时把requirement.business_rules写入第二个sheet（业务规则）。
+
+用例sheet用write_only模式逐行写入；多个文件时用进程池并发生成。
+
+用法：
+    python generate_excel.py <cleaned JSON或目录>... [-o 输出目录] [--template 模板.xlsx]
+                             [--layout merged|split] [--rules-sheet] [--force] [-j 进程数]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from openpyxl import load_workbook
+
+from case_export import write_case_workbook
+
+
+DEFAULT_HEADER = ('一级模块', '二级模块', '三级模块', '四级模块', '用例名称', '优先级', '用例类型',
+                  '前置条件', '步骤描述', '预期结果', '备注', '维护人')
+# 与手工维护的用例工作簿（testcases/*-测试用例.xlsx）一致的列宽和行高
+COLUMN_WIDTHS = {'一级模块': 20.75, '二级模块': 15.75, '三级模块': 15.75, '四级模块': 15.75, '用例名称': 40.75,
+                 '优先级': 10.75, '用例类型': 15.75, '前置条件': 20.75, '步骤描述': 60.75, '预期结果': 60.75,
+                 '备注': 20.75, '维护人': 15.75}
+ROW_HEIGHT = 52.5
+CASE_TYPE = '功能测试'
+CLEANED_SUFFIX = '-cleaned'
+OUTPUT_SUFFIX = '-测试用例.xlsx'
+RULES_SHEET = '业务规则'
+RULES_HEADER = ('规则编号', '规则描述', '条件', '预期结果')
+
+
+class LegacyFormat(ValueError):
+    """旧格式的清洗结果（requirements[].test_points，没有business_functions），不能直接生成用例"""
+
+
+def load_requirement(data):
+    """
+    取出清洗后JSON中的需求信息（requirement，旧格式为requirements的第一项）
+
+    Raises:
+        ValueError: 没有需求信息
+    """
+    requirement = data.get('requirement')
+    if requirement is None and data.get('requirements'):
+        requirement = data['requirements'][0]
+    if not isinstance(requirement, dict):
+        raise ValueError("没有requirement")
+    return requirement
+
+
+def iter_case_records(data, header=DEFAULT_HEADER):
+    """
+    由清洗后的需求生成用例记录
+
+    Args:
+        data: 清洗后的需求JSON（字典）
+        header: 表头（function_level不在表头中时功能名称放在二级模块列）
+
+    Returns:
+        用例记录迭代器，记录为字典（步骤描述、预期结果为列表，见case_export.iter_case_records()）
+
+    Raises:
+        LegacyFormat: 旧格式的清洗结果（只有requirements[].test_points）
+        ValueError: 没有requirement或business_functions
+    """
+    requirement = load_requirement(data)
+    functions = data.get('business_functions')
+    if not functions:
+        if any(isinstance(item, dict) and item.get('test_points') for item in data.get('requirements') or ()):
+            raise LegacyFormat("旧格式的清洗结果（test_points），需要重新清洗为business_functions格式")
+        raise ValueError("没有business_functions（需要按功能模块组织的清洗结果）")
+    return _iter_records(requirement, functions, header)
+
+
+def _iter_records(requirement, functions, header):
+    """iter_case_records()的记录迭代器"""
+    req_id = requirement.get('req_id') or ''
+    module_name = requirement.get('module_name') or requirement.get('title')
+    for function in functions:
+        function_name = function.get('function_name')
+        level = function.get('function_level')
+        level = level if level in header and level != '一级模块' else '二级模块'
+        for scenario in function.get('scenarios') or ():
+            steps = sorted(scenario.get('test_steps') or (), key=lambda step: step.get('step_order') or 0)
+            name_parts = [part for part in (req_id, scenario.get('scenario_id'), function_name) if part]
+            yield {
+                '一级模块': module_name,
+                level: function_name,
+                '用例名称': '-'.join(name_parts) or scenario.get('scenario_name'),
+                '优先级': scenario.get('priority') or function.get('function_priority'),
+                '用例类型': CASE_TYPE,
+                '步骤描述': [step.get('step_description') for step in steps],
+                '预期结果': [step.get('expected_result') for step in steps],
+            }
+
+
+def iter_rule_rows(data):
+    """business_rules → 业务规则sheet的行（条件用换行拼接）"""
+    for rule in load_requirement(data).get('business_rules') or ():
+        conditions = rule.get('conditions') or ()
+        if isinstance(conditions, str):
+            conditions = [conditions]
+        yield [rule.get('rule_id'), rule.get('description'), '\n'.join(conditions) or None,
+               rule.get('expected_outcome')]
+
+
+def read_template_header(template_file):
+    """
+    读取模板第一行的表头
+
+    Returns:
+        列名元组
+    """
+    wb = load_workbook(template_file, read_only=True)
+    try:
+        first_row = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+    finally:
+        wb.close()
+    header = tuple(str(value).strip() for value in first_row if value is not None)
+    if not header:
+        raise ValueError(f"模板第一行没有表头: {template_file}")
+    return header
+
+
+def collect_input_files(patterns):
+    """
+    展开输入的目录或glob模式为清洗后的JSON文件列表（目录下匹配*-cleaned.json）
+
+    Returns:
+        去重并排序后的文件路径列表
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, f'*{CLEANED_SUFFIX}.json'))
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        files.extend(os.path.abspath(path) for path in matches if os.path.isfile(path))
+    return sorted(set(files))
+
+
+def output_path_for(json_file, output_dir=None):
+    """
+    输出文件路径：<输出目录>/<需求名称>-测试用例.xlsx
+    默认输出目录为JSON所在目录旁边的testcases目录（cleaned/ → testcases/）
+    """
+    name = os.path.splitext(os.path.basename(json_file))[0]
+    if name.endswith(CLEANED_SUFFIX):
+        name = name[:-len(CLEANED_SUFFIX)]
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(json_file))), 'testcases')
+    return os.path.join(output_dir, name + OUTPUT_SUFFIX)
+
+
+def generate_workbook(json_file, output_file, header=DEFAULT_HEADER, layout='merged', rules_sheet=False,
+                      force=False):
+    """
+    由一个清洗后的JSON生成测试用例工作簿（在工作进程中运行，不抛出异常）
+    输出文件已存在时（如手工维护过的用例工作簿）不覆盖，除非force为True
+
+    Args:
+        json_file: 清洗后的需求JSON路径
+        output_file: 输出Excel文件路径
+        header: 表头
+        layout: 'merged'（步骤用#拼接）或 'split'（每个步骤一行）
+        rules_sheet: 是否追加业务规则sheet
+        force: 是否覆盖已存在的输出文件
+
+    Returns:
+        结果字典：file、output、ok、seconds、cases、rules、error、skipped（跳过的原因，没有跳过时为None）
+    """
+    start = time.perf_counter()
+    result = {'file': json_file, 'output': output_file, 'ok': False, 'seconds': 0.0,
+              'cases': 0, 'rules': 0, 'error': None, 'skipped': None}
+    if not force and os.path.exists(output_file):
+        result['skipped'] = '输出文件已存在（加 --force 覆盖）'
+        return result
+    try:
+        with open(json_file, encoding='utf-8') as f:
+            data = json.load(f)
+        try:
+            records = iter_case_records(data, header)
+        except LegacyFormat as e:
+            result['skipped'] = str(e)
+            return result
+        extra_sheets = ()
+        if rules_sheet:
+            rules = list(iter_rule_rows(data))
+            result['rules'] = len(rules)
+            extra_sheets = [(RULES_SHEET, RULES_HEADER, rules)]
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        result['cases'] = write_case_workbook(list(header), records, output_file, layout,
+                                              extra_sheets=extra_sheets, column_widths=COLUMN_WIDTHS,
+                                              row_height=ROW_HEIGHT)
+        result['ok'] = True
+    except SystemExit:
+        # split_sheet出错时通过Recorder.fail退出
+        result['error'] = '拆分失败'
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['seconds'] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def run_generate(files, output_dir=None, header=DEFAULT_HEADER, layout='merged', rules_sheet=False, workers=None,
+                 force=False):
+    """
+    并发生成多个工作簿（只有一个文件或workers为1时在当前进程中生成）
+
+    Yields:
+        每个文件的结果字典（按完成顺序）
+    """
+    jobs = [(path, output_path_for(path, output_dir), header, layout, rules_sheet, force) for path in files]
+    if len(jobs) == 1 or workers == 1:
+        for job in jobs:
+            yield generate_workbook(*job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(generate_workbook, *job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='由清洗后的需求JSON生成测试用例工作簿')
+    parser.add_argument('inputs', nargs='+', help='清洗后的JSON文件、目录（匹配*-cleaned.json）或glob模式')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='输出目录（默认为JSON所在目录旁边的testcases目录）')
+    parser.add_argument('--template', default=None, help='测试用例导入模板（使用其第一行的表头，默认12列导入模板）')
+    parser.add_argument('--layout', choices=['merged', 'split'], default='merged',
+                        help='merged每个用例一行、步骤用#拼接（默认，可直接导入），split每个步骤一行')
+    parser.add_argument('--rules-sheet', action='store_true', help='把业务规则（business_rules）写入第二个sheet')
+    parser.add_argument('--force', action='store_true', help='覆盖已存在的输出文件（默认跳过，避免覆盖手工维护的工作簿）')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='并发进程数（默认CPU核数）')
+    args = parser.parse_args()
+
+    files = collect_input_files(args.inputs)
+    if not files:
+        print("错误: 没有找到清洗后的JSON文件")
+        sys.exit(1)
+
+    header = DEFAULT_HEADER
+    if args.template:
+        try:
+            header = read_template_header(args.template)
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法读取模板: {e}")
+            sys.exit(1)
+
+    outputs = [output_path_for(path, args.output_dir) for path in files]
+    duplicates = sorted({path for path in outputs if outputs.count(path) > 1})
+    if duplicates:
+        print(f"错误: 多个输入文件对应同一个输出文件: {duplicates}")
+        sys.exit(1)
+
+    print(f"共 {len(files)} 个需求，使用 {min(args.workers, len(files))} 个进程生成...")
+    start = time.perf_counter()
+    failed = 0
+    skipped = 0
+    total_cases = 0
+    for idx, result in enumerate(run_generate(files, args.output_dir, header, args.layout,
+                                              args.rules_sheet, args.workers, args.force), 1):
+        if result['skipped']:
+            skipped += 1
+            print(f"  ⚠️ [{idx}/{len(files)}] 跳过 {result['file']}: {result['skipped']}")
+        elif result['ok']:
+            total_cases += result['cases']
+            rules = f"，{result['rules']} 条业务规则" if args.rules_sheet else ''
+            print(f"  ✅ [{idx}/{len(files)}] {result['output']}（{result['cases']} 个用例{rules}，"
+                  f"{result['seconds']:.2f}秒）")
+        else:
+            failed += 1
+            print(f"  ❌ [{idx}/{len(files)}] {result['file']}: {result['error']}")
+
+    print(f"\n生成完成: 成功 {len(files) - failed - skipped} 个，跳过 {skipped} 个，失败 {failed} 个，共 {total_cases} 个用例，"
+          f"总耗时 {time.perf_counter() - start:.2f} 秒")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+增量拆分
+对比合并后的工作簿（输入）与上一次拆分的输出：输入的每个用例块先在内存中拆分，
+按拆分后各行的内容计算指纹；上一次输出按用例名称列切分为用例块，把合并单元格的值
+填回后计算同样的指纹。两组指纹按顺序对齐，指纹相同的块直接保留上一次输出中的行
+（含样式和合并区域），只有新增或修改的块重新生成并拼接进去。
+X级模块、用例名称、前置条件列的合并区域也只在变化的行附近重新计算，其余区域整体平移。
+
+这样修改少量用例后重新拆分，耗时随修改的规模增长，而不是随整个工作簿的大小增长
+（加载和保存工作簿本身除外）。
+"""
+
+import hashlib
+import os
+from bisect import bisect_right
+from copy import copy
+from difflib import SequenceMatcher
+
+from openpyxl import load_workbook
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import MultiCellRange
+from openpyxl.worksheet.merge import MergedCellRange
+
+from instrumentation import Recorder
+from pipeline import Pipeline, merge_columns_of
+from sheet_model import (
+    FIRST_DATA_ROW,
+    SheetModel,
+    cell_text,
+    is_row_empty,
+    load_sheet,
+    find_case_rows,
+    split_step_rows,
+    strip_hash_prefixes,
+)
+
+
+def block_fingerprint(rows):
+    """
+    用例块的指纹：拆分后各行所有列的值（空字符串保存后读回为None，按None计算）
+
+    Args:
+        rows: 行tuple列表
+
+    Returns:
+        十六进制哈希字符串
+    """
+    normalized = [tuple(None if value == '' else value for value in row_values) for row_values in rows]
+    return hashlib.sha1(repr(normalized).encode('utf-8')).hexdigest()
+
+
+def filled_columns(model, ws, merge_cols):
+    """
+    把合并单元格的值填回被合并的行，得到拆分后、合并单元格之前的各列值
+
+    Args:
+        model: 上一次输出的SheetModel
+        ws: 上一次输出的worksheet
+        merge_cols: 拆分时合并相同内容的列
+
+    Returns:
+        列值列表（需要填值的列为副本，其余列与model共用）
+    """
+    columns = list(model.columns)
+    for col in merge_cols:
+        columns[col - 1] = list(columns[col - 1])
+    for rng in ws.merged_cells.ranges:
+        if rng.min_col != rng.max_col or rng.min_col not in merge_cols or rng.min_row < FIRST_DATA_ROW:
+            continue
+        column = columns[rng.min_col - 1]
+        anchor = column[rng.min_row - FIRST_DATA_ROW]
+        for row in range(rng.min_row + 1, min(rng.max_row, model.n_rows + 1) + 1):
+            column[row - FIRST_DATA_ROW] = anchor
+    return columns
+
+
+def previous_blocks(model, case_name_col):
+    """
+    把上一次的输出按用例名称列切分为用例块：用例名称合并区域的首行（有值的行）开始一个新块
+
+    Args:
+        model: 上一次输出的SheetModel（未填值）
+        case_name_col: 用例名称列索引（1-based）
+
+    Returns:
+        块列表，每项为(起始下标, 结束下标)（不含结束下标）
+    """
+    starts = [0] + [idx for idx, value in enumerate(model.column(case_name_col)) if idx and cell_text(value)]
+    if not model.n_rows:
+        return []
+    return list(zip(starts, starts[1:] + [model.n_rows]))
+
+
+def split_blocks(model, columns):
+    """
+    把输入（合并后的工作簿）按用例块拆分，每个块单独拆分后返回各行
+
+    第一个用例名称之前的行单独作为一个块；尾部的空行去掉（同drop_trailing_empty_rows）。
+
+    Args:
+        model: 输入的SheetModel
+        columns: detect_columns()的返回值
+
+    Returns:
+        (块列表, 统计字典)；每个块为(行tuple列表, 来源行号列表)，统计字典含split、inserted、cleared
+    """
+    step_desc_col = columns['step_desc']
+    expected_result_col = columns['expected_result']
+    starts = find_case_rows(model, columns['case_name'])
+    if not starts or starts[0] != 0:
+        starts = [0] + starts
+    stats = {'split': 0, 'inserted': 0, 'cleared': 0}
+    blocks = []
+    if not model.n_rows:
+        return blocks, stats
+
+    for start, end in zip(starts, starts[1:] + [model.n_rows]):
+        block = SheetModel(model.title, model.header, [column[start:end] for column in model.columns],
+                           model.source_rows[start:end])
+        split_row_count, new_rows = split_step_rows(block, step_desc_col, expected_result_col)
+        stats['split'] += split_row_count
+        stats['inserted'] += new_rows
+        stats['cleared'] += strip_hash_prefixes(block, [step_desc_col, expected_result_col])
+        blocks.append((list(zip(*block.columns)), block.source_rows))
+
+    # 去掉尾部的空行
+    while blocks:
+        rows, source_rows = blocks[-1]
+        while rows and is_row_empty(rows[-1]):
+            rows.pop()
+            source_rows.pop()
+        if rows:
+            break
+        blocks.pop()
+    return blocks, stats
+
+
+def copy_cell_style(source, target):
+    """
+    跨工作簿复制单元格样式
+
+    Args:
+        source: 来源单元格
+        target: 目标单元格
+    """
+    if not source.has_style:
+        return
+    target.font = copy(source.font)
+    target.border = copy(source.border)
+    target.fill = copy(source.fill)
+    target.number_format = source.number_format
+    target.protection = copy(source.protection)
+    target.alignment = copy(source.alignment)
+
+
+def dirty_rows(prev_of, n_prev):
+    """
+    找出需要重新计算合并区域的行：新生成的行，以及与上一次输出中的相邻行不再相邻的保留行
+
+    Args:
+        prev_of: 每个输出行对应的上一次输出的数据行下标（新生成的行为None）
+        n_prev: 上一次输出的数据行数
+
+    Returns:
+        输出数据行下标集合
+    """
+    dirty = set()
+    last = len(prev_of) - 1
+    for idx, prev_idx in enumerate(prev_of):
+        if prev_idx is None:
+            dirty.add(idx)
+            continue
+        before = prev_of[idx - 1] if idx > 0 else -1
+        after = prev_of[idx + 1] if idx < last else n_prev
+        if before != prev_idx - 1 or after != prev_idx + 1:
+            dirty.add(idx)
+    return dirty
+
+
+def merge_windows(texts, dirty):
+    """
+    把需要重新计算的行扩展为完整的合并区间：向两侧延伸到值不同或为空的行为止
+
+    Args:
+        texts: 某列每个数据行的标准化文本
+        dirty: 需要重新计算的数据行下标集合
+
+    Returns:
+        区间列表，每项为(起始下标, 结束下标)（包含两端），按顺序且互不重叠
+    """
+    windows = []
+    for idx in sorted(dirty):
+        if windows and idx <= windows[-1][1] + 1:
+            windows[-1][1] = max(windows[-1][1], idx)
+        else:
+            windows.append([idx, idx])
+
+    expanded = []
+    for lo, hi in windows:
+        while lo > 0 and texts[lo] and texts[lo - 1] == texts[lo]:
+            lo -= 1
+        while hi < len(texts) - 1 and texts[hi] and texts[hi + 1] == texts[hi]:
+            hi += 1
+        if expanded and lo <= expanded[-1][1] + 1:
+            expanded[-1][1] = max(expanded[-1][1], hi)
+        else:
+            expanded.append([lo, hi])
+    return [tuple(window) for window in expanded]
+
+
+def window_runs(texts, lo, hi):
+    """
+    区间内连续相同且非空的值（同find_merge_runs）
+
+    Args:
+        texts: 某列每个数据行的标准化文本
+        lo: 起始下标
+        hi: 结束下标（包含）
+
+    Returns:
+        区间列表，每项为(起始下标, 结束下标)（包含两端）
+    """
+    runs = []
+    run_start = lo
+    for idx in range(lo + 1, hi + 2):
+        if idx <= hi and texts[idx] and texts[idx] == texts[run_start]:
+            continue
+        if idx - 1 > run_start:
+            runs.append((run_start, idx - 1))
+        run_start = idx
+    return runs
+
+
+def incremental_split_sheet(input_file, output_file, recorder=None):
+    """
+    增量拆分：上一次拆分的输出（output_file）中未变化的用例块原样保留，只重新生成变化的块
+
+    上一次的输出不存在，或表头与输入不一致时返回False，由调用方改为完整拆分。
+
+    Args:
+        input_file: 输入Excel文件路径（合并后的工作簿）
+        output_file: 上一次拆分的输出文件路径，结果也保存到这里
+        recorder: Recorder对象（可选）
+
+    Returns:
+        完成增量拆分返回True，需要完整拆分时返回False
+    """
+    recorder = recorder or Recorder('split_cells')
+    if not output_file or not os.path.exists(output_file) or os.path.samefile(input_file, output_file):
+        recorder.log("没有上一次的拆分结果，改为完整拆分")
+        return False
+
+    try:
+        pipeline = Pipeline.load(input_file, recorder=recorder)
+    except ValueError as e:
+        recorder.fail(f"错误: {e}")
+    model = pipeline.model
+    columns = pipeline.columns
+    merge_cols = merge_columns_of(columns)
+
+    with recorder.stage('load_previous', '加载上一次的拆分结果'):
+        prev_wb = load_workbook(output_file, data_only=True, keep_vba=False)
+        prev_ws = prev_wb.active
+        prev_model = load_sheet(prev_ws)
+    if tuple(prev_model.header) != tuple(model.header):
+        recorder.log("上一次拆分结果的表头与输入不一致，改为完整拆分")
+        recorder.set(fallback={'engine': 'incremental', 'reason': '表头不一致',
+                               'stages': recorder.discard_stages()})
+        prev_wb.close()
+        pipeline.wb.close()
+        return False
+
+    recorder.set(sheet=prev_ws.title, incremental=True)
+    recorder.log(f"处理Sheet: {pipeline.ws.title}（增量模式，上一次结果: {output_file}）")
+    recorder.log(f"需要合并的列: {[get_column_letter(col) for col in merge_cols]}")
+
+    # 两侧的用例块指纹
+    with recorder.stage('fingerprint', '拆分输入的各用例块并计算两侧指纹'):
+        new_blocks, stats = split_blocks(model, columns)
+        new_fingerprints = [block_fingerprint(rows) for rows, _ in new_blocks]
+        prev_columns = filled_columns(prev_model, prev_ws, merge_cols)
+        prev_rows = list(zip(*prev_columns))
+        old_blocks = previous_blocks(prev_model, columns['case_name'])
+        old_fingerprints = [block_fingerprint(prev_rows[start:end]) for start, end in old_blocks]
+
+    with recorder.stage('align', '按顺序对齐两侧的用例块'):
+        matcher = SequenceMatcher(None, old_fingerprints, new_fingerprints, autojunk=False)
+        opcodes = matcher.get_opcodes()
+
+    # 新的行布局：保留的行记录上一次输出中的下标，新生成的行记录值和来源行
+    prev_of = []
+    new_rows = []
+    reused = regenerated = removed = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            for start, end in old_blocks[i1:i2]:
+                for idx in range(start, end):
+                    prev_of.append(idx)
+                    new_rows.append(None)
+            reused += i2 - i1
+            continue
+        removed += i2 - i1
+        regenerated += j2 - j1
+        for rows, source_rows in new_blocks[j1:j2]:
+            styled = set()
+            for row_values, source_row in zip(rows, source_rows):
+                prev_of.append(None)
+                # 同完整拆分：每个来源行的第一行保留来源行的样式，其余复制行只有值
+                new_rows.append((row_values, source_row if source_row not in styled else None))
+                styled.add(source_row)
+
+    recorder.log(f"\n共 {len(new_blocks)} 个用例块：未变化 {reused} 个，重新生成 {regenerated} 个，"
+                 f"上一次结果中删除 {removed} 个")
+
+    with recorder.stage('splice', '把重新生成的用例块拼接进上一次的结果'):
+        cells_by_row = {}
+        for (row, col), cell in prev_ws._cells.items():
+            cells_by_row.setdefault(row, {})[col] = cell
+        new_cells = {(1, col): cell for col, cell in cells_by_row.get(1, {}).items()}
+        source_ws = pipeline.ws
+        old_dimensions = dict(prev_ws.row_dimensions)
+        prev_ws.row_dimensions.clear()
+        if 1 in old_dimensions:
+            prev_ws.row_dimensions[1] = old_dimensions[1]
+
+        row_of_prev = {}
+        final_columns = [[] for _ in prev_columns]
+        for idx, (prev_idx, new_row) in enumerate(zip(prev_of, new_rows)):
+            row = idx + FIRST_DATA_ROW
+            if prev_idx is not None:
+                old_row = prev_idx + FIRST_DATA_ROW
+                row_of_prev[old_row] = row
+                for col, cell in cells_by_row.get(old_row, {}).items():
+                    cell.row = row
+                    new_cells[(row, col)] = cell
+                dimension = old_dimensions.get(old_row)
+                if dimension is not None:
+                    dimension.index = row
+                    prev_ws.row_dimensions[row] = dimension
+                for column, prev_column in zip(final_columns, prev_columns):
+                    column.append(prev_column[prev_idx])
+                continue
+
+            row_values, style_row = new_row
+            for col, value in enumerate(row_values, start=1):
+                source = source_ws._cells.get((style_row, col)) if style_row else None
+                if value is None and source is None:
+                    continue
+                cell = Cell(prev_ws, row=row, column=col, value=value)
+                if source is not None:
+                    copy_cell_style(source, cell)
+                new_cells[(row, col)] = cell
+            prev_ws.row_dimensions[row].height = 50
+            for column, value in zip(final_columns, row_values):
+                column.append(value)
+        prev_ws._cells = new_cells
+
+    # 合并区域：完整落在保留行内且仍然连续的区域平移，其余的在变化的行附近重新计算
+    with recorder.stage('merge_ranges', '重新计算变化处的合并区域'):
+        dirty = dirty_rows(prev_of, prev_model.n_rows)
+        kept_ranges = {col: [] for col in merge_cols}
+        other_ranges = []
+        col_dirty = {col: set(dirty) for col in merge_cols}
+        for rng in prev_ws.merged_cells.ranges:
+            rows = range(max(rng.min_row, FIRST_DATA_ROW), rng.max_row + 1)
+            mapped = [row_of_prev.get(row) for row in rows]
+            intact = (None not in mapped and (not mapped or mapped[-1] - mapped[0] == len(mapped) - 1))
+            if rng.min_col == rng.max_col and rng.min_col in merge_cols and rng.min_row >= FIRST_DATA_ROW:
+                if intact:
+                    kept_ranges[rng.min_col].append((mapped[0], mapped[-1]))
+                else:
+                    col_dirty[rng.min_col].update(row - FIRST_DATA_ROW for row in mapped if row is not None)
+            elif intact:
+                shift = mapped[0] - rows[0] if mapped else 0
+                other_ranges.append((rng.min_col, rng.min_row + (shift if rng.min_row >= FIRST_DATA_ROW else 0),
+                                     rng.max_col, rng.max_row + shift))
+
+        ranges = [f'{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}'
+                  for min_col, min_row, max_col, max_row in other_ranges]
+        recomputed = []
+        for col in merge_cols:
+            column = final_columns[col - 1]
+            texts = [str(value).strip() if value is not None else '' for value in column]
+            # 与窗口相交的保留区域也并入窗口重新计算，直到窗口不再扩大
+            pending = kept_ranges[col]
+            while True:
+                windows = merge_windows(texts, col_dirty[col])
+                starts = [lo for lo, _ in windows]
+                remaining = []
+                for start_row, end_row in pending:
+                    lo, hi = start_row - FIRST_DATA_ROW, end_row - FIRST_DATA_ROW
+                    pos = bisect_right(starts, hi) - 1
+                    if pos >= 0 and windows[pos][1] >= lo:
+                        col_dirty[col].update(range(lo, hi + 1))
+                    else:
+                        remaining.append((start_row, end_row))
+                if len(remaining) == len(pending):
+                    break
+                pending = remaining
+            ranges.extend(f'{get_column_letter(col)}{start_row}:{get_column_letter(col)}{end_row}'
+                          for start_row, end_row in pending)
+
+            letter = get_column_letter(col)
+            for lo, hi in windows:
+                covered = set()
+                for run_lo, run_hi in window_runs(texts, lo, hi):
+                    recomputed.append(f'{letter}{run_lo + FIRST_DATA_ROW}:{letter}{run_hi + FIRST_DATA_ROW}')
+                    covered.update(range(run_lo + 1, run_hi + 1))
+                # 窗口内的单元格按新的合并区域重建：区域首行和未合并的行写值，其余为合并单元格
+                for idx in range(lo, hi + 1):
+                    row = idx + FIRST_DATA_ROW
+                    cell = new_cells.get((row, col))
+                    if idx in covered:
+                        new_cells[(row, col)] = MergedCell(prev_ws, row, col)
+                    elif cell is None or isinstance(cell, MergedCell):
+                        if column[idx] is None and cell is None:
+                            continue
+                        new_cell = Cell(prev_ws, row=row, column=col, value=column[idx])
+                        if cell is not None and cell.has_style:
+                            new_cell._style = copy(cell._style)
+                        new_cells[(row, col)] = new_cell
+                    elif cell.value is not column[idx]:
+                        cell.value = column[idx]
+
+        merged_ranges = [MergedCellRange(prev_ws, coord) for coord in ranges]
+        new_ranges = [MergedCellRange(prev_ws, coord) for coord in recomputed]
+        prev_ws.merged_cells = MultiCellRange(merged_ranges + new_ranges)
+        for rng in new_ranges:
+            rng.format()
+
+    recorder.log(f"拆分了 {stats['split']} 行，共插入 {stats['inserted']} 行新数据，清空了 {stats['cleared']} 个单元格中的#号")
+    recorder.log(f"重新计算了 {len(recomputed)} 组合并单元格，平移了 {len(merged_ranges)} 组")
+    recorder.count(rows_before=model.n_rows + 1, rows_after=len(prev_of) + 1, columns=len(model.header),
+                   split=stats['split'], inserted=stats['inserted'], cleared=stats['cleared'],
+                   blocks=len(new_blocks), blocks_reused=reused, blocks_regenerated=regenerated,
+                   blocks_removed=removed, merged_ranges=len(merged_ranges) + len(new_ranges),
+                   merged_ranges_recomputed=len(new_ranges))
+
+    try:
+        with recorder.stage('save', '保存文件'):
+            prev_wb.save(output_file)
+        recorder.log(f"\n✅ 处理完成！文件已保存到: {output_file}")
+    except Exception as e:
+        recorder.fail(f"\n❌ 保存文件时出错: {e}")
+    finally:
+        prev_wb.close()
+        pipeline.wb.close()
+    return True
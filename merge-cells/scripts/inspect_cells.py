@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+快速查看测试用例Excel文件
+只读取前N行（默认活动sheet，与合并/拆分处理的sheet相同）：输出sheet列表、表头（列字母→列名）、识别出的用例名称/步骤描述/预期结果等列的列字母，
+以及前N行的非空单元格。用openpyxl只读模式逐行读取，不依赖pandas；
+openpyxl等模块在需要时才导入，启动开销只有解释器本身和openpyxl。
+
+用法：
+    python inspect_cells.py <Excel文件>... [-n 20] [--sheet 名称] [--max-width 80] [--json]
+"""
+
+import argparse
+import json
+import sys
+
+
+DEFAULT_ROWS = 20
+DEFAULT_MAX_WIDTH = 80
+
+# 识别结果中各列的中文名
+COLUMN_LABELS = [
+    ('case_name', '用例名称'),
+    ('step_desc', '步骤描述'),
+    ('expected_result', '预期结果'),
+    ('precondition', '前置条件'),
+]
+
+
+def preview_text(value, max_width):
+    """单元格值转为单行文本，超过max_width个字符时截断（0表示不截断）"""
+    text = str(value).replace('\r', '\\r').replace('\n', '\\n')
+    if max_width and len(text) > max_width:
+        text = text[:max_width] + '…'
+    return text
+
+
+def inspect_workbook(file_path, n_rows=DEFAULT_ROWS, sheet=None, max_width=DEFAULT_MAX_WIDTH):
+    """
+    读取工作簿的概况和前n_rows行（第1行为表头）
+
+    Args:
+        file_path: Excel文件路径
+        n_rows: 读取的行数（含表头行）
+        sheet: sheet名称，默认活动sheet（与merge_cells、split_cells处理的sheet相同）
+        max_width: 单元格最多保留的字符数
+
+    Returns:
+        字典：file、sheets、sheet、dimension、header（列字母→列名）、
+        columns（识别出的列字母，找不到为None；modules为X级模块列字母列表）、
+        rows（[行号, {列字母: 值}]，只含非空单元格）
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils import get_column_letter
+    from sheet_model import detect_columns
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if sheet is None:
+            ws = wb.active or wb.worksheets[0]
+        elif sheet in wb.sheetnames:
+            ws = wb[sheet]
+        else:
+            raise ValueError(f"找不到sheet: {sheet}（可用: {', '.join(wb.sheetnames)}）")
+
+        rows = []
+        header = ()
+        for row_idx, values in enumerate(ws.iter_rows(max_row=n_rows, values_only=True), 1):
+            if row_idx == 1:
+                header = tuple(values)
+            cells = {get_column_letter(col): preview_text(value, max_width)
+                     for col, value in enumerate(values, 1) if value is not None}
+            rows.append([row_idx, cells])
+
+        detected = detect_columns(header)
+        columns = {key: get_column_letter(detected[key]) if detected[key] else None for key, _ in COLUMN_LABELS}
+        columns['modules'] = [get_column_letter(col) for col in detected['modules']]
+
+        return {
+            'file': file_path,
+            'sheets': wb.sheetnames,
+            'sheet': ws.title,
+            'dimension': ws.calculate_dimension() if ws.max_row else None,
+            'header': {get_column_letter(col): str(value) for col, value in enumerate(header, 1)
+                       if value is not None},
+            'columns': columns,
+            'rows': rows,
+        }
+    finally:
+        wb.close()
+
+
+def format_report(info):
+    """把inspect_workbook()的结果转为文本"""
+    lines = [f"文件: {info['file']}"]
+    lines.append(f"sheet: {info['sheet']}（共{len(info['sheets'])}个: {', '.join(info['sheets'])}）")
+    lines.append(f"范围: {info['dimension'] or '未知'}")
+    lines.append('')
+    lines.append('=== 表头 ===')
+    for letter, name in info['header'].items():
+        lines.append(f'  {letter}: {name}')
+    lines.append('')
+    lines.append('=== 识别出的列 ===')
+    for key, label in COLUMN_LABELS:
+        lines.append(f"  {label}: {info['columns'][key] or '未找到'}")
+    lines.append(f"  模块列: {', '.join(info['columns']['modules']) or '未找到'}")
+    lines.append('')
+    lines.append(f"=== 前{len(info['rows'])}行（只列出非空单元格）===")
+    for row_idx, cells in info['rows']:
+        lines.append(f'行{row_idx}:')
+        for letter, text in cells.items():
+            name = info['header'].get(letter)
+            lines.append(f'  {letter}' + (f' {name}' if name and row_idx > 1 else '') + f': {text}')
+    return '\n'.join(lines)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='快速查看测试用例Excel文件：表头、识别出的列和前N行')
+    parser.add_argument('files', nargs='+', help='Excel文件路径（可多个）')
+    parser.add_argument('-n', '--rows', type=int, default=DEFAULT_ROWS,
+                        help=f'读取的行数，含表头行（默认{DEFAULT_ROWS}）')
+    parser.add_argument('--sheet', default=None, help='sheet名称（默认活动sheet，即合并/拆分处理的sheet）')
+    parser.add_argument('--max-width', type=int, default=DEFAULT_MAX_WIDTH,
+                        help=f'每个单元格最多输出的字符数，0表示不截断（默认{DEFAULT_MAX_WIDTH}）')
+    parser.add_argument('--json', action='store_true', help='输出JSON（每个文件一行）')
+
+    args = parser.parse_args()
+
+    failed = False
+    for idx, file_path in enumerate(args.files):
+        try:
+            info = inspect_workbook(file_path, args.rows, args.sheet, args.max_width)
+        except Exception as e:
+            print(f"❌ {file_path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        if args.json:
+            print(json.dumps(info, ensure_ascii=False))
+        else:
+            if idx:
+                print()
+            print(format_report(info))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
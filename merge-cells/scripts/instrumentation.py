@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+处理过程的结构化记录
+记录加载、列识别、每个步骤和保存各阶段的耗时与峰值内存，以及行数/单元格数等计数，
+最后汇总为一个JSON报告（或交给回调函数）。quiet模式下不输出过程文字，只保留报告，
+调用方不必再从大量输出中找结果。
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """
+    当前进程的峰值内存（RSS）
+
+    Returns:
+        MB数；平台不支持时返回None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+class Recorder(object):
+    """
+    一次处理的记录器
+
+    Attributes:
+        quiet: 为True时log()不输出
+        callback: finish()时调用，参数为报告字典
+        report: 报告字典：script、ok、error、stages、counters、total_seconds、peak_rss_mb，
+                以及通过set()添加的字段（input_file、output_file、sheet、engine等）
+    """
+
+    def __init__(self, script, quiet=False, callback=None):
+        self.quiet = quiet
+        self.callback = callback
+        self.report = {'script': script, 'ok': True, 'error': None, 'stages': [], 'counters': {}}
+        self._start = time.perf_counter()
+
+    def log(self, message=''):
+        """输出过程文字（quiet模式下不输出）"""
+        if not self.quiet:
+            print(message)
+
+    @contextmanager
+    def stage(self, name, label=None):
+        """
+        记录一个阶段的耗时和结束时的峰值内存
+
+        Args:
+            name: 阶段标识（如load、step1、save）
+            label: 阶段说明
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.report['stages'].append({
+                'name': name,
+                'label': label,
+                'seconds': round(time.perf_counter() - start, 4),
+                'peak_rss_mb': peak_rss_mb(),
+            })
+
+    def count(self, **counters):
+        """记录计数（同名的覆盖）"""
+        self.report['counters'].update(counters)
+
+    def set(self, **fields):
+        """记录报告的其他字段"""
+        self.report.update(fields)
+
+    def discard_stages(self):
+        """
+        清空已记录的阶段（换用其他引擎重新处理时使用）
+
+        Returns:
+            清空前的阶段列表
+        """
+        stages = self.report['stages']
+        self.report['stages'] = []
+        return stages
+
+    def finish(self):
+        """
+        结束记录，汇总总耗时和峰值内存并交给回调
+
+        Returns:
+            报告字典
+        """
+        self.report['total_seconds'] = round(time.perf_counter() - self._start, 4)
+        self.report['peak_rss_mb'] = peak_rss_mb()
+        if self.callback is not None:
+            self.callback(self.report)
+        return self.report
+
+    def fail(self, message):
+        """
+        记录错误并结束：错误信息总是输出（quiet模式下输出到标准错误，标准输出只留给报告），
+        然后以状态码1退出
+
+        Args:
+            message: 错误信息
+        """
+        print(message, file=sys.stderr if self.quiet else sys.stdout)
+        self.report['ok'] = False
+        self.report['error'] = message.strip()
+        self.finish()
+        sys.exit(1)
+
+
+def add_report_arguments(parser):
+    """给命令行加上--quiet和--report参数"""
+    parser.add_argument('--quiet', action='store_true',
+                        help='不输出处理过程，只输出JSON报告（指定--report时写入文件，什么都不输出）')
+    parser.add_argument('--report', default=None, help='把JSON报告（各阶段耗时、计数、峰值内存）写入文件')
+
+
+def recorder_from_args(script, args):
+    """
+    按命令行参数创建记录器：报告写入--report指定的文件，或在quiet模式下输出到标准输出
+
+    Args:
+        script: 脚本名称
+        args: 含quiet和report的argparse结果
+
+    Returns:
+        Recorder对象
+    """
+    def emit(report):
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        elif args.quiet:
+            print(json.dumps(report, ensure_ascii=False))
+
+    return Recorder(script, quiet=args.quiet, callback=emit)
@@ -5,285 +5,172 @@
 用于merge-cells skill
 """
 
-import sys
+import argparse
 import os
-from openpyxl import load_workbook
+import time
 from openpyxl.utils import get_column_letter
 
+from case_export import export_result, format_of
+from checkpoint import (DEFAULT_CHUNK_CASES, add_checkpoint_arguments, check_checkpoint_arguments,
+                        checkpoint_dir_from_args, chunked_process)
+from instrumentation import Recorder, add_report_arguments, recorder_from_args
+from pipeline import Pipeline
+from result_cache import add_cache_arguments, cache_from_args
+from stream_engine import stream_merge_cells
 
-def find_column_by_keyword(ws, keywords, start_row=1):
-    """
-    根据关键词查找列索引
-    
-    Args:
-        ws: worksheet对象
-        keywords: 关键词列表，如['用例名称', '用例名', '名称']
-        start_row: 开始查找的行（默认第1行，即表头）
-    
-    Returns:
-        列索引（1-based），如果找不到返回None
-    """
-    if start_row > ws.max_row:
-        return None
-    
-    # 读取表头行
-    header_row = start_row
-    for col_idx in range(1, ws.max_column + 1):
-        cell = ws.cell(row=header_row, column=col_idx)
-        if cell.value:
-            cell_value = str(cell.value).strip()
-            for keyword in keywords:
-                if keyword in cell_value:
-                    return col_idx
-    return None
-
-
-def add_hash_prefix(value):
-    """
-    给单元格内容前加上#号（如果还没有）
-    如果单元格为空，也返回#
-    
-    Args:
-        value: 单元格值
-    
-    Returns:
-        处理后的值
-    """
-    if value is None:
-        return '#'
-    
-    value_str = str(value).strip()
-    if not value_str:
-        return '#'
-    
-    if not value_str.startswith('#'):
-        return '#' + value_str
-    return value_str
 
-
-def get_cell_value(ws, row, col):
+def merge_cells(input_file, output_file=None, engine='full', all_sheets=False, workers=None, recorder=None,
+                cache=None, export=None, checkpoint=None, chunk_size=DEFAULT_CHUNK_CASES, rows=None, modules=None):
     """
-    安全获取单元格值
+    合并Excel测试用例单元格
     
     Args:
-        ws: worksheet对象
-        row: 行号（1-based）
-        col: 列号（1-based）
+        input_file: 输入Excel文件路径
+        output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        engine: 处理引擎，'full'为完整加载（保留样式），'stream'为流式处理（内存占用低，不保留样式），
+                'xml'为直接读写xlsx中的XML（最快，保留样式；sheet含公式、超链接等时自动回退到full）
+        all_sheets: 为True时处理所有包含用例表头的sheet（并发），否则只处理第一个sheet
+        workers: all_sheets模式下的并发进程数（默认CPU核数）
+        recorder: Recorder对象（可选），记录各阶段耗时、计数和峰值内存；
+                  用Recorder(..., quiet=True, callback=...)可以不输出过程文字而只拿到报告
+        cache: ResultCache对象（可选），输入没有变化时直接使用缓存的结果
+        export: 同时把结果中的用例导出到的路径（.jsonl 或 .parquet，见case_export），默认不导出
+        checkpoint: 检查点目录（可选），给出时分段处理并保存检查点，中断后重新运行从中断处继续（见checkpoint）
+        chunk_size: 分段处理时每段的用例数
+        rows: 行范围（如 "2:5000"），只处理用例名称所在行在范围内的用例，输出中只有选中的用例
+        modules: 模块条件列表（"值" 或 "列名=值"），只处理满足任一条件的用例
     
     Returns:
-        单元格值，如果单元格不存在或为空返回None
+        报告字典（见instrumentation.Recorder）
     """
-    if row > ws.max_row or col > ws.max_column:
-        return None
-    
-    cell = ws.cell(row=row, column=col)
-    value = cell.value
-    if value is None:
-        return None
-    
-    value_str = str(value).strip()
-    return value_str if value_str else None
+    recorder = recorder or Recorder('merge_cells')
+    recorder.set(input_file=input_file, output_file=output_file or input_file, engine=engine)
+    options = {'engine': engine, 'all_sheets': all_sheets}
+    if rows or modules:
+        options.update(rows=rows, modules=list(modules or ()))
+    if cache is not None:
+        hit, cache_key = cache.lookup('merge', input_file, output_file or input_file, options, recorder)
+        if hit:
+            export_result(output_file or input_file, export, recorder)
+            return recorder.finish()
+    
+    if all_sheets:
+        from multi_sheet import process_all_sheets
+        process_all_sheets('merge', input_file, output_file, workers, recorder)
+    elif checkpoint or rows or modules:
+        chunked_process('merge', input_file, output_file, recorder, checkpoint, chunk_size, rows, modules)
+    elif engine == 'stream':
+        stream_merge_cells(input_file, output_file, recorder)
+    else:
+        merge_sheet(input_file, output_file, engine, recorder)
+    
+    if cache is not None:
+        cache.store(cache_key, 'merge', output_file or input_file, options)
+    export_result(output_file or input_file, export, recorder)
+    return recorder.finish()
 
 
-def merge_cells(input_file, output_file=None):
+def merge_sheet(input_file, output_file, engine, recorder):
     """
-    合并Excel测试用例单元格
+    用完整加载（或xml）引擎合并第一个sheet
     
     Args:
         input_file: 输入Excel文件路径
         output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        engine: 'full' 或 'xml'
+        recorder: Recorder对象
     """
+    if engine == 'xml':
+        from xml_engine import UnsupportedSheet, xml_merge_cells
+        try:
+            return xml_merge_cells(input_file, output_file, recorder)
+        except UnsupportedSheet as e:
+            recorder.log(f"XML快速路径不适用（{e}），改用完整加载引擎")
+            recorder.set(engine='full', fallback={'engine': 'xml', 'reason': str(e),
+                                                  'stages': recorder.discard_stages()})
+    
     if output_file is None:
         output_file = input_file
     
-    # 加载工作簿
-    wb = load_workbook(input_file, data_only=True, keep_vba=False)
-    
-    # 获取第一个sheet
-    ws = wb.active
-    
-    print(f"处理Sheet: {ws.title}")
-    print(f"总行数: {ws.max_row}, 总列数: {ws.max_column}")
-    
-    # 查找列索引
-    case_name_col = find_column_by_keyword(ws, ['用例名称', '用例名', '名称'], 1)
-    step_desc_col = find_column_by_keyword(ws, ['步骤描述', '步骤', '描述'], 1)
-    expected_result_col = find_column_by_keyword(ws, ['预期结果', '结果', '预期'], 1)
-    
-    if case_name_col is None:
-        print("错误: 找不到'用例名称'列")
-        sys.exit(1)
-    if step_desc_col is None:
-        print("错误: 找不到'步骤描述'列")
-        sys.exit(1)
-    if expected_result_col is None:
-        print("错误: 找不到'预期结果'列")
-        sys.exit(1)
-    
-    print(f"用例名称列: {get_column_letter(case_name_col)} (列{case_name_col})")
-    print(f"步骤描述列: {get_column_letter(step_desc_col)} (列{step_desc_col})")
-    print(f"预期结果列: {get_column_letter(expected_result_col)} (列{expected_result_col})")
+    # 加载工作簿，读入内存模型（默认处理第一个sheet）
+    try:
+        pipeline = Pipeline.load(input_file, recorder=recorder)
+    except ValueError as e:
+        recorder.fail(f"错误: {e}")
+    ws = pipeline.ws
+    columns = pipeline.columns
+    
+    recorder.set(sheet=ws.title)
+    recorder.log(f"处理Sheet: {ws.title}")
+    recorder.log(f"总行数: {ws.max_row}, 总列数: {ws.max_column}")
+    recorder.log(f"用例名称列: {get_column_letter(columns['case_name'])} (列{columns['case_name']})")
+    recorder.log(f"步骤描述列: {get_column_letter(columns['step_desc'])} (列{columns['step_desc']})")
+    recorder.log(f"预期结果列: {get_column_letter(columns['expected_result'])} (列{columns['expected_result']})")
+    
+    step_start = time.perf_counter()
+    stats = pipeline.merge()
     
     # 先判断整个文档的最后一行（用例名称列有值的最后一行）
-    last_row_with_case_name = None
-    for row in range(ws.max_row, 1, -1):
-        case_name_value = get_cell_value(ws, row, case_name_col)
-        if case_name_value:
-            last_row_with_case_name = row
-            break
-    
-    if last_row_with_case_name is None:
-        print("警告: 用例名称列没有找到有值的行")
-        last_row_with_case_name = ws.max_row
-    
-    print(f"用例名称列最后有值的行: {last_row_with_case_name}")
+    case_rows = stats['case_rows']
+    if not case_rows:
+        recorder.log("警告: 用例名称列没有找到有值的行")
+    recorder.log(f"用例名称列最后有值的行: {case_rows[-1] if case_rows else ws.max_row}")
     
     # 第一步：给步骤描述和预期结果列的每个单元格内容前加上#号
-    print("\n步骤1: 给步骤描述和预期结果列添加#号前缀...")
-    modified_count = 0
-    for row in range(2, ws.max_row + 1):  # 从第2行开始（第1行是表头）
-        # 处理步骤描述列（包括空单元格）
-        step_value = get_cell_value(ws, row, step_desc_col)
-        new_step_value = add_hash_prefix(step_value)
-        # 如果单元格为空或值发生变化，则更新
-        if step_value is None or new_step_value != step_value:
-            ws.cell(row=row, column=step_desc_col).value = new_step_value
-            modified_count += 1
-        
-        # 处理预期结果列（包括空单元格）
-        result_value = get_cell_value(ws, row, expected_result_col)
-        new_result_value = add_hash_prefix(result_value)
-        # 如果单元格为空或值发生变化，则更新
-        if result_value is None or new_result_value != result_value:
-            ws.cell(row=row, column=expected_result_col).value = new_result_value
-            modified_count += 1
-    
-    print(f"已为 {modified_count} 个单元格添加#号前缀")
+    recorder.log("\n步骤1: 给步骤描述和预期结果列添加#号前缀...")
+    recorder.log(f"已为 {stats['prefixed']} 个单元格添加#号前缀")
     
     # 第二步：找到用例名称有值的行，并合并内容
-    print("\n步骤2: 合并连续行的步骤描述和预期结果...")
-    
-    # 找到所有用例名称有值的行
-    case_name_rows = []
-    for row in range(2, ws.max_row + 1):
-        case_name_value = get_cell_value(ws, row, case_name_col)
-        if case_name_value:
-            case_name_rows.append(row)
-    
-    print(f"找到 {len(case_name_rows)} 个用例名称有值的行: {case_name_rows}")
-    
-    # 合并内容
-    merged_count = 0
-    for i in range(len(case_name_rows)):
-        current_row = case_name_rows[i]
-        # 如果是最后一个用例名称行，合并到文档的最后一行
-        if i + 1 < len(case_name_rows):
-            next_row = case_name_rows[i + 1]
-        else:
-            # 最后一个用例名称行，应该合并到文档的最后一行
-            next_row = ws.max_row + 1
-        
-        # 合并范围：从current_row到next_row-1
-        # 但current_row本身的内容要保留，所以合并的是current_row+1到next_row-1的内容到current_row
-        
-        # 收集步骤描述
-        step_descriptions = []
-        # 先收集当前行的步骤描述（如果有）
-        current_step = get_cell_value(ws, current_row, step_desc_col)
-        if current_step:
-            step_descriptions.append(current_step)
-        
-        # 收集后续行的步骤描述
-        for row in range(current_row + 1, next_row):
-            step_value = get_cell_value(ws, row, step_desc_col)
-            if step_value:
-                step_descriptions.append(step_value)
-        
-        # 收集预期结果
-        expected_results = []
-        # 先收集当前行的预期结果（如果有）
-        current_result = get_cell_value(ws, current_row, expected_result_col)
-        if current_result:
-            expected_results.append(current_result)
-        
-        # 收集后续行的预期结果
-        for row in range(current_row + 1, next_row):
-            result_value = get_cell_value(ws, row, expected_result_col)
-            if result_value:
-                expected_results.append(result_value)
-        
-        # 合并到当前行（直接拼接，无分隔符）
-        if step_descriptions:
-            merged_step = ''.join(step_descriptions)
-            ws.cell(row=current_row, column=step_desc_col).value = merged_step
-        
-        if expected_results:
-            merged_result = ''.join(expected_results)
-            ws.cell(row=current_row, column=expected_result_col).value = merged_result
-        
-        # 清空被合并行的步骤描述和预期结果列
-        for row in range(current_row + 1, next_row):
-            ws.cell(row=row, column=step_desc_col).value = None
-            ws.cell(row=row, column=expected_result_col).value = None
-        
-        if len(step_descriptions) > 1 or len(expected_results) > 1:
-            merged_count += 1
-            cleared_rows = next_row - current_row - 1
-            print(f"  行{current_row}: 合并了 {len(step_descriptions)} 个步骤描述, {len(expected_results)} 个预期结果，清空了 {cleared_rows} 行（行{current_row+1}到行{next_row-1}）")
-    
-    print(f"共合并了 {merged_count} 组内容")
-    
-    # 第三步：清理全部的空行
-    print("\n步骤3: 清理全部的空行...")
-    initial_max_row = ws.max_row
-    deleted_count = 0
-    
-    # 从后往前遍历，避免删除后索引变化的问题
-    # 从最后一行开始，到第2行结束（第1行是表头，不删除）
-    # 记录初始最大行数，避免死循环
-    start_row = ws.max_row
-    
-    for row in range(start_row, 1, -1):  # 从最后一行往前到第2行
-        # 检查整行是否为空
-        is_empty = True
-        for col in range(1, ws.max_column + 1):
-            cell_value = ws.cell(row=row, column=col).value
-            if cell_value is not None:
-                # 检查是否为空字符串或只包含空白字符
-                if isinstance(cell_value, str):
-                    if cell_value.strip():
-                        is_empty = False
-                        break
-                else:
-                    is_empty = False
-                    break
-        
-        # 如果整行为空，删除该行
-        if is_empty:
-            ws.delete_rows(row)
-            deleted_count += 1
-    
-    print(f"删除了 {deleted_count} 个空行（初始行数: {initial_max_row}, 最终行数: {ws.max_row}）")
+    recorder.log("\n步骤2: 合并连续行的步骤描述和预期结果...")
+    recorder.log(f"找到 {len(case_rows)} 个用例名称有值的行")
+    recorder.log(f"共合并了 {len(stats['merged_blocks'])} 组内容，"
+                 f"清空了 {sum(block[3] for block in stats['merged_blocks'])} 行")
+    
+    # 第三步：清理全部的空行（模型上已确定保留的行，这里一次性写回sheet，样式、行属性、合并区域随行搬移）
+    recorder.log("\n步骤3: 清理全部的空行...")
+    pipeline.flush()
+    elapsed = time.perf_counter() - step_start
+    recorder.log(f"删除了 {stats['deleted']} 个空行（初始行数: {stats['rows_before']}, 最终行数: {ws.max_row}），耗时 {elapsed:.3f} 秒")
+    recorder.count(rows_before=stats['rows_before'], rows_after=ws.max_row, columns=ws.max_column,
+                   prefixed=stats['prefixed'], cases=len(case_rows),
+                   merged_blocks=len(stats['merged_blocks']), deleted=stats['deleted'])
     
     # 保存文件
     try:
-        wb.save(output_file)
-        print(f"\n✅ 处理完成！文件已保存到: {output_file}")
+        pipeline.save(output_file, flush=False)
+        recorder.log(f"\n✅ 处理完成！文件已保存到: {output_file}")
     except Exception as e:
-        print(f"\n❌ 保存文件时出错: {e}")
-        sys.exit(1)
-    finally:
-        wb.close()
+        recorder.fail(f"\n❌ 保存文件时出错: {e}")
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python merge_cells.py <input_file> [<output_file>]")
-        print("  input_file: 输入Excel文件路径")
-        print("  output_file: 输出Excel文件路径（可选，默认覆盖原文件）")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    
-    merge_cells(input_file, output_file)
+    parser = argparse.ArgumentParser(description='合并Excel测试用例单元格')
+    parser.add_argument('input_file', help='输入Excel文件路径')
+    parser.add_argument('output_file', nargs='?', default=None, help='输出Excel文件路径（可选，默认覆盖原文件）')
+    parser.add_argument('--engine', choices=['full', 'stream', 'xml'], default='full',
+                        help='处理引擎：full完整加载（默认），stream流式处理超大文件，'
+                             'xml直接读写XML（不支持的sheet自动回退到full）')
+    parser.add_argument('--all-sheets', action='store_true',
+                        help='处理所有包含用例名称/步骤描述/预期结果列的sheet（并发处理），默认只处理第一个sheet')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='--all-sheets模式下的并发进程数（默认CPU核数）')
+    add_report_arguments(parser)
+    add_cache_arguments(parser)
+    parser.add_argument('--export', default=None,
+                        help='同时把结果中的用例导出为JSONL/Parquet（按扩展名 .jsonl/.parquet，步骤为列表），'
+                             '供下游系统直接读取；用case_export.py import可重新生成xlsx')
+    add_checkpoint_arguments(parser)
+    args = parser.parse_args()
+    if args.all_sheets and args.engine != 'full':
+        parser.error('--all-sheets 只支持 full 引擎')
+    if args.export:
+        try:
+            format_of(args.export)
+        except ValueError as e:
+            parser.error(str(e))
+    check_checkpoint_arguments(parser, args)
+    
+    merge_cells(args.input_file, args.output_file, engine=args.engine,
+                all_sheets=args.all_sheets, workers=args.workers,
+                recorder=recorder_from_args('merge_cells', args), cache=cache_from_args(args), export=args.export,
+                checkpoint=checkpoint_dir_from_args(args), chunk_size=args.chunk_size, rows=args.rows,
+                modules=args.module)
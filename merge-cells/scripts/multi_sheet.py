@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多sheet并发处理
+识别工作簿中每个sheet的用例名称/步骤描述/预期结果列，把匹配的sheet读成内存模型后
+用进程池并发完成合并/拆分变换，再逐个写回原sheet，最后保存为一个输出工作簿。
+没有匹配表头的sheet原样保留并在报告中标记为跳过。
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl import load_workbook
+
+from instrumentation import Recorder
+from pipeline import merge_model, split_model, format_split_sheet
+from sheet_model import load_sheet, flush_sheet, detect_columns, missing_columns
+
+
+def transform_sheet(mode, model, columns):
+    """
+    在工作进程中变换单个sheet的模型
+
+    Args:
+        mode: 'merge' 或 'split'
+        model: SheetModel对象
+        columns: detect_columns()的返回值
+
+    Returns:
+        (变换后的模型, 统计字典, 耗时秒数)
+    """
+    start = time.perf_counter()
+    if mode == 'merge':
+        stats = merge_model(model, columns)
+    else:
+        stats = split_model(model, columns)
+    return model, stats, time.perf_counter() - start
+
+
+def process_all_sheets(mode, input_file, output_file=None, workers=None, recorder=None):
+    """
+    并发处理工作簿中所有包含用例表头的sheet
+
+    Args:
+        mode: 'merge' 或 'split'
+        input_file: 输入Excel文件路径
+        output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        workers: 并发进程数（默认CPU核数）
+        recorder: Recorder对象（可选），每个sheet的报告记录在其sheets字段中
+
+    Returns:
+        每个sheet的报告列表，每项为字典：sheet、status、rows_before、rows_after、seconds、reason
+    """
+    recorder = recorder or Recorder(f'{mode}_cells')
+    if output_file is None:
+        output_file = input_file
+
+    # 加载工作簿
+    with recorder.stage('load', '加载工作簿'):
+        wb = load_workbook(input_file, data_only=True, keep_vba=False)
+    recorder.log(f"共 {len(wb.worksheets)} 个Sheet，{'合并' if mode == 'merge' else '拆分'}所有包含用例表头的Sheet...")
+
+    reports = []
+    jobs = []
+    with recorder.stage('detect_columns', '读入内存模型并识别每个sheet的列'):
+        for ws in wb.worksheets:
+            load_start = time.perf_counter()
+            model = load_sheet(ws)
+            columns = detect_columns(model.header)
+            missing = missing_columns(columns)
+            report = {'sheet': ws.title, 'status': 'skipped', 'rows_before': ws.max_row,
+                      'rows_after': ws.max_row, 'seconds': 0.0, 'reason': None}
+            reports.append(report)
+            if missing:
+                report['reason'] = f"找不到{'/'.join(missing)}列"
+                continue
+            jobs.append((ws, model, columns, report, time.perf_counter() - load_start))
+    recorder.set(sheets=reports)
+
+    # 变换是纯内存计算，多个sheet时分发到进程池并发执行
+    with recorder.stage('steps', '各sheet的变换（进程池并发）'):
+        if len(jobs) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(transform_sheet, mode, model, columns)
+                           for _, model, columns, _, _ in jobs]
+                results = [future.result() for future in futures]
+        else:
+            results = [transform_sheet(mode, model, columns) for _, model, columns, _, _ in jobs]
+
+    # 写回各自的sheet
+    with recorder.stage('flush', '写回sheet'):
+        for (ws, _, columns, report, load_seconds), (model, stats, transform_seconds) in zip(jobs, results):
+            flush_start = time.perf_counter()
+            flush_sheet(model, ws)
+            if mode == 'split':
+                format_split_sheet(ws, model, columns)
+            report['status'] = 'processed'
+            report['rows_after'] = ws.max_row
+            report['seconds'] = round(load_seconds + transform_seconds + time.perf_counter() - flush_start, 3)
+
+    for report in reports:
+        if report['status'] == 'processed':
+            recorder.log(f"  ✅ {report['sheet']}: {report['rows_before']} 行 -> {report['rows_after']} 行，耗时 {report['seconds']:.3f} 秒")
+        else:
+            recorder.log(f"  ⏭  {report['sheet']}: 跳过（{report['reason']}）")
+    recorder.count(sheets_processed=len(jobs), sheets_skipped=len(reports) - len(jobs),
+                   rows_before=sum(report['rows_before'] for report in reports),
+                   rows_after=sum(report['rows_after'] for report in reports))
+
+    if not jobs:
+        wb.close()
+        recorder.fail("错误: 没有找到包含用例名称/步骤描述/预期结果列的Sheet")
+
+    # 保存文件
+    try:
+        with recorder.stage('save', '保存文件'):
+            wb.save(output_file)
+        recorder.log(f"\n✅ 处理完成！共处理 {len(jobs)} 个Sheet，跳过 {len(reports) - len(jobs)} 个，文件已保存到: {output_file}")
+    except Exception as e:
+        recorder.fail(f"\n❌ 保存文件时出错: {e}")
+    finally:
+        wb.close()
+    return reports
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+处理结果缓存
+以输入文件内容的哈希、脚本版本（scripts目录下源码的哈希和openpyxl版本）和处理选项
+（merge/split、引擎等）为键，保存处理后的输出文件。输入没有变化时不再重新处理：
+输出文件已经是缓存的结果时直接跳过，否则把缓存的结果复制过去。
+
+原地处理（输出覆盖输入）时，输入文件就是上次的输出，因此还会记录每个输出内容的哈希，
+再次运行时识别出来直接跳过。
+
+缓存总大小有上限，超出时按最近使用时间淘汰（LRU，命中时更新文件的修改时间）。
+缓存条目的写入都是先写临时文件再替换，多个进程同时使用同一个缓存目录也是安全的。
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+import openpyxl
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'merge-cells')
+DEFAULT_MAX_MB = 1024
+CHUNK_SIZE = 1 << 20
+
+_scripts_version = None
+
+
+def file_digest(path):
+    """
+    文件内容的SHA-256
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scripts_version():
+    """
+    脚本版本：scripts目录下全部源码和openpyxl版本的哈希，任何脚本修改后旧的缓存自动失效
+
+    Returns:
+        十六进制哈希字符串
+    """
+    global _scripts_version
+    if _scripts_version is None:
+        digest = hashlib.sha256(openpyxl.__version__.encode('utf-8'))
+        for path in sorted(glob.glob(os.path.join(SCRIPT_DIR, '*.py'))):
+            digest.update(os.path.basename(path).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _scripts_version = digest.hexdigest()
+    return _scripts_version
+
+
+def replace_output(tmp_path, output_file):
+    """
+    用临时文件替换输出文件，权限与直接写入时相同：输出文件已存在时沿用其权限，
+    否则为0o666去掉umask（mkstemp创建的临时文件总是0600）
+
+    Args:
+        tmp_path: 临时文件路径（与输出文件在同一目录）
+        output_file: 输出文件路径
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(output_file).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, output_file)
+
+
+def atomic_copy(src, dst):
+    """
+    复制文件：先写到目标目录下的临时文件再替换，复制中断时不会留下半个文件；
+    权限同replace_output()（缓存命中时输出文件的权限与实际处理时相同）
+
+    Args:
+        src: 源文件路径
+        dst: 目标文件路径
+    """
+    dst_dir = os.path.dirname(os.path.abspath(dst))
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=dst_dir)
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_path)
+        replace_output(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ResultCache(object):
+    """
+    处理结果缓存
+
+    缓存目录中每个条目由三个文件组成：
+        <key>.xlsx  处理后的输出文件
+        <key>.json  条目信息：输出哈希、大小、标记文件名、创建时间
+        <marker>.out  标记该输出内容是这组选项的处理结果（用于识别原地处理过的文件）
+
+    Attributes:
+        cache_dir: 缓存目录
+        max_bytes: 缓存输出文件的总大小上限（字节）
+    """
+
+    def __init__(self, cache_dir=None, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_of(self, kind, digest, mode, options):
+        """
+        缓存键
+
+        Args:
+            kind: 'input'（按输入内容查结果）或 'output'（标记已处理过的内容）
+            digest: 文件内容哈希
+            mode: 'merge' 或 'split'
+            options: 影响输出的处理选项字典
+
+        Returns:
+            十六进制哈希字符串
+        """
+        payload = json.dumps([kind, digest, scripts_version(), mode, options], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def lookup(self, mode, input_file, output_file, options, recorder):
+        """
+        查找缓存，命中时完成输出（跳过或复制）
+
+        Args:
+            mode: 'merge' 或 'split'
+            input_file: 输入文件路径
+            output_file: 输出文件路径
+            options: 影响输出的处理选项字典
+            recorder: Recorder对象，记录命中情况
+
+        Returns:
+            (是否命中, 缓存键)；未命中时处理完后用该键调用store()
+        """
+        with recorder.stage('cache_lookup', '计算输入哈希并查找缓存'):
+            input_digest = file_digest(input_file)
+            key = self.key_of('input', input_digest, mode, options)
+            same_file = os.path.exists(output_file) and os.path.samefile(input_file, output_file)
+            if same_file and os.path.exists(self._path(self.key_of('output', input_digest, mode, options) + '.out')):
+                # 原地处理过的文件：输入就是上次的输出
+                return self._hit(recorder, key, 'skipped'), key
+            entry = self._read_entry(key)
+            if entry is None:
+                recorder.set(cache={'status': 'miss', 'key': key})
+                recorder.count(cache_hits=0, cache_misses=1)
+                return False, key
+            if os.path.exists(output_file) and file_digest(output_file) == entry['output_sha256']:
+                self._touch(key)
+                return self._hit(recorder, key, 'skipped'), key
+
+        with recorder.stage('cache_copy', '复制缓存的结果'):
+            try:
+                self._touch(key)
+                atomic_copy(self._path(key + '.xlsx'), output_file)
+            except FileNotFoundError:
+                # 条目刚好被其他进程淘汰
+                recorder.set(cache={'status': 'miss', 'key': key})
+                recorder.count(cache_hits=0, cache_misses=1)
+                return False, key
+        return self._hit(recorder, key, 'copied'), key
+
+    def store(self, key, mode, output_file, options):
+        """
+        保存处理结果，并按LRU淘汰超出上限的条目
+
+        Args:
+            key: lookup()返回的缓存键
+            mode: 'merge' 或 'split'
+            output_file: 处理后的输出文件路径
+            options: 影响输出的处理选项字典
+        """
+        output_digest = file_digest(output_file)
+        marker = self.key_of('output', output_digest, mode, options) + '.out'
+        atomic_copy(output_file, self._path(key + '.xlsx'))
+        entry = {
+            'output_sha256': output_digest,
+            'size': os.path.getsize(output_file),
+            'marker': marker,
+            'created': time.time(),
+        }
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(key + '.json'))
+        open(self._path(marker), 'a').close()
+        self.evict()
+
+    def evict(self):
+        """
+        总大小超出上限时，从最久未使用的条目开始删除
+
+        Returns:
+            删除的条目数
+        """
+        entries = []
+        for path in glob.glob(self._path('*.xlsx')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            key = os.path.basename(path)[:-len('.xlsx')]
+            entry = self._read_entry(key)
+            names = [key + '.xlsx', key + '.json']
+            if entry is not None:
+                names.append(entry['marker'])
+            for name in names:
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        """
+        缓存目录的概况
+
+        Returns:
+            字典：entries、bytes、max_bytes
+        """
+        sizes = []
+        for path in glob.glob(self._path('*.xlsx')):
+            try:
+                sizes.append(os.path.getsize(path))
+            except FileNotFoundError:
+                continue
+        return {'entries': len(sizes), 'bytes': sum(sizes), 'max_bytes': self.max_bytes}
+
+    def _read_entry(self, key):
+        try:
+            with open(self._path(key + '.json'), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not os.path.exists(self._path(key + '.xlsx')):
+            return None
+        return entry
+
+    def _touch(self, key):
+        os.utime(self._path(key + '.xlsx'))
+
+    def _hit(self, recorder, key, action):
+        recorder.set(cache={'status': 'hit', 'action': action, 'key': key})
+        recorder.count(cache_hits=1, cache_misses=0)
+        if action == 'skipped':
+            recorder.log("输入未变化，输出已是缓存的处理结果，跳过")
+        else:
+            recorder.log("输入未变化，已从缓存复制处理结果")
+        return True
+
+
+def add_cache_arguments(parser):
+    """给命令行加上--cache、--cache-dir和--cache-size参数"""
+    parser.add_argument('--cache', action='store_true',
+                        help='启用结果缓存：输入内容、脚本版本和选项都没变时不再重新处理')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help=f'缓存目录（默认 {DEFAULT_CACHE_DIR}）')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_MB,
+                        help=f'缓存大小上限MB，超出时淘汰最久未使用的结果（默认{DEFAULT_MAX_MB}）')
+
+
+def cache_from_args(args):
+    """按命令行参数创建缓存（未启用时返回None）"""
+    if not args.cache:
+        return None
+    return ResultCache(args.cache_dir, args.cache_size)
@@ -0,0 +1,745 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+列式内存sheet模型
+供merge_cells.py和split_cells.py共用：一次性从worksheet读入，
+在内存中完成合并/拆分等变换，最后一次性写回worksheet
+"""
+
+from copy import copy
+
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.styles import Border
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+from openpyxl.worksheet.dimensions import RowDimension
+from openpyxl.worksheet.merge import MergedCellRange
+
+
+# 第1行是表头，数据从第2行开始
+FIRST_DATA_ROW = 2
+
+# 列名识别关键词
+CASE_NAME_KEYWORDS = ['用例名称', '用例名', '名称']
+STEP_DESC_KEYWORDS = ['步骤描述', '步骤', '描述']
+EXPECTED_RESULT_KEYWORDS = ['预期结果', '结果', '预期']
+PRECONDITION_KEYWORDS = ['前置条件', '前置']
+
+
+class SheetModel(object):
+    """
+    列式存储的sheet数据（不含表头行）
+
+    Attributes:
+        title: sheet名称
+        header: 表头行的值（tuple）
+        columns: 每列一个list，columns[col - 1][idx]为第idx个数据行的值
+        source_rows: 每个数据行来源的worksheet行号；拆分产生的复制行与原行相同
+    """
+
+    __slots__ = ('title', 'header', 'columns', 'source_rows')
+
+    def __init__(self, title, header, columns, source_rows):
+        self.title = title
+        self.header = header
+        self.columns = columns
+        self.source_rows = source_rows
+
+    @property
+    def n_rows(self):
+        """数据行数"""
+        return len(self.source_rows)
+
+    @property
+    def n_cols(self):
+        """列数"""
+        return len(self.columns)
+
+    def column(self, col):
+        """
+        获取某一列的值列表
+
+        Args:
+            col: 列号（1-based）
+
+        Returns:
+            该列所有数据行的值列表（可直接修改）
+        """
+        return self.columns[col - 1]
+
+    def row_values(self, idx):
+        """
+        获取某个数据行的所有值
+
+        Args:
+            idx: 数据行下标（0-based，对应worksheet第idx + 2行）
+
+        Returns:
+            该行所有列的值（tuple）
+        """
+        return tuple(column[idx] for column in self.columns)
+
+    def take_rows(self, indexes):
+        """
+        按下标列表重排数据行（可重复，可丢弃）
+
+        Args:
+            indexes: 数据行下标列表
+        """
+        self.columns = [[column[idx] for idx in indexes] for column in self.columns]
+        self.source_rows = [self.source_rows[idx] for idx in indexes]
+
+
+def load_sheet(ws):
+    """
+    从worksheet一次性读入所有单元格值
+
+    Args:
+        ws: worksheet对象
+
+    Returns:
+        SheetModel对象
+    """
+    n_cols = ws.max_column
+    rows = ws.iter_rows(min_row=1, max_col=n_cols, values_only=True)
+    header = next(rows, ())
+
+    columns = [[] for _ in range(n_cols)]
+    appenders = [column.append for column in columns]
+    for row_values in rows:
+        for append, value in zip(appenders, row_values):
+            append(value)
+
+    n_rows = len(columns[0]) if columns else 0
+    source_rows = list(range(FIRST_DATA_ROW, FIRST_DATA_ROW + n_rows))
+    return SheetModel(ws.title, tuple(header), columns, source_rows)
+
+
+def flush_sheet(model, ws):
+    """
+    把模型一次性写回worksheet（表头行保持不变）
+
+    每个来源行第一次出现时，原单元格对象（含样式、超链接、批注）整体搬到新行号，
+    复制行按值新建单元格；行属性（行高、隐藏等）跟随来源行，
+    合并区域按来源行展开后的首行和末行重新登记，被删除的行不再计入。
+
+    Args:
+        model: SheetModel对象
+        ws: worksheet对象（即model的来源）
+    """
+    # 先解除合并，重建后按新行号重新合并
+    merged_ranges = [CellRange(rng.coord) for rng in ws.merged_cells.ranges]
+    unmerge_cell_ranges(ws, merged_ranges)
+
+    # 按行分组现有单元格
+    cells_by_row = {}
+    for (row, col), cell in ws._cells.items():
+        cells_by_row.setdefault(row, {})[col] = cell
+
+    new_cells = {}
+    for col, cell in cells_by_row.get(1, {}).items():
+        new_cells[(1, col)] = cell
+
+    # 记录每个来源行的首行和末行，用于重映射行属性和合并区域
+    first_row_of = {1: 1}
+    last_row_of = {1: 1}
+    columns = model.columns
+    for idx, source_row in enumerate(model.source_rows):
+        new_row = idx + FIRST_DATA_ROW
+        if source_row in first_row_of:
+            row_cells = {}
+        else:
+            row_cells = cells_by_row.get(source_row, {})
+            first_row_of[source_row] = new_row
+        last_row_of[source_row] = new_row
+
+        for col, column in enumerate(columns, start=1):
+            value = column[idx]
+            cell = row_cells.get(col)
+            if cell is None:
+                if value is None:
+                    continue
+                cell = Cell(ws, row=new_row, column=col, value=value)
+            else:
+                cell.row = new_row
+                if cell.value is not value:
+                    cell.value = value
+            new_cells[(new_row, col)] = cell
+
+        # 超出模型列范围的单元格（理论上不存在）原样搬移
+        for col, cell in row_cells.items():
+            if col > len(columns):
+                cell.row = new_row
+                new_cells[(new_row, col)] = cell
+    ws._cells = new_cells
+
+    # 重映射行属性
+    old_dimensions = dict(ws.row_dimensions)
+    ws.row_dimensions.clear()
+    for row, dimension in old_dimensions.items():
+        new_row = first_row_of.get(row)
+        if new_row is None:
+            continue
+        dimension.index = new_row
+        ws.row_dimensions[new_row] = dimension
+
+    # 按新行号重新合并
+    remapped = []
+    for rng in merged_ranges:
+        surviving = [row for row in range(rng.min_row, rng.max_row + 1) if row in first_row_of]
+        if not surviving:
+            continue
+        min_row = first_row_of[surviving[0]]
+        max_row = last_row_of[surviving[-1]]
+        if min_row == max_row and rng.min_col == rng.max_col:
+            continue
+        remapped.append(CellRange(min_col=rng.min_col, min_row=min_row, max_col=rng.max_col, max_row=max_row).coord)
+    merge_cell_ranges(ws, remapped)
+
+
+def unmerge_cell_ranges(ws, ranges):
+    """
+    批量解除合并，效果与逐个调用ws.unmerge_cells()相同
+
+    openpyxl的merge_cells()/unmerge_cells()每次都要线性扫描已有的全部合并区域，
+    逐个调用时总耗时与区域数的平方成正比；这里只重建一次合并区域集合。
+
+    Args:
+        ws: worksheet对象
+        ranges: 要解除的合并区域列表（CellRange，必须是ws中已有的合并区域）
+    """
+    removed = {rng.coord for rng in ranges}
+    ws.merged_cells = MultiCellRange([rng for rng in ws.merged_cells.ranges if rng.coord not in removed])
+    for rng in ranges:
+        # 删除左上角以外的合并单元格占位
+        cells = rng.cells
+        next(cells)
+        for coord in cells:
+            ws._cells.pop(coord, None)
+
+
+def merge_cell_ranges(ws, coords):
+    """
+    批量合并单元格，效果与逐个调用ws.merge_cells()相同，但最后一次性登记全部合并区域
+
+    与merge_cells()一样：左上角单元格取得右下角单元格的右、下边框，其余单元格变为合并单元格，
+    边缘的合并单元格取得左上角单元格对应的边框，所有单元格取得左上角单元格的保护设置。
+    逐个设置边框/保护时每次都要在样式表中查找，代价很高；这里相同的(原样式, 改动)组合只登记一次，
+    之后直接复用登记得到的样式。
+
+    Args:
+        ws: worksheet对象
+        coords: 合并区域坐标列表（如'A2:A17'），彼此不重叠
+    """
+    cells = ws._cells
+    existing = list(ws.merged_cells.ranges)
+    added = []
+    restyled = {}
+
+    def style_of(cell):
+        # 没有设置过样式的单元格_style为None
+        return tuple(cell._style) if cell._style else None
+
+    def restyle(cell, change, apply):
+        key = (style_of(cell), change)
+        style = restyled.get(key)
+        if style is None:
+            apply(cell)
+            restyled[key] = copy(cell._style)
+        else:
+            cell._style = copy(style)
+
+    for coord in coords:
+        mcr = _PreparedMergedCellRange(ws, coord)
+        start_cell = cells.get((mcr.min_row, mcr.min_col))
+        if start_cell is None:
+            start_cell = ws.cell(row=mcr.min_row, column=mcr.min_col)
+        mcr.start_cell = start_cell
+
+        # 左上角单元格取得右下角单元格的右、下边框
+        end_cell = cells.get((mcr.max_row, mcr.max_col))
+        if end_cell is not None:
+            restyle(start_cell, ('end', style_of(end_cell)),
+                    lambda cell: setattr(cell, 'border', cell.border + Border(right=end_cell.border.right,
+                                                                             bottom=end_cell.border.bottom)))
+
+        # 左上角以外的单元格变为合并单元格
+        range_cells = mcr.cells
+        next(range_cells)
+        for row, col in range_cells:
+            cells[(row, col)] = MergedCell(ws, row, col)
+
+        # 边缘的合并单元格取得左上角单元格对应的边框
+        for name in ('top', 'left', 'right', 'bottom'):
+            side = getattr(start_cell.border, name)
+            if side and side.style is None:
+                continue
+            border = Border(**{name: side})
+            for edge in getattr(mcr, name):
+                restyle(cells[edge], (name, style_of(start_cell)),
+                        lambda cell: setattr(cell, 'border', cell.border + border))
+
+        protection = start_cell.protection
+        for cell_coord in mcr.cells:
+            restyle(cells[cell_coord], ('protection', style_of(start_cell)),
+                    lambda cell: setattr(cell, 'protection', copy(protection)))
+
+        # 与merge_cells()一致：已被某个合并区域包含的不再登记
+        if not any(mcr <= rng for rng in existing):
+            added.append(mcr)
+    ws.merged_cells = MultiCellRange(existing + added)
+
+
+class _PreparedMergedCellRange(MergedCellRange):
+    """边框由merge_cell_ranges()处理的合并区域：构造时不再处理边框"""
+
+    def _get_borders(self):
+        self.start_cell = self.ws._cells.get((self.min_row, self.min_col))
+
+
+def set_row_heights(ws, height, max_row):
+    """
+    把第1行到max_row行的行高都设为height，效果与逐行设置ws.row_dimensions[row].height相同
+
+    已有的行属性（隐藏、样式等）保留，只改行高；没有行属性的行直接批量创建。
+
+    Args:
+        ws: worksheet对象
+        height: 行高（磅）
+        max_row: 最后一行的行号
+    """
+    dimensions = ws.row_dimensions
+    missing = {}
+    for row in range(1, max_row + 1):
+        dimension = dimensions.get(row)
+        if dimension is None:
+            missing[row] = RowDimension(ws, index=row, ht=height)
+        else:
+            dimension.height = height
+    dimensions.update(missing)
+
+
+def cell_text(value):
+    """
+    单元格值的标准化文本
+
+    Args:
+        value: 单元格值
+
+    Returns:
+        去掉首尾空白后的字符串，如果为空返回None
+    """
+    if value is None:
+        return None
+
+    value_str = str(value).strip()
+    return value_str if value_str else None
+
+
+def is_row_empty(row_values):
+    """
+    判断一行是否为空（所有值为None或只包含空白字符的字符串）
+
+    Args:
+        row_values: 行内所有单元格值的序列
+
+    Returns:
+        整行为空返回True，否则返回False
+    """
+    for cell_value in row_values:
+        if cell_value is None:
+            continue
+        if isinstance(cell_value, str):
+            if cell_value.strip():
+                return False
+        else:
+            return False
+    return True
+
+
+def find_column_by_keyword(header, keywords):
+    """
+    根据关键词在表头中查找列索引
+
+    Args:
+        header: 表头行的值序列（如SheetModel.header）
+        keywords: 关键词列表，如['用例名称', '用例名', '名称']
+
+    Returns:
+        列索引（1-based），如果找不到返回None
+    """
+    for col_idx, header_value in enumerate(header, start=1):
+        if header_value:
+            cell_value = str(header_value).strip()
+            for keyword in keywords:
+                if keyword in cell_value:
+                    return col_idx
+    return None
+
+
+def find_module_columns(header):
+    """
+    查找所有X级模块列
+
+    Args:
+        header: 表头行的值序列（如SheetModel.header）
+
+    Returns:
+        列索引列表
+    """
+    module_cols = []
+    for col_idx, header_value in enumerate(header, start=1):
+        if header_value:
+            # 匹配"X级模块"格式
+            if '级模块' in str(header_value).strip():
+                module_cols.append(col_idx)
+    return module_cols
+
+
+def detect_columns(header):
+    """
+    识别用例表的各个关键列
+
+    Args:
+        header: 表头行的值序列
+
+    Returns:
+        字典：case_name、step_desc、expected_result、precondition（找不到为None），
+        modules（X级模块列列表）
+    """
+    return {
+        'case_name': find_column_by_keyword(header, CASE_NAME_KEYWORDS),
+        'step_desc': find_column_by_keyword(header, STEP_DESC_KEYWORDS),
+        'expected_result': find_column_by_keyword(header, EXPECTED_RESULT_KEYWORDS),
+        'precondition': find_column_by_keyword(header, PRECONDITION_KEYWORDS),
+        'modules': find_module_columns(header),
+    }
+
+
+def missing_columns(columns):
+    """
+    检查必需的列（用例名称、步骤描述、预期结果）是否都已识别
+
+    Args:
+        columns: detect_columns()的返回值
+
+    Returns:
+        缺失列的中文名列表
+    """
+    names = [('case_name', '用例名称'), ('step_desc', '步骤描述'), ('expected_result', '预期结果')]
+    return [label for key, label in names if columns[key] is None]
+
+
+def parse_row_range(text):
+    """
+    解析行范围（Excel行号，含两端）："2:5000"、"100:"、":30"、"7"
+
+    Returns:
+        (起始行, 结束行)；为None表示不限
+
+    Raises:
+        ValueError: 格式错误或起始行大于结束行
+    """
+    try:
+        if ':' not in text:
+            row = int(text)
+            return row, row
+        start, end = text.split(':', 1)
+        start, end = (int(start) if start.strip() else None), (int(end) if end.strip() else None)
+    except ValueError:
+        raise ValueError(f"行范围格式错误: {text}（应为 2:5000、100:、:30 或 7）")
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"行范围错误: {text}（起始行大于结束行）")
+    return start, end
+
+
+def add_hash_prefix(value):
+    """
+    给单元格内容前加上#号（如果还没有）
+    如果单元格为空，也返回#
+
+    Args:
+        value: 单元格值
+
+    Returns:
+        处理后的值
+    """
+    if value is None:
+        return '#'
+
+    value_str = str(value).strip()
+    if not value_str:
+        return '#'
+
+    if not value_str.startswith('#'):
+        return '#' + value_str
+    return value_str
+
+
+def split_by_hash(content):
+    """
+    按#拆分内容，每个#及后续内容（直到下一个#之前或到末尾）拆分成一个片段
+
+    例如: "#步骤1#步骤2#步骤3" -> ["#步骤1", "#步骤2", "#步骤3"]
+
+    Args:
+        content: 要拆分的内容
+
+    Returns:
+        拆分后的列表，每个元素包含#号
+    """
+    if content is None:
+        return []
+
+    content_str = str(content).strip()
+    if not content_str:
+        return []
+
+    # 找到所有#的位置
+    parts = []
+    start_idx = 0
+
+    while True:
+        hash_idx = content_str.find('#', start_idx)
+        if hash_idx == -1:
+            break
+
+        # 找到下一个#的位置，或者到末尾
+        next_hash_idx = content_str.find('#', hash_idx + 1)
+        if next_hash_idx == -1:
+            # 到末尾，包含当前#到字符串末尾
+            parts.append(content_str[hash_idx:])
+            break
+        else:
+            # 到下一个#之前，包含当前#到下一个#之前
+            parts.append(content_str[hash_idx:next_hash_idx])
+            start_idx = next_hash_idx
+
+    return parts
+
+
+def add_hash_prefixes(model, cols):
+    """
+    给指定列的每个单元格内容前加上#号（包括空单元格）
+
+    Args:
+        model: SheetModel对象
+        cols: 列索引列表（1-based）
+
+    Returns:
+        修改的单元格数
+    """
+    modified_count = 0
+    for col in cols:
+        column = model.column(col)
+        for idx, raw_value in enumerate(column):
+            value = cell_text(raw_value)
+            new_value = add_hash_prefix(value)
+            # 如果单元格为空或值发生变化，则更新
+            if value is None or new_value != value:
+                column[idx] = new_value
+                modified_count += 1
+    return modified_count
+
+
+def find_case_rows(model, case_name_col):
+    """
+    找到所有用例名称有值的数据行
+
+    Args:
+        model: SheetModel对象
+        case_name_col: 用例名称列索引（1-based）
+
+    Returns:
+        数据行下标列表（0-based）
+    """
+    return [idx for idx, value in enumerate(model.column(case_name_col)) if cell_text(value)]
+
+
+def merge_case_blocks(model, case_rows, step_desc_col, expected_result_col):
+    """
+    将每个用例块（用例名称有值的行到下一个有值的行之前）的步骤描述和预期结果
+    直接拼接（无分隔符）到块的第一行，并清空块内其余行的这两列
+
+    Args:
+        model: SheetModel对象
+        case_rows: 用例名称有值的数据行下标列表
+        step_desc_col: 步骤描述列索引（1-based）
+        expected_result_col: 预期结果列索引（1-based）
+
+    Returns:
+        合并了多个片段的块列表，每项为(块首行下标, 步骤数, 结果数, 清空行数)
+    """
+    step_column = model.column(step_desc_col)
+    result_column = model.column(expected_result_col)
+    merged_blocks = []
+
+    for i, current in enumerate(case_rows):
+        # 最后一个用例名称行合并到文档的最后一行
+        block_end = case_rows[i + 1] if i + 1 < len(case_rows) else model.n_rows
+
+        step_descriptions = [text for text in map(cell_text, step_column[current:block_end]) if text]
+        expected_results = [text for text in map(cell_text, result_column[current:block_end]) if text]
+
+        if step_descriptions:
+            step_column[current] = ''.join(step_descriptions)
+        if expected_results:
+            result_column[current] = ''.join(expected_results)
+
+        # 清空被合并行的步骤描述和预期结果列
+        for idx in range(current + 1, block_end):
+            step_column[idx] = None
+            result_column[idx] = None
+
+        if len(step_descriptions) > 1 or len(expected_results) > 1:
+            merged_blocks.append((current, len(step_descriptions), len(expected_results),
+                                  block_end - current - 1))
+    return merged_blocks
+
+
+def drop_empty_rows(model):
+    """
+    删除所有空的数据行
+
+    Args:
+        model: SheetModel对象
+
+    Returns:
+        删除的行数
+    """
+    keep = [idx for idx, row_values in enumerate(zip(*model.columns)) if not is_row_empty(row_values)]
+    deleted_count = model.n_rows - len(keep)
+    if deleted_count:
+        model.take_rows(keep)
+    return deleted_count
+
+
+def drop_trailing_empty_rows(model):
+    """
+    删除尾部的空数据行
+
+    Args:
+        model: SheetModel对象
+
+    Returns:
+        删除的行数
+    """
+    last_non_empty = -1
+    for idx in range(model.n_rows - 1, -1, -1):
+        if not is_row_empty(model.row_values(idx)):
+            last_non_empty = idx
+            break
+
+    deleted_count = model.n_rows - last_non_empty - 1
+    if deleted_count:
+        model.take_rows(range(last_non_empty + 1))
+    return deleted_count
+
+
+def split_step_rows(model, step_desc_col, expected_result_col):
+    """
+    按#拆分步骤描述和预期结果，多出的片段展开为紧随原行的新行
+    新行复制原行的所有列数据，再设置对应的步骤描述和预期结果
+
+    Args:
+        model: SheetModel对象
+        step_desc_col: 步骤描述列索引（1-based）
+        expected_result_col: 预期结果列索引（1-based）
+
+    Returns:
+        (拆分的行数, 新增的行数)
+    """
+    step_idx = step_desc_col - 1
+    result_idx = expected_result_col - 1
+    old_columns = model.columns
+    new_columns = [[] for _ in old_columns]
+    appenders = [column.append for column in new_columns]
+    new_source_rows = []
+    split_row_count = 0
+    total_new_rows = 0
+
+    for idx, row_values in enumerate(zip(*old_columns)):
+        source_row = model.source_rows[idx]
+        step_parts = split_by_hash(cell_text(row_values[step_idx]))
+        result_parts = split_by_hash(cell_text(row_values[result_idx]))
+        max_parts = max(len(step_parts), len(result_parts))
+
+        if max_parts > 1:
+            row_data = list(row_values)
+            for i in range(max_parts):
+                if i > 0:
+                    row_data[step_idx] = None
+                    row_data[result_idx] = None
+                if i < len(step_parts):
+                    row_data[step_idx] = step_parts[i]
+                if i < len(result_parts):
+                    row_data[result_idx] = result_parts[i]
+                for append, value in zip(appenders, row_data):
+                    append(value)
+                new_source_rows.append(source_row)
+            split_row_count += 1
+            total_new_rows += max_parts - 1
+        else:
+            for append, value in zip(appenders, row_values):
+                append(value)
+            new_source_rows.append(source_row)
+
+    model.columns = new_columns
+    model.source_rows = new_source_rows
+    return split_row_count, total_new_rows
+
+
+def strip_hash_prefixes(model, cols):
+    """
+    去掉指定列每个单元格开头的#号
+
+    Args:
+        model: SheetModel对象
+        cols: 列索引列表（1-based）
+
+    Returns:
+        修改的单元格数
+    """
+    cleared_count = 0
+    for col in cols:
+        column = model.column(col)
+        for idx, value in enumerate(column):
+            if value is None:
+                continue
+            value_str = str(value)
+            if value_str.startswith('#'):
+                column[idx] = value_str[1:]
+                cleared_count += 1
+    return cleared_count
+
+
+def find_merge_runs(model, col):
+    """
+    查找某列中连续相同且非空的值区间
+
+    Args:
+        model: SheetModel对象
+        col: 列索引（1-based）
+
+    Returns:
+        区间列表，每项为(起始行号, 结束行号)（worksheet行号，包含两端）
+    """
+    runs = []
+    run_start = None
+    last_str = ''
+    for idx, value in enumerate(model.column(col)):
+        current_str = str(value).strip() if value is not None else ''
+        if current_str == last_str and current_str:
+            # 值相同，继续合并范围
+            if run_start is None:
+                run_start = idx - 1
+        else:
+            # 值不同，结束之前的范围
+            if run_start is not None:
+                runs.append((run_start + FIRST_DATA_ROW, idx - 1 + FIRST_DATA_ROW))
+                run_start = None
+            last_str = current_str
+
+    # 处理最后一段
+    if run_start is not None:
+        runs.append((run_start + FIRST_DATA_ROW, model.n_rows - 1 + FIRST_DATA_ROW))
+    return runs
@@ -5,361 +5,179 @@
 用于split-cells skill
 """
 
-import sys
+import argparse
 import os
-from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 
+from case_export import export_result, format_of
+from checkpoint import (DEFAULT_CHUNK_CASES, add_checkpoint_arguments, check_checkpoint_arguments,
+                        checkpoint_dir_from_args, chunked_process)
+from instrumentation import Recorder, add_report_arguments, recorder_from_args
+from pipeline import Pipeline, merge_columns_of
+from result_cache import add_cache_arguments, cache_from_args
+from stream_engine import stream_split_cells
 
-def find_column_by_keyword(ws, keywords, start_row=1):
-    """
-    根据关键词查找列索引
-    
-    Args:
-        ws: worksheet对象
-        keywords: 关键词列表，如['用例名称', '用例名', '名称']
-        start_row: 开始查找的行（默认第1行，即表头）
-    
-    Returns:
-        列索引（1-based），如果找不到返回None
-    """
-    if start_row > ws.max_row:
-        return None
-    
-    # 读取表头行
-    header_row = start_row
-    for col_idx in range(1, ws.max_column + 1):
-        cell = ws.cell(row=header_row, column=col_idx)
-        if cell.value:
-            cell_value = str(cell.value).strip()
-            for keyword in keywords:
-                if keyword in cell_value:
-                    return col_idx
-    return None
-
-
-def get_cell_value(ws, row, col):
-    """
-    安全获取单元格值
-    
-    Args:
-        ws: worksheet对象
-        row: 行号（1-based）
-        col: 列号（1-based）
-    
-    Returns:
-        单元格值，如果单元格不存在或为空返回None
-    """
-    if row > ws.max_row or col > ws.max_column:
-        return None
-    
-    cell = ws.cell(row=row, column=col)
-    value = cell.value
-    if value is None:
-        return None
-    
-    value_str = str(value).strip()
-    return value_str if value_str else None
 
-
-def split_by_hash(content):
+def split_cells(input_file, output_file=None, engine='full', all_sheets=False, workers=None, recorder=None,
+                cache=None, incremental=False, export=None, checkpoint=None, chunk_size=DEFAULT_CHUNK_CASES,
+                rows=None, modules=None):
     """
-    按#拆分内容，每个#及后续内容（直到下一个#之前或到末尾）拆分成一个片段
-    
-    例如: "#步骤1#步骤2#步骤3" -> ["#步骤1", "#步骤2", "#步骤3"]
-    
-    Args:
-        content: 要拆分的内容
-    
-    Returns:
-        拆分后的列表，每个元素包含#号
-    """
-    if content is None:
-        return []
-    
-    content_str = str(content).strip()
-    if not content_str:
-        return []
-    
-    # 找到所有#的位置
-    parts = []
-    start_idx = 0
-    
-    while True:
-        hash_idx = content_str.find('#', start_idx)
-        if hash_idx == -1:
-            break
-        
-        # 找到下一个#的位置，或者到末尾
-        next_hash_idx = content_str.find('#', hash_idx + 1)
-        if next_hash_idx == -1:
-            # 到末尾，包含当前#到字符串末尾
-            parts.append(content_str[hash_idx:])
-            break
-        else:
-            # 到下一个#之前，包含当前#到下一个#之前
-            parts.append(content_str[hash_idx:next_hash_idx])
-            start_idx = next_hash_idx
-    
-    return parts
-
-
-def find_module_columns(ws, start_row=1):
-    """
-    查找所有X级模块列
+    拆分Excel测试用例单元格
     
     Args:
-        ws: worksheet对象
-        start_row: 表头行
+        input_file: 输入Excel文件路径
+        output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        engine: 处理引擎，'full'为完整加载（保留样式），'stream'为流式处理（内存占用低，不保留样式）
+        all_sheets: 为True时处理所有包含用例表头的sheet（并发），否则只处理第一个sheet
+        workers: all_sheets模式下的并发进程数（默认CPU核数）
+        recorder: Recorder对象（可选），记录各阶段耗时、计数和峰值内存
+        cache: ResultCache对象（可选），输入没有变化时直接使用缓存的结果
+        incremental: 为True时把output_file当作上一次的拆分结果，只重新生成变化的用例块（只支持full引擎）
+        export: 同时把结果中的用例导出到的路径（.jsonl 或 .parquet，见case_export），默认不导出
+        checkpoint: 检查点目录（可选），给出时分段处理并保存检查点，中断后重新运行从中断处继续（见checkpoint）
+        chunk_size: 分段处理时每段的用例数
+        rows: 行范围（如 "2:5000"），只处理用例名称所在行在范围内的用例，输出中只有选中的用例
+        modules: 模块条件列表（"值" 或 "列名=值"），只处理满足任一条件的用例
     
     Returns:
-        列索引列表
+        报告字典（见instrumentation.Recorder）
     """
-    module_cols = []
-    if start_row > ws.max_row:
-        return module_cols
-    
-    for col_idx in range(1, ws.max_column + 1):
-        cell = ws.cell(row=start_row, column=col_idx)
-        if cell.value:
-            cell_value = str(cell.value).strip()
-            # 匹配"X级模块"格式
-            if '级模块' in cell_value:
-                module_cols.append(col_idx)
-    
-    return module_cols
+    recorder = recorder or Recorder('split_cells')
+    recorder.set(input_file=input_file, output_file=output_file or input_file, engine=engine)
+    options = {'engine': engine, 'all_sheets': all_sheets}
+    if rows or modules:
+        options.update(rows=rows, modules=list(modules or ()))
+    if cache is not None:
+        hit, cache_key = cache.lookup('split', input_file, output_file or input_file, options, recorder)
+        if hit:
+            export_result(output_file or input_file, export, recorder)
+            return recorder.finish()
+    
+    if all_sheets:
+        from multi_sheet import process_all_sheets
+        process_all_sheets('split', input_file, output_file, workers, recorder)
+    elif checkpoint or rows or modules:
+        chunked_process('split', input_file, output_file, recorder, checkpoint, chunk_size, rows, modules)
+    elif engine == 'stream':
+        stream_split_cells(input_file, output_file, recorder)
+    else:
+        from incremental_split import incremental_split_sheet
+        if not (incremental and incremental_split_sheet(input_file, output_file, recorder)):
+            split_sheet(input_file, output_file, recorder)
+    
+    if cache is not None:
+        cache.store(cache_key, 'split', output_file or input_file, options)
+    export_result(output_file or input_file, export, recorder)
+    return recorder.finish()
 
 
-def split_cells(input_file, output_file=None):
+def split_sheet(input_file, output_file, recorder):
     """
-    拆分Excel测试用例单元格
+    用完整加载引擎拆分第一个sheet
     
     Args:
         input_file: 输入Excel文件路径
         output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        recorder: Recorder对象
     """
     if output_file is None:
         output_file = input_file
     
-    # 加载工作簿
-    wb = load_workbook(input_file, data_only=True, keep_vba=False)
-    
-    # 获取第一个sheet
-    ws = wb.active
-    
-    print(f"处理Sheet: {ws.title}")
-    print(f"总行数: {ws.max_row}, 总列数: {ws.max_column}")
-    
-    # 查找列索引
-    step_desc_col = find_column_by_keyword(ws, ['步骤描述', '步骤', '描述'], 1)
-    expected_result_col = find_column_by_keyword(ws, ['预期结果', '结果', '预期'], 1)
-    case_name_col = find_column_by_keyword(ws, ['用例名称', '用例名', '名称'], 1)
-    precondition_col = find_column_by_keyword(ws, ['前置条件', '前置'], 1)
-    
-    if step_desc_col is None:
-        print("错误: 找不到'步骤描述'列")
-        sys.exit(1)
-    if expected_result_col is None:
-        print("错误: 找不到'预期结果'列")
-        sys.exit(1)
-    if case_name_col is None:
-        print("错误: 找不到'用例名称'列")
-        sys.exit(1)
-    
-    # 查找所有X级模块列
-    module_cols = find_module_columns(ws, 1)
-    print(f"找到 {len(module_cols)} 个模块列: {[get_column_letter(col) for col in module_cols]}")
-    
-    print(f"步骤描述列: {get_column_letter(step_desc_col)} (列{step_desc_col})")
-    print(f"预期结果列: {get_column_letter(expected_result_col)} (列{expected_result_col})")
-    print(f"用例名称列: {get_column_letter(case_name_col)} (列{case_name_col})")
-    if precondition_col:
-        print(f"前置条件列: {get_column_letter(precondition_col)} (列{precondition_col})")
+    # 加载工作簿，读入内存模型（默认处理第一个sheet）
+    try:
+        pipeline = Pipeline.load(input_file, recorder=recorder)
+    except ValueError as e:
+        recorder.fail(f"错误: {e}")
+    ws = pipeline.ws
+    columns = pipeline.columns
+    
+    recorder.set(sheet=ws.title)
+    recorder.log(f"处理Sheet: {ws.title}")
+    recorder.log(f"总行数: {ws.max_row}, 总列数: {ws.max_column}")
+    recorder.log(f"找到 {len(columns['modules'])} 个模块列: {[get_column_letter(col) for col in columns['modules']]}")
+    
+    recorder.log(f"步骤描述列: {get_column_letter(columns['step_desc'])} (列{columns['step_desc']})")
+    recorder.log(f"预期结果列: {get_column_letter(columns['expected_result'])} (列{columns['expected_result']})")
+    recorder.log(f"用例名称列: {get_column_letter(columns['case_name'])} (列{columns['case_name']})")
+    if columns['precondition']:
+        recorder.log(f"前置条件列: {get_column_letter(columns['precondition'])} (列{columns['precondition']})")
+    rows_before = ws.max_row
+    
+    # 在模型上一次算出展开后的行布局（新行复制原行数据），并去掉#号和尾部空行，最后一次性写回sheet
+    stats = pipeline.split()
     
     # 第一步：拆分步骤描述和预期结果列
-    print("\n步骤1: 拆分步骤描述和预期结果列...")
-    
-    # 先收集所有需要拆分的行数据
-    rows_to_split = []  # 存储(row_index, step_parts, result_parts, row_data)
-    
-    for row in range(2, ws.max_row + 1):  # 从第2行开始（第1行是表头）
-        step_value = get_cell_value(ws, row, step_desc_col)
-        result_value = get_cell_value(ws, row, expected_result_col)
-        
-        # 拆分步骤描述
-        step_parts = split_by_hash(step_value) if step_value else []
-        # 拆分预期结果
-        result_parts = split_by_hash(result_value) if result_value else []
-        
-        # 确定需要拆分的数量（取两者的最大值）
-        max_parts = max(len(step_parts), len(result_parts))
-        
-        if max_parts > 1:
-            # 读取当前行的所有列数据
-            row_data = {}
-            for col in range(1, ws.max_column + 1):
-                cell_value = ws.cell(row=row, column=col).value
-                row_data[col] = cell_value
-            
-            rows_to_split.append((row, step_parts, result_parts, row_data, max_parts))
-    
-    # 从后往前插入新行，避免索引变化
-    total_new_rows = 0
-    for row, step_parts, result_parts, row_data, max_parts in reversed(rows_to_split):
-        # 更新第一行（原行）
-        if len(step_parts) > 0:
-            ws.cell(row=row, column=step_desc_col).value = step_parts[0]
-        if len(result_parts) > 0:
-            ws.cell(row=row, column=expected_result_col).value = result_parts[0]
-        
-        # 插入新行
-        for i in range(1, max_parts):
-            ws.insert_rows(row + 1)
-            # 复制所有列的数据
-            for col, value in row_data.items():
-                ws.cell(row=row + 1, column=col).value = value
-            # 设置步骤描述
-            if i < len(step_parts):
-                ws.cell(row=row + 1, column=step_desc_col).value = step_parts[i]
-            else:
-                ws.cell(row=row + 1, column=step_desc_col).value = None
-            # 设置预期结果
-            if i < len(result_parts):
-                ws.cell(row=row + 1, column=expected_result_col).value = result_parts[i]
-            else:
-                ws.cell(row=row + 1, column=expected_result_col).value = None
-            total_new_rows += 1
-    
-    print(f"拆分了 {len(rows_to_split)} 行，共插入 {total_new_rows} 行新数据")
+    recorder.log("\n步骤1: 拆分步骤描述和预期结果列...")
+    recorder.log(f"拆分了 {stats['split']} 行，共插入 {stats['inserted']} 行新数据")
     
     # 第二步：清空步骤描述和预期结果两列中全部单元格里的#
-    print("\n步骤2: 清空步骤描述和预期结果列中的#号...")
-    cleared_count = 0
-    for row in range(2, ws.max_row + 1):
-        # 处理步骤描述列
-        step_value = ws.cell(row=row, column=step_desc_col).value
-        if step_value is not None:
-            step_str = str(step_value)
-            if step_str.startswith('#'):
-                new_step_value = step_str[1:] if len(step_str) > 1 else ''
-                ws.cell(row=row, column=step_desc_col).value = new_step_value
-                cleared_count += 1
-        
-        # 处理预期结果列
-        result_value = ws.cell(row=row, column=expected_result_col).value
-        if result_value is not None:
-            result_str = str(result_value)
-            if result_str.startswith('#'):
-                new_result_value = result_str[1:] if len(result_str) > 1 else ''
-                ws.cell(row=row, column=expected_result_col).value = new_result_value
-                cleared_count += 1
-    
-    print(f"清空了 {cleared_count} 个单元格中的#号")
+    recorder.log("\n步骤2: 清空步骤描述和预期结果列中的#号...")
+    recorder.log(f"清空了 {stats['cleared']} 个单元格中的#号")
     
     # 第三步：合并X级模块、用例名称、前置条件列中相同内容的单元格
-    print("\n步骤3: 合并相同内容的单元格...")
-    
-    # 需要合并的列
-    merge_cols = module_cols + [case_name_col]
-    if precondition_col:
-        merge_cols.append(precondition_col)
-    
-    print(f"需要合并的列: {[get_column_letter(col) for col in merge_cols]}")
-    
-    # 按列处理合并
-    for col in merge_cols:
-        merged_count = 0
-        start_row = None
-        last_value = None
-        
-        for row in range(2, ws.max_row + 1):
-            current_value = ws.cell(row=row, column=col).value
-            
-            # 标准化值（转换为字符串进行比较）
-            current_str = str(current_value).strip() if current_value is not None else ''
-            last_str = str(last_value).strip() if last_value is not None else ''
-            
-            if current_str == last_str and current_str:
-                # 值相同，继续合并范围
-                if start_row is None:
-                    start_row = row - 1
-            else:
-                # 值不同，合并之前的范围
-                if start_row is not None and row - 1 > start_row:
-                    ws.merge_cells(f'{get_column_letter(col)}{start_row}:{get_column_letter(col)}{row - 1}')
-                    merged_count += 1
-                    start_row = None
-                last_value = current_value
-        
-        # 处理最后一段
-        if start_row is not None and ws.max_row > start_row:
-            ws.merge_cells(f'{get_column_letter(col)}{start_row}:{get_column_letter(col)}{ws.max_row}')
-            merged_count += 1
-        
-        print(f"  列{get_column_letter(col)}: 合并了 {merged_count} 组单元格")
-    
-    # 第四步：设置所有行的高度为50磅
-    print("\n步骤4: 设置所有行的高度为50磅...")
-    for row in range(1, ws.max_row + 1):
-        ws.row_dimensions[row].height = 50
-    print(f"已设置 {ws.max_row} 行的行高为50磅")
-    
-    # 第五步：删除尾部的空行
-    print("\n步骤5: 删除尾部的空行...")
-    initial_max_row = ws.max_row
-    deleted_count = 0
-    
-    # 从后往前遍历，找到第一个非空行
-    last_non_empty_row = None
-    for row in range(ws.max_row, 0, -1):
-        # 检查整行是否为空
-        is_empty = True
-        for col in range(1, ws.max_column + 1):
-            cell_value = ws.cell(row=row, column=col).value
-            if cell_value is not None:
-                # 检查是否为空字符串或只包含空白字符
-                if isinstance(cell_value, str):
-                    if cell_value.strip():
-                        is_empty = False
-                        break
-                else:
-                    is_empty = False
-                    break
-        
-        if not is_empty:
-            last_non_empty_row = row
-            break
-    
-    # 删除last_non_empty_row之后的所有空行
-    if last_non_empty_row is not None and last_non_empty_row < ws.max_row:
-        rows_to_delete = list(range(last_non_empty_row + 1, ws.max_row + 1))
-        # 从后往前删除，避免索引变化
-        for row in reversed(rows_to_delete):
-            ws.delete_rows(row)
-            deleted_count += 1
-        print(f"删除了 {deleted_count} 个尾部空行（从行{last_non_empty_row + 1}到行{initial_max_row}）")
+    # 第四步：设置所有行的高度为50磅（写回sheet时一并完成）
+    recorder.log("\n步骤3: 合并相同内容的单元格...")
+    recorder.log(f"需要合并的列: {[get_column_letter(col) for col in merge_columns_of(columns)]}")
+    merged_counts = pipeline.flush()
+    for col, merged_count in merged_counts:
+        recorder.log(f"  列{get_column_letter(col)}: 合并了 {merged_count} 组单元格")
+    
+    recorder.log("\n步骤4: 设置所有行的高度为50磅...")
+    recorder.log(f"已设置 {ws.max_row} 行的行高为50磅")
+    
+    # 第五步：删除尾部的空行（已在模型上完成）
+    recorder.log("\n步骤5: 删除尾部的空行...")
+    deleted_count = stats['deleted']
+    if deleted_count:
+        initial_max_row = stats['rows_before_trim']
+        recorder.log(f"删除了 {deleted_count} 个尾部空行（从行{initial_max_row - deleted_count + 1}到行{initial_max_row}）")
     else:
-        print("未发现尾部空行")
+        recorder.log("未发现尾部空行")
+    recorder.count(rows_before=rows_before, rows_after=ws.max_row, columns=ws.max_column,
+                   split=stats['split'], inserted=stats['inserted'], cleared=stats['cleared'],
+                   merged_ranges=sum(count for _, count in merged_counts), deleted=deleted_count)
     
     # 保存文件
     try:
-        wb.save(output_file)
-        print(f"\n✅ 处理完成！文件已保存到: {output_file}")
+        pipeline.save(output_file, flush=False)
+        recorder.log(f"\n✅ 处理完成！文件已保存到: {output_file}")
     except Exception as e:
-        print(f"\n❌ 保存文件时出错: {e}")
-        sys.exit(1)
-    finally:
-        wb.close()
+        recorder.fail(f"\n❌ 保存文件时出错: {e}")
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python split_cells.py <input_file> [<output_file>]")
-        print("  input_file: 输入Excel文件路径")
-        print("  output_file: 输出Excel文件路径（可选，默认覆盖原文件）")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    
-    split_cells(input_file, output_file)
+    parser = argparse.ArgumentParser(description='拆分Excel测试用例单元格')
+    parser.add_argument('input_file', help='输入Excel文件路径')
+    parser.add_argument('output_file', nargs='?', default=None, help='输出Excel文件路径（可选，默认覆盖原文件）')
+    parser.add_argument('--engine', choices=['full', 'stream'], default='full',
+                        help='处理引擎：full完整加载（默认），stream流式处理超大文件')
+    parser.add_argument('--all-sheets', action='store_true',
+                        help='处理所有包含用例名称/步骤描述/预期结果列的sheet（并发处理），默认只处理第一个sheet')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='--all-sheets模式下的并发进程数（默认CPU核数）')
+    add_report_arguments(parser)
+    add_cache_arguments(parser)
+    parser.add_argument('--export', default=None,
+                        help='同时把结果中的用例导出为JSONL/Parquet（按扩展名 .jsonl/.parquet，步骤为列表），'
+                             '供下游系统直接读取；用case_export.py import可重新生成xlsx')
+    add_checkpoint_arguments(parser)
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量拆分：以输出文件中上一次的拆分结果为基础，只重新生成有变化的用例块')
+    args = parser.parse_args()
+    if args.all_sheets and args.engine != 'full':
+        parser.error('--all-sheets 只支持 full 引擎')
+    if args.export:
+        try:
+            format_of(args.export)
+        except ValueError as e:
+            parser.error(str(e))
+    check_checkpoint_arguments(parser, args)
+    if args.incremental and (args.engine != 'full' or args.all_sheets or args.cache):
+        parser.error('--incremental 只支持 full 引擎，且不能与 --all-sheets、--cache 同时使用')
+    if args.incremental and args.output_file is None:
+        parser.error('--incremental 需要指定输出文件（上一次的拆分结果）')
+    
+    split_cells(args.input_file, args.output_file, engine=args.engine,
+                all_sheets=args.all_sheets, workers=args.workers,
+                recorder=recorder_from_args('split_cells', args), cache=cache_from_args(args),
+                incremental=args.incremental, export=args.export, checkpoint=checkpoint_dir_from_args(args),
+                chunk_size=args.chunk_size, rows=args.rows, modules=args.module)
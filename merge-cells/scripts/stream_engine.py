@@ -0,0 +1,465 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流式合并/拆分引擎
+以read_only模式逐行读取、write_only模式逐行写出，按用例块（用例名称列有值的行
+到下一个有值的行之前）分段处理，峰值内存只取决于最大的用例块而不是整个sheet。
+每个用例块仍复用sheet_model中的变换函数，结果与默认引擎一致（样式不保留）。
+"""
+
+import os
+import tempfile
+import zipfile
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+
+from instrumentation import Recorder
+from pipeline import merge_columns_of
+from result_cache import replace_output
+from sheet_model import (
+    SheetModel,
+    cell_text,
+    is_row_empty,
+    detect_columns,
+    missing_columns,
+    add_hash_prefixes,
+    merge_case_blocks,
+    drop_empty_rows,
+    split_step_rows,
+    strip_hash_prefixes,
+)
+
+
+def iter_sheet_rows(ws):
+    """
+    逐行读取read_only worksheet，返回表头和数据行生成器
+
+    Args:
+        ws: read_only模式的worksheet对象
+
+    Returns:
+        (表头tuple, 数据行生成器)；每个数据行补齐到相同列数
+    """
+    rows = ws.iter_rows(values_only=True)
+    header = tuple(next(rows, ()))
+    n_cols = max(ws.max_column or 0, len(header))
+    header = header + (None,) * (n_cols - len(header))
+
+    def data_rows():
+        for row_values in rows:
+            if len(row_values) < n_cols:
+                row_values = tuple(row_values) + (None,) * (n_cols - len(row_values))
+            elif len(row_values) > n_cols:
+                row_values = tuple(row_values[:n_cols])
+            yield row_values
+
+    return header, data_rows()
+
+
+def iter_case_blocks(rows, case_name_col):
+    """
+    按用例名称列把数据行切分为用例块
+
+    第一个用例名称有值的行之前的行（如果有）单独作为一个块返回。
+
+    Args:
+        rows: 数据行可迭代对象
+        case_name_col: 用例名称列索引（1-based）
+
+    Yields:
+        行列表，每个列表是一个用例块
+    """
+    case_idx = case_name_col - 1
+    block = []
+    for row_values in rows:
+        if block and cell_text(row_values[case_idx]):
+            yield block
+            block = []
+        block.append(row_values)
+    if block:
+        yield block
+
+
+def block_model(header, block):
+    """
+    把一个用例块转换为SheetModel，以便复用sheet_model中的变换函数
+
+    Args:
+        header: 表头tuple
+        block: 行列表
+
+    Returns:
+        SheetModel对象
+    """
+    columns = [list(column) for column in zip(*block)]
+    return SheetModel('', header, columns, list(range(len(block))))
+
+
+def model_rows(model):
+    """
+    按行输出SheetModel的数据
+
+    Args:
+        model: SheetModel对象
+
+    Returns:
+        行tuple的迭代器
+    """
+    return zip(*model.columns)
+
+
+def merge_stage(blocks, case_name_col, step_desc_col, expected_result_col, stats):
+    """
+    合并阶段：给每个用例块加#号前缀、合并步骤描述和预期结果、去掉空行
+
+    Args:
+        blocks: 用例块迭代器
+        case_name_col: 用例名称列索引（1-based）
+        step_desc_col: 步骤描述列索引（1-based）
+        expected_result_col: 预期结果列索引（1-based）
+        stats: 统计字典，累加处理结果
+
+    Yields:
+        输出行
+    """
+    for block in blocks:
+        model = block_model(None, block)
+        stats['rows_in'] += model.n_rows
+        stats['prefixed'] += add_hash_prefixes(model, [step_desc_col, expected_result_col])
+
+        case_rows = [0] if cell_text(block[0][case_name_col - 1]) else []
+        stats['cases'] += len(case_rows)
+        stats['merged'] += len(merge_case_blocks(model, case_rows, step_desc_col, expected_result_col))
+        stats['deleted'] += drop_empty_rows(model)
+
+        for row_values in model_rows(model):
+            stats['rows_out'] += 1
+            yield row_values
+
+
+def split_stage(blocks, step_desc_col, expected_result_col, stats):
+    """
+    拆分阶段：按#拆分每个用例块的步骤描述和预期结果，并去掉开头的#号
+
+    Args:
+        blocks: 用例块迭代器
+        step_desc_col: 步骤描述列索引（1-based）
+        expected_result_col: 预期结果列索引（1-based）
+        stats: 统计字典，累加处理结果
+
+    Yields:
+        输出行
+    """
+    for block in blocks:
+        model = block_model(None, block)
+        stats['rows_in'] += model.n_rows
+        split_row_count, new_rows = split_step_rows(model, step_desc_col, expected_result_col)
+        stats['split'] += split_row_count
+        stats['inserted'] += new_rows
+        stats['cleared'] += strip_hash_prefixes(model, [step_desc_col, expected_result_col])
+
+        for row_values in model_rows(model):
+            yield row_values
+
+
+def drop_trailing_empty(rows, stats):
+    """
+    去掉尾部的空行：空行先缓存，遇到非空行时再一起输出
+
+    Args:
+        rows: 行迭代器
+        stats: 统计字典，记录删除的尾部空行数
+
+    Yields:
+        输出行
+    """
+    pending = []
+    for row_values in rows:
+        if is_row_empty(row_values):
+            pending.append(row_values)
+            continue
+        for pending_row in pending:
+            yield pending_row
+        pending = []
+        yield row_values
+    stats['deleted'] += len(pending)
+
+
+def blank_merged_runs(rows, merge_cols, ranges, first_row=2):
+    """
+    拆分结果写出前逐行跟踪合并区域：与上一行相同的非空值写为空（与合并后的效果一致）
+
+    Args:
+        rows: 输出行迭代器（从first_row开始）
+        merge_cols: 需要合并的列索引（1-based）
+        ranges: 合并区域列表，追加(列, 起始行, 结束行)；全部行输出完后才完整
+        first_row: 第一行的行号
+
+    Yields:
+        输出行（列表）
+    """
+    last_str = {col: '' for col in merge_cols}
+    run_start = {col: None for col in merge_cols}
+    row_idx = first_row - 1
+    for row_values in rows:
+        row_idx += 1
+        row_values = list(row_values)
+        for col in merge_cols:
+            value = row_values[col - 1]
+            current_str = str(value).strip() if value is not None else ''
+            if current_str == last_str[col] and current_str:
+                # 值相同，继续合并范围，合并区域内只保留第一个单元格的值
+                if run_start[col] is None:
+                    run_start[col] = row_idx - 1
+                row_values[col - 1] = None
+            else:
+                if run_start[col] is not None:
+                    ranges.append((col, run_start[col], row_idx - 1))
+                    run_start[col] = None
+                last_str[col] = current_str
+        yield row_values
+
+    # 处理最后一段
+    for col in merge_cols:
+        if run_start[col] is not None:
+            ranges.append((col, run_start[col], row_idx))
+
+
+def read_merged_ranges(file_path, sheet_part):
+    """
+    读取sheet中跨多行的合并区域（只读模式下openpyxl不提供合并区域，直接从sheet XML的尾部读取）
+    只按左上角所在的列向下补全，跨列的部分与Excel显示一致保持为空
+
+    Args:
+        file_path: Excel文件路径
+        sheet_part: sheet XML路径
+
+    Returns:
+        {起始行号: [(起始列号, 结束列号, 结束行号)]}（列号从1开始）
+    """
+    # xml_engine导入了本模块，在函数内导入避免循环导入
+    from xml_engine import MERGE_CELL_RE, read_sheet_tail
+
+    with zipfile.ZipFile(file_path) as zf:
+        tail = read_sheet_tail(zf, sheet_part)
+    starts = {}
+    for ref in MERGE_CELL_RE.findall(tail):
+        min_col, min_row, max_col, max_row = range_boundaries(ref)
+        if max_row > min_row:
+            starts.setdefault(min_row, []).append((min_col, max_col, max_row))
+    return starts
+
+
+def fill_merged(values, row_idx, starts, fills, fill_cols):
+    """
+    按合并区域补全一行的值
+
+    Args:
+        values: 这一行的值
+        row_idx: 行号
+        starts: 从这一行开始的合并区域[(起始列号, 结束列号, 结束行号)]
+        fills: 进行中的补全{列下标: (结束行号, 值)}，会被更新
+        fill_cols: 需要补全的列下标
+
+    Returns:
+        补全后的值列表
+    """
+    values = list(values)
+    for min_col, _, max_row in starts:
+        idx = min_col - 1
+        if idx in fill_cols:
+            fills[idx] = (max_row, values[idx] if idx < len(values) else None)
+    for idx, (max_row, anchor) in list(fills.items()):
+        if row_idx > max_row:
+            del fills[idx]
+            continue
+        if idx >= len(values):
+            values.extend([None] * (idx + 1 - len(values)))
+        values[idx] = anchor
+    return values
+
+
+def merged_cell_ranges(ranges):
+    """(列, 起始行, 结束行)列表 -> write_only worksheet的merged_cells"""
+    return MultiCellRange(
+        CellRange(min_col=col, min_row=start_row, max_col=col, max_row=end_row)
+        for col, start_row, end_row in ranges
+    )
+
+
+def append_split_row(out_ws, row_values, row_idx):
+    """写出拆分结果的一行，行高为50磅"""
+    out_ws.row_dimensions[row_idx].height = 50
+    out_ws.append(row_values)
+    del out_ws.row_dimensions[row_idx]
+
+
+def open_streaming(input_file):
+    """
+    以read_only模式打开输入文件的第一个sheet，并创建write_only的输出工作簿
+
+    Args:
+        input_file: 输入Excel文件路径
+
+    Returns:
+        (输入工作簿, 输入worksheet, 输出工作簿, 输出worksheet)
+    """
+    in_wb = load_workbook(input_file, read_only=True, data_only=True, keep_vba=False)
+    in_ws = in_wb.active
+    out_wb = Workbook(write_only=True)
+    out_ws = out_wb.create_sheet(in_ws.title)
+    return in_wb, in_ws, out_wb, out_ws
+
+
+def save_streaming(out_wb, output_file):
+    """
+    保存write_only工作簿：先写临时文件再替换，输出文件与输入文件相同时也安全
+
+    Args:
+        out_wb: write_only工作簿
+        output_file: 输出Excel文件路径
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', dir=output_dir)
+    os.close(fd)
+    try:
+        out_wb.save(tmp_path)
+        replace_output(tmp_path, output_file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def require_columns(header, recorder):
+    """
+    识别用例表的各个关键列，必需的列找不到时退出
+
+    Args:
+        header: 表头tuple
+        recorder: Recorder对象
+
+    Returns:
+        detect_columns()的返回值
+    """
+    with recorder.stage('detect_columns', '识别用例名称/步骤描述/预期结果等列'):
+        columns = detect_columns(header)
+        missing = missing_columns(columns)
+    if missing:
+        recorder.fail(f"错误: 找不到'{missing[0]}'列")
+    return columns
+
+
+def stream_merge_cells(input_file, output_file=None, recorder=None):
+    """
+    流式合并Excel测试用例单元格（处理逻辑同merge_cells.merge_cells）
+
+    读取、各步骤和写出逐块交错进行，只能作为一个阶段整体计时。
+
+    Args:
+        input_file: 输入Excel文件路径
+        output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        recorder: Recorder对象（可选）
+    """
+    recorder = recorder or Recorder('merge_cells')
+    if output_file is None:
+        output_file = input_file
+
+    with recorder.stage('load', '打开工作簿（只读流式）'):
+        in_wb, in_ws, out_wb, out_ws = open_streaming(input_file)
+        header, rows = iter_sheet_rows(in_ws)
+    recorder.set(sheet=in_ws.title)
+    recorder.log(f"处理Sheet: {in_ws.title}（流式模式）")
+
+    columns = require_columns(header, recorder)
+    case_name_col = columns['case_name']
+    step_desc_col = columns['step_desc']
+    expected_result_col = columns['expected_result']
+    recorder.log(f"用例名称列: {get_column_letter(case_name_col)} (列{case_name_col})")
+    recorder.log(f"步骤描述列: {get_column_letter(step_desc_col)} (列{step_desc_col})")
+    recorder.log(f"预期结果列: {get_column_letter(expected_result_col)} (列{expected_result_col})")
+
+    stats = {'rows_in': 0, 'rows_out': 0, 'prefixed': 0, 'cases': 0, 'merged': 0, 'deleted': 0}
+    with recorder.stage('steps', '步骤1-3（逐块读取、处理、写出）'):
+        out_ws.append(header)
+        blocks = iter_case_blocks(rows, case_name_col)
+        for row_values in merge_stage(blocks, case_name_col, step_desc_col, expected_result_col, stats):
+            out_ws.append(row_values)
+        in_wb.close()
+
+    recorder.log(f"已为 {stats['prefixed']} 个单元格添加#号前缀")
+    recorder.log(f"找到 {stats['cases']} 个用例名称有值的行，共合并了 {stats['merged']} 组内容")
+    recorder.log(f"删除了 {stats['deleted']} 个空行（初始行数: {stats['rows_in'] + 1}, 最终行数: {stats['rows_out'] + 1}）")
+    recorder.count(rows_before=stats['rows_in'] + 1, rows_after=stats['rows_out'] + 1, columns=len(header),
+                   prefixed=stats['prefixed'], cases=stats['cases'], merged_blocks=stats['merged'],
+                   deleted=stats['deleted'])
+
+    try:
+        with recorder.stage('save', '保存文件'):
+            save_streaming(out_wb, output_file)
+        recorder.log(f"\n✅ 处理完成！文件已保存到: {output_file}")
+    except Exception as e:
+        recorder.fail(f"\n❌ 保存文件时出错: {e}")
+
+
+def stream_split_cells(input_file, output_file=None, recorder=None):
+    """
+    流式拆分Excel测试用例单元格（处理逻辑同split_cells.split_cells）
+
+    合并区域在写出时逐行跟踪：与上一行相同的非空值写为空（与合并后的效果一致），
+    区间在全部行写完后一次性登记；行高随每一行写出。
+
+    Args:
+        input_file: 输入Excel文件路径
+        output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        recorder: Recorder对象（可选）
+    """
+    recorder = recorder or Recorder('split_cells')
+    if output_file is None:
+        output_file = input_file
+
+    with recorder.stage('load', '打开工作簿（只读流式）'):
+        in_wb, in_ws, out_wb, out_ws = open_streaming(input_file)
+        header, rows = iter_sheet_rows(in_ws)
+    recorder.set(sheet=in_ws.title)
+    recorder.log(f"处理Sheet: {in_ws.title}（流式模式）")
+
+    columns = require_columns(header, recorder)
+    case_name_col = columns['case_name']
+    step_desc_col = columns['step_desc']
+    expected_result_col = columns['expected_result']
+
+    # 需要合并的列：X级模块、用例名称、前置条件
+    merge_cols = merge_columns_of(columns)
+    recorder.log(f"需要合并的列: {[get_column_letter(col) for col in merge_cols]}")
+
+    stats = {'rows_in': 0, 'split': 0, 'inserted': 0, 'cleared': 0, 'deleted': 0}
+    ranges = []
+    with recorder.stage('steps', '步骤1-5（逐块读取、处理、写出）'):
+        append_split_row(out_ws, header, 1)
+        row_idx = 1
+        blocks = iter_case_blocks(rows, case_name_col)
+        split_rows = drop_trailing_empty(split_stage(blocks, step_desc_col, expected_result_col, stats), stats)
+        for row_values in blank_merged_runs(split_rows, merge_cols, ranges):
+            row_idx += 1
+            append_split_row(out_ws, row_values, row_idx)
+        in_wb.close()
+        out_ws.merged_cells = merged_cell_ranges(ranges)
+
+    recorder.log(f"拆分了 {stats['split']} 行，共插入 {stats['inserted']} 行新数据")
+    recorder.log(f"清空了 {stats['cleared']} 个单元格中的#号")
+    recorder.log(f"合并了 {len(ranges)} 组单元格，已设置 {row_idx} 行的行高为50磅")
+    recorder.log(f"删除了 {stats['deleted']} 个尾部空行")
+    recorder.count(rows_before=stats['rows_in'] + 1, rows_after=row_idx, columns=len(header),
+                   split=stats['split'], inserted=stats['inserted'], cleared=stats['cleared'],
+                   merged_ranges=len(ranges), deleted=stats['deleted'])
+
+    try:
+        with recorder.stage('save', '保存文件'):
+            save_streaming(out_wb, output_file)
+        recorder.log(f"\n✅ 处理完成！文件已保存到: {output_file}")
+    except Exception as e:
+        recorder.fail(f"\n❌ 保存文件时出错: {e}")
@@ -0,0 +1,554 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+业务规则 → 测试用例的追溯索引，以及按优先级的覆盖率
+索引保存在JSON文件中，每个源文件一项（按大小和修改时间判断是否变化，只重新解析变化的文件）：
+    清洗后的JSON（cleaned/*-cleaned.json）：需求ID、场景（scenario_id → 优先级、功能名称）、
+        业务规则（rule_id → 关联的场景）。场景上有rule_ids/related_rules时按其关联，
+        否则按规则的conditions推断：条件等于功能名称，或作为完整的词出现在场景名称、描述、步骤文本中
+        （前面是"非/不/无/未/没有"的否定用法不算，如条件"自发订单"不匹配"非自发订单"）
+    测试用例工作簿（testcases/**/*.xlsx）：用例名称及所在行，从用例名称（如 #77879-A001-录入SO）
+        解析出需求ID和场景ID
+场景在某个工作簿中有对应的用例即为已覆盖；规则关联的场景中有已覆盖的即为已覆盖，
+规则的优先级为关联场景中最高的优先级（没有关联场景时为需求的优先级）。
+high/medium/low等写法按test-context.yaml的说明归为P1/P2/P3，无法识别优先级的场景和规则视为不达标。
+覆盖率要求从context/test-context.yaml的priority_rules.*.coverage_requirement读取（如 "≥90%"）。
+
+查询前先做一次增量更新（没有变化时只需stat每个文件），覆盖率直接在索引上计算。
+
+用法：
+    python trace_index.py update [项目目录]               # 默认 sea-gen-testcases
+    python trace_index.py coverage [项目目录] [--req #77879] [--json]
+    python trace_index.py trace [项目目录] <规则ID或用例名称> [--req #77879]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+from openpyxl import load_workbook
+
+from sheet_model import FIRST_DATA_ROW, cell_text, detect_columns
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROJECT = os.path.join(os.path.dirname(os.path.dirname(SCRIPT_DIR)), 'sea-gen-testcases')
+INDEX_NAME = '.trace-index.json'
+CONTEXT_FILE = os.path.join('context', 'test-context.yaml')
+INDEX_VERSION = 2
+
+PRIORITIES = ('P0', 'P1', 'P2', 'P3', 'P4')
+# 其他写法的优先级（同test-context.yaml中priority_rules的说明：Critical/High/Medium/Low）
+PRIORITY_ALIASES = {'CRITICAL': 'P0', 'HIGHEST': 'P0', 'HIGH': 'P1', 'MEDIUM': 'P2', 'NORMAL': 'P2',
+                    'LOW': 'P3', 'LOWEST': 'P4', '紧急': 'P0', '高': 'P1', '中': 'P2', '低': 'P3'}
+# 条件前面出现这些词时是否定用法，不据此关联规则
+NEGATIONS = ('非', '不', '无', '未', '没有')
+# test-context.yaml不可用时的覆盖率要求（%）
+DEFAULT_REQUIREMENTS = {'P0': 100.0, 'P1': 90.0, 'P2': 70.0, 'P3': 50.0}
+# 用例名称：{需求ID}-{场景ID}-...
+CASE_NAME_RE = re.compile(r'^\s*(#?[^\s-]+)-([A-Za-z]+\d+)(?:-|$)')
+EXPLICIT_RULE_KEYS = ('rule_ids', 'related_rules', 'business_rules')
+
+
+def normalize_req_id(req_id):
+    """需求ID归一化（去掉#号和首尾空白，统一大写）"""
+    return str(req_id).strip().lstrip('#').upper() if req_id else None
+
+
+def normalize_priority(priority):
+    """优先级归一化为P0-P4（如 "p1"、"high"、"高"），无法识别时返回None"""
+    if not isinstance(priority, str):
+        return None
+    priority = priority.strip().upper()
+    if priority in PRIORITIES:
+        return priority
+    return PRIORITY_ALIASES.get(priority)
+
+
+def condition_pattern(condition):
+    """
+    规则条件 -> 在场景文本中查找它的正则：前面不能是否定词；
+    以字母数字开头或结尾的条件还要求词边界（如 "SO" 不匹配 "SOP"）
+    """
+    prefix = ''.join(f'(?<!{re.escape(word)})' for word in NEGATIONS)
+    if re.match(r'\w', condition, re.ASCII):
+        prefix += r'(?<!\w)'
+    suffix = r'(?!\w)' if re.search(r'\w$', condition, re.ASCII) else ''
+    return re.compile(prefix + re.escape(condition) + suffix, re.ASCII)
+
+
+def priority_rank(priority):
+    """优先级排序用的序号（P0最高），无法识别时排在最后"""
+    return PRIORITIES.index(priority) if priority in PRIORITIES else len(PRIORITIES)
+
+
+def parse_cleaned(path):
+    """
+    解析清洗后的JSON
+
+    Returns:
+        索引项数据：req_id、module_name、priority、scenarios{scenario_id: [优先级, 功能名称]}、
+        rules{rule_id: {description, priority, scenarios}}
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    requirement = data.get('requirement')
+    if requirement is None and data.get('requirements'):
+        requirement = data['requirements'][0]
+    requirement = requirement or {}
+    req_priority = normalize_priority(requirement.get('priority'))
+
+    scenarios = {}
+    texts = {}
+    explicit = {}
+    for function in data.get('business_functions') or ():
+        function_name = function.get('function_name')
+        for scenario in function.get('scenarios') or ():
+            scenario_id = scenario.get('scenario_id')
+            if not scenario_id:
+                continue
+            priority = (normalize_priority(scenario.get('priority'))
+                        or normalize_priority(function.get('function_priority')) or req_priority)
+            scenarios[scenario_id] = [priority, function_name]
+            steps = scenario.get('test_steps') or ()
+            texts[scenario_id] = (function_name, '\n'.join(
+                [scenario.get('scenario_name') or '', scenario.get('description') or '']
+                + [f"{step.get('step_description') or ''}\n{step.get('expected_result') or ''}" for step in steps]))
+            for key in EXPLICIT_RULE_KEYS:
+                for rule_id in scenario.get(key) or ():
+                    if isinstance(rule_id, str):
+                        explicit.setdefault(rule_id, []).append(scenario_id)
+
+    rules = {}
+    for rule in requirement.get('business_rules') or ():
+        rule_id = rule.get('rule_id')
+        if not rule_id:
+            continue
+        linked = explicit.get(rule_id)
+        if linked is None:
+            conditions = [c.strip() for c in (rule.get('conditions') or ()) if isinstance(c, str) and c.strip()]
+            patterns = [condition_pattern(c) for c in conditions]
+            linked = [scenario_id for scenario_id, (function_name, text) in texts.items()
+                      if function_name in conditions or any(p.search(text) for p in patterns)]
+        priorities = [scenarios[s][0] for s in linked if s in scenarios]
+        rules[rule_id] = {
+            'description': rule.get('description'),
+            'priority': min(priorities, key=priority_rank) if priorities else req_priority,
+            'scenarios': linked,
+        }
+
+    return {
+        'req_id': normalize_req_id(requirement.get('req_id')),
+        'module_name': requirement.get('module_name') or requirement.get('title'),
+        'priority': req_priority,
+        'scenarios': scenarios,
+        'rules': rules,
+    }
+
+
+def parse_case_name(name):
+    """用例名称 -> (需求ID, 场景ID)，无法解析时返回(None, None)"""
+    match = CASE_NAME_RE.match(name)
+    if not match:
+        return None, None
+    return normalize_req_id(match.group(1)), match.group(2).upper()
+
+
+def parse_workbook(path):
+    """
+    读取工作簿第一个sheet的用例名称（只读模式，只取用例名称列）
+
+    Returns:
+        索引项数据：keys{需求ID: [场景ID]}（覆盖率只需要这部分）、count（用例数）、
+        cases（"行号\t用例名称"按行拼接的文本，只在追溯查询时才拆开，索引加载得更快）
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        columns = detect_columns(next(rows, ()))
+        if columns['case_name'] is None:
+            return {'keys': {}, 'count': 0, 'cases': ''}
+        name_idx = columns['case_name'] - 1
+        keys = {}
+        lines = []
+        for row_idx, values in enumerate(rows, FIRST_DATA_ROW):
+            name = cell_text(values[name_idx]) if name_idx < len(values) else None
+            if name is None:
+                continue
+            name = ' '.join(name.split())
+            req_id, scenario_id = parse_case_name(name)
+            if req_id:
+                keys.setdefault(req_id, {})[scenario_id] = None
+            lines.append(f'{row_idx}\t{name}')
+        return {'keys': {req_id: list(ids) for req_id, ids in keys.items()}, 'count': len(lines),
+                'cases': '\n'.join(lines)}
+    finally:
+        wb.close()
+
+
+def scan_sources(project_dir):
+    """
+    列出项目目录下的源文件
+
+    Returns:
+        {文件路径: (类型cleaned/workbook, 大小, 修改时间ns)}
+    """
+    found = {}
+    patterns = [('cleaned', os.path.join(project_dir, 'cleaned', '*-cleaned.json')),
+                ('workbook', os.path.join(project_dir, 'testcases', '**', '*.xlsx'))]
+    for kind, pattern in patterns:
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.basename(path).startswith(('~$', '.')):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            found[os.path.abspath(path)] = (kind, stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+def load_index(index_file):
+    """读取索引文件（不存在、损坏或版本不同时返回空索引）"""
+    try:
+        with open(index_file, encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {'version': INDEX_VERSION, 'files': {}}
+
+
+def save_index(index, index_file):
+    """写入索引文件（先写临时文件再替换）"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(index_file)))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_file)
+
+
+def update_index(project_dir, index_file=None):
+    """
+    增量更新索引：只重新解析新增或变化的文件，删除已不存在的文件
+
+    Args:
+        project_dir: 项目目录（包含cleaned/、testcases/）
+        index_file: 索引文件路径，默认 <项目目录>/.trace-index.json
+
+    Returns:
+        (索引, 变化统计{added, updated, removed, errors})
+    """
+    index_file = index_file or os.path.join(project_dir, INDEX_NAME)
+    index = load_index(index_file)
+    files = index['files']
+    current = scan_sources(project_dir)
+    changes = {'added': 0, 'updated': 0, 'removed': 0, 'errors': []}
+
+    for path in [path for path in files if path not in current]:
+        del files[path]
+        changes['removed'] += 1
+    for path, (kind, size, mtime_ns) in current.items():
+        entry = files.get(path)
+        if entry and entry['kind'] == kind and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            continue
+        try:
+            data = parse_cleaned(path) if kind == 'cleaned' else parse_workbook(path)
+            error = None
+        except Exception as e:
+            data, error = None, f'{type(e).__name__}: {e}'
+            changes['errors'].append((path, error))
+        changes['updated' if entry else 'added'] += 1
+        files[path] = {'kind': kind, 'size': size, 'mtime_ns': mtime_ns, 'data': data, 'error': error}
+
+    if changes['added'] or changes['updated'] or changes['removed'] or not os.path.exists(index_file):
+        index['updated'] = time.time()
+        save_index(index, index_file)
+    return index, changes
+
+
+def load_coverage_requirements(context_file):
+    """
+    读取各优先级的覆盖率要求（%）
+
+    Returns:
+        {优先级: 要求的最低覆盖率}；文件不存在或没有PyYAML时返回默认值
+
+    Raises:
+        ValueError: 文件不是有效的YAML映射
+    """
+    try:
+        import yaml
+        with open(context_file, encoding='utf-8') as f:
+            context = yaml.safe_load(f) or {}
+    except (ImportError, OSError):
+        return dict(DEFAULT_REQUIREMENTS)
+    except yaml.YAMLError as e:
+        raise ValueError(f"{context_file} 格式错误: {e}")
+    if not isinstance(context, dict):
+        raise ValueError(f"{context_file} 格式错误: 顶层应为映射")
+    requirements = {}
+    for priority, rule in (context.get('priority_rules') or {}).items():
+        match = re.search(r'(\d+(?:\.\d+)?)\s*%', str((rule or {}).get('coverage_requirement', '')))
+        if match:
+            requirements[priority] = float(match.group(1))
+    return requirements or dict(DEFAULT_REQUIREMENTS)
+
+
+def covered_keys(index):
+    """所有工作簿中有用例的(需求ID, 场景ID)集合"""
+    covered = set()
+    for entry in index['files'].values():
+        if entry['kind'] != 'workbook' or not entry['data']:
+            continue
+        for req_id, scenario_ids in entry['data']['keys'].items():
+            covered.update((req_id, scenario_id) for scenario_id in scenario_ids)
+    return covered
+
+
+def case_locations(index, wanted):
+    """
+    指定场景的用例位置
+
+    Args:
+        index: 索引
+        wanted: (需求ID, 场景ID)集合
+
+    Returns:
+        {(需求ID, 场景ID): [(工作簿路径, 行号, 用例名称)]}
+    """
+    locations = {}
+    wanted_reqs = {req_id for req_id, _ in wanted}
+    for path, entry in sorted(index['files'].items()):
+        if entry['kind'] != 'workbook' or not entry['data'] or not wanted_reqs.intersection(entry['data']['keys']):
+            continue
+        for line in entry['data']['cases'].split('\n'):
+            row, _, name = line.partition('\t')
+            key = parse_case_name(name)
+            if key in wanted:
+                locations.setdefault(key, []).append((path, int(row), name))
+    return locations
+
+
+def requirements_of(index, req_id=None):
+    """索引中的需求 [(清洗后JSON路径, 数据)]，可按需求ID过滤"""
+    wanted = normalize_req_id(req_id)
+    return [(path, entry['data']) for path, entry in sorted(index['files'].items())
+            if entry['kind'] == 'cleaned' and entry['data']
+            and (wanted is None or entry['data']['req_id'] == wanted)]
+
+
+def coverage(index, requirements=None, req_id=None):
+    """
+    按优先级统计场景和业务规则的覆盖率
+
+    Args:
+        index: update_index()返回的索引
+        requirements: {优先级: 要求的最低覆盖率(%)}
+        req_id: 只统计某个需求
+
+    Returns:
+        结果字典：requirements（需求数）、priorities{优先级: {scenarios: {total, covered, percent},
+        rules: {...}, required, ok}}、ok、uncovered_rules、uncovered_scenarios、
+        orphan_scenarios（工作簿中有用例、但清洗后的JSON中没有的场景数）
+    """
+    requirements = requirements or DEFAULT_REQUIREMENTS
+    covered_all = covered_keys(index)
+    stats = {}
+    uncovered_rules = []
+    uncovered_scenarios = []
+    known = set()
+
+    def bucket(priority, kind):
+        return stats.setdefault(priority or '未知', {'scenarios': [0, 0], 'rules': [0, 0]})[kind]
+
+    reqs = requirements_of(index, req_id)
+    for _, data in reqs:
+        rid = data['req_id']
+        covered = set()
+        for scenario_id, (priority, function_name) in data['scenarios'].items():
+            known.add((rid, scenario_id.upper()))
+            counts = bucket(priority, 'scenarios')
+            counts[0] += 1
+            if (rid, scenario_id.upper()) in covered_all:
+                counts[1] += 1
+                covered.add(scenario_id)
+            else:
+                uncovered_scenarios.append({'req_id': rid, 'scenario_id': scenario_id,
+                                            'priority': priority, 'function': function_name})
+        for rule_id, rule in data['rules'].items():
+            counts = bucket(rule['priority'], 'rules')
+            counts[0] += 1
+            if covered.intersection(rule['scenarios']):
+                counts[1] += 1
+            else:
+                uncovered_rules.append({'req_id': rid, 'rule_id': rule_id, 'priority': rule['priority'],
+                                        'description': rule['description']})
+
+    wanted = normalize_req_id(req_id)
+    orphan_scenarios = sum(1 for key in covered_all if key not in known and (wanted is None or key[0] == wanted))
+
+    priorities = {}
+    for priority in sorted(stats, key=priority_rank):
+        result = {}
+        for kind, (total, covered) in stats[priority].items():
+            result[kind] = {'total': total, 'covered': covered,
+                            'percent': round(covered * 100.0 / total, 1) if total else None}
+        required = requirements.get(priority)
+        result['required'] = required
+        if priority not in PRIORITIES:
+            # 无法识别的优先级无法对照覆盖率要求，视为不达标
+            result['ok'] = False
+        else:
+            result['ok'] = required is None or all(
+                result[kind]['percent'] is None or result[kind]['percent'] >= required
+                for kind in ('scenarios', 'rules'))
+        priorities[priority] = result
+
+    return {
+        'requirements': len(reqs),
+        'priorities': priorities,
+        'ok': all(result['ok'] for result in priorities.values()),
+        'uncovered_rules': uncovered_rules,
+        'uncovered_scenarios': uncovered_scenarios,
+        'orphan_scenarios': orphan_scenarios,
+    }
+
+
+def trace(index, key, req_id=None):
+    """
+    查询规则对应的用例，或用例对应的规则
+
+    Args:
+        index: 索引
+        key: 规则ID（如R001）或用例名称（如 #77879-A001-录入SO）
+        req_id: 规则ID在多个需求中重复时按需求过滤
+
+    Returns:
+        结果列表，每项：req_id、rule_id、description、priority、scenarios、cases[[工作簿, 行号, 用例名称]]
+    """
+    req_key, scenario_key = parse_case_name(key)
+    matched = []
+    for _, data in requirements_of(index, req_id):
+        for rule_id, rule in data['rules'].items():
+            if req_key is not None:
+                if data['req_id'] != req_key or scenario_key not in {s.upper() for s in rule['scenarios']}:
+                    continue
+            elif rule_id != key:
+                continue
+            matched.append((data['req_id'], rule_id, rule))
+
+    locations = case_locations(index, {(rid, s.upper()) for rid, _, rule in matched for s in rule['scenarios']})
+    results = []
+    for rid, rule_id, rule in matched:
+        cases = [list(loc) for s in rule['scenarios'] for loc in locations.get((rid, s.upper()), ())]
+        results.append({'req_id': rid, 'rule_id': rule_id, 'description': rule['description'],
+                        'priority': rule['priority'], 'scenarios': rule['scenarios'], 'cases': cases})
+    return results
+
+
+def format_coverage(result):
+    """把coverage()的结果转为文本"""
+    lines = [f"需求数: {result['requirements']}"]
+    for priority, stats in result['priorities'].items():
+        if priority not in PRIORITIES:
+            required = '优先级无法识别'
+        elif stats['required'] is not None:
+            required = f"要求≥{stats['required']:g}%"
+        else:
+            required = '无要求'
+        parts = []
+        for kind, label in (('scenarios', '场景'), ('rules', '规则')):
+            counts = stats[kind]
+            if counts['total']:
+                parts.append(f"{label} {counts['covered']}/{counts['total']}（{counts['percent']:g}%）")
+        mark = '✅' if stats['ok'] else '❌'
+        lines.append(f"{mark} {priority}: {'，'.join(parts)}，{required}")
+    if result['uncovered_rules']:
+        lines.append('')
+        lines.append('未覆盖的规则:')
+        for rule in result['uncovered_rules']:
+            lines.append(f"  {rule['req_id']} {rule['rule_id']}（{rule['priority'] or '未知'}）: {rule['description']}")
+    if result['uncovered_scenarios']:
+        lines.append('')
+        lines.append('未覆盖的场景:')
+        for scenario in result['uncovered_scenarios']:
+            lines.append(f"  {scenario['req_id']}-{scenario['scenario_id']}（{scenario['priority'] or '未知'}）"
+                         f" {scenario['function'] or ''}")
+    if result['orphan_scenarios']:
+        lines.append('')
+        lines.append(f"有 {result['orphan_scenarios']} 个场景在工作簿中有用例，但清洗后的JSON中找不到")
+    return '\n'.join(lines)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='业务规则→测试用例追溯索引与按优先级的覆盖率')
+    parser.add_argument('--index', default=None, help=f'索引文件路径（默认 <项目目录>/{INDEX_NAME}）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help='增量更新索引')
+    coverage_parser = subparsers.add_parser('coverage', help='按优先级统计覆盖率（先增量更新索引）')
+    coverage_parser.add_argument('--context', default=None,
+                                 help=f'覆盖率要求配置（默认 <项目目录>/{CONTEXT_FILE}）')
+    trace_parser = subparsers.add_parser('trace', help='查询规则对应的用例，或用例对应的规则')
+    for sub in (update_parser, coverage_parser, trace_parser):
+        sub.add_argument('project_dir', nargs='?', default=DEFAULT_PROJECT,
+                         help='项目目录，包含cleaned/和testcases/（默认sea-gen-testcases）')
+    # 与用法一致：trace [项目目录] <规则ID或用例名称>
+    trace_parser.add_argument('key', help='规则ID（如R001）或用例名称（如 #77879-A001-录入SO）')
+    for sub in (coverage_parser, trace_parser):
+        sub.add_argument('--req', default=None, help='只查询某个需求（如 #77879）')
+        sub.add_argument('--json', action='store_true', help='输出JSON')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.project_dir):
+        print(f"错误: 项目目录不存在: {args.project_dir}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    index, changes = update_index(args.project_dir, args.index)
+    update_seconds = time.perf_counter() - start
+    for path, error in changes['errors']:
+        print(f"❌ {path}: {error}", file=sys.stderr)
+
+    if args.command == 'update':
+        n_cleaned = sum(1 for entry in index['files'].values() if entry['kind'] == 'cleaned')
+        print(f"✅ 索引已更新（新增 {changes['added']}，更新 {changes['updated']}，删除 {changes['removed']}，"
+              f"共 {n_cleaned} 个需求、{len(index['files']) - n_cleaned} 个工作簿，{update_seconds:.3f}秒）")
+    elif args.command == 'coverage':
+        try:
+            requirements = load_coverage_requirements(args.context or os.path.join(args.project_dir, CONTEXT_FILE))
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        result = coverage(index, requirements, args.req)
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            print(format_coverage(result))
+        if not result['ok']:
+            sys.exit(1)
+    else:
+        results = trace(index, args.key, args.req)
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False, indent=2))
+        elif not results:
+            print(f"没有找到: {args.key}")
+        for item in results if not args.json else ():
+            print(f"{item['req_id']} {item['rule_id']}（{item['priority'] or '未知'}）: {item['description']}")
+            print(f"  关联场景: {', '.join(item['scenarios']) or '无'}")
+            for path, row, name in item['cases']:
+                print(f"  {os.path.relpath(path, args.project_dir)} 第{row}行: {name}")
+
+    if changes['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
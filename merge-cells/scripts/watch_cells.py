@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+监视目录，自动合并/拆分新增或修改的测试用例工作簿
+每隔一段时间用os.scandir扫描目录（只读取文件大小和修改时间，开销很小），
+文件在去抖时间内大小和修改时间都不再变化才认为已写完，再交给有界的进程池处理。
+输出写在输入旁边（<文件名><后缀>.xlsx），先写临时文件再替换，不会出现写了一半的输出。
+启动时输出已存在且比输入新的文件不会重复处理。
+
+忽略的文件：~$开头的Office锁文件、.开头的隐藏/临时文件、输出文件本身（以后缀结尾）。
+
+用法：
+    python watch_cells.py merge <目录> [--suffix -merged] [-j 2] [--debounce 2] [--status 状态JSON]
+    python watch_cells.py split <目录> --once   # 处理一遍当前需要处理的文件后退出
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_cells import process_file
+from result_cache import add_cache_arguments, replace_output
+
+
+DEFAULT_SUFFIXES = {
+    'merge': '-merged',
+    'split': '-split',
+}
+DEFAULT_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_WORKERS = 2
+
+
+def output_path_for(input_file, suffix):
+    """输入文件旁边的输出文件路径"""
+    root, ext = os.path.splitext(input_file)
+    return root + suffix + ext
+
+
+def temp_output_path(output_file):
+    """与输出文件同目录的临时文件路径（.开头，扫描时会被忽略）"""
+    fd, path = tempfile.mkstemp(prefix='.~', suffix='.xlsx', dir=os.path.dirname(output_file))
+    os.close(fd)
+    return path
+
+
+def process_to(mode, input_file, output_file, engine, cache_options):
+    """
+    在工作进程中处理单个文件：先输出到临时文件，成功后替换为正式的输出文件
+    （临时文件是0600的，替换时改为输出文件原有的权限，新建时为0o666去掉umask）
+
+    Returns:
+        结果字典（见batch_cells.process_file，output为正式的输出文件路径）
+    """
+    tmp_path = temp_output_path(output_file)
+    try:
+        result = process_file(mode, input_file, tmp_path, engine, cache_options)
+        if result['ok']:
+            replace_output(tmp_path, output_file)
+        result['output'] = output_file
+        return result
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class Watcher(object):
+    """
+    轮询目录并调度处理
+
+    每个文件的状态：
+        seen: 最近一次扫描到的(大小, 修改时间)
+        waiting: 有变化、正在去抖的文件 → (签名, 最后变化时间, 首次发现变化的时间)
+        running: 已提交到进程池的文件 → (future, 提交时的签名, 首次发现变化的时间)
+
+    Attributes:
+        stats: 已处理数、失败数、队列深度、处理耗时和延迟（从发现变化到输出完成）
+    """
+
+    def __init__(self, mode, directory, suffix=None, engine='full', workers=DEFAULT_WORKERS, max_queue=None,
+                 debounce=DEFAULT_DEBOUNCE, recursive=False, cache_options=None, status_file=None):
+        self.mode = mode
+        self.directory = os.path.abspath(directory)
+        self.suffix = suffix or DEFAULT_SUFFIXES[mode]
+        self.engine = engine
+        self.workers = workers
+        self.max_queue = max_queue or workers * 2
+        self.debounce = debounce
+        self.recursive = recursive
+        self.cache_options = cache_options
+        self.status_file = status_file
+        self.seen = {}
+        self.waiting = {}
+        self.running = {}
+        self.stats = {
+            'processed': 0,
+            'failed': 0,
+            'queue_depth': 0,
+            'running': 0,
+            'waiting': 0,
+            'latency_seconds': {'last': None, 'avg': None, 'max': None},
+            'process_seconds': {'last': None, 'avg': None, 'max': None},
+        }
+        self._executor = None
+
+    def is_input(self, name):
+        """是否是需要处理的输入文件"""
+        if not name.endswith('.xlsx') or name.startswith('~$') or name.startswith('.'):
+            return False
+        return not os.path.splitext(name)[0].endswith(self.suffix)
+
+    def scan(self):
+        """
+        扫描目录
+
+        Returns:
+            {文件路径: (大小, 修改时间ns)}
+        """
+        found = {}
+        pending_dirs = [self.directory]
+        while pending_dirs:
+            try:
+                entries = list(os.scandir(pending_dirs.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and not entry.name.startswith('.'):
+                            pending_dirs.append(entry.path)
+                    elif entry.is_file() and self.is_input(entry.name):
+                        stat = entry.stat()
+                        found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                except FileNotFoundError:
+                    # 扫描过程中被删除
+                    continue
+        return found
+
+    def is_up_to_date(self, path, signature):
+        """输出文件已存在且不比输入旧"""
+        try:
+            return os.stat(output_path_for(path, self.suffix)).st_mtime_ns >= signature[1]
+        except FileNotFoundError:
+            return False
+
+    def poll(self, now, initial=False):
+        """
+        扫描一次，记录新增、修改和删除的文件
+
+        Args:
+            now: 当前时间（time.monotonic()）
+            initial: 是否为启动时的第一次扫描（输出已是最新的文件不处理）
+        """
+        current = self.scan()
+        for path in set(self.seen) - set(current):
+            del self.seen[path]
+            self.waiting.pop(path, None)
+
+        for path, signature in current.items():
+            if self.seen.get(path) == signature:
+                continue
+            self.seen[path] = signature
+            if initial and self.is_up_to_date(path, signature):
+                continue
+            detected = self.waiting[path][2] if path in self.waiting else now
+            self.waiting[path] = (signature, now, detected)
+
+    def dispatch(self, now):
+        """把去抖结束的文件提交到进程池（同一文件同时只处理一次，运行中的数量不超过max_queue）"""
+        ready = sorted((changed, path) for path, (_, changed, _) in self.waiting.items()
+                       if now - changed >= self.debounce and path not in self.running)
+        for _, path in ready:
+            if len(self.running) >= self.max_queue:
+                break
+            signature, _, detected = self.waiting.pop(path)
+            future = self._executor.submit(process_to, self.mode, path, output_path_for(path, self.suffix),
+                                           self.engine, self.cache_options)
+            self.running[path] = (future, signature, detected)
+
+    def collect(self):
+        """
+        收集已完成的处理结果
+
+        Returns:
+            结果字典列表（附加latency：从发现变化到输出完成的秒数）
+        """
+        results = []
+        for path, (future, signature, detected) in list(self.running.items()):
+            if not future.done():
+                continue
+            del self.running[path]
+            try:
+                result = future.result()
+            except Exception as e:
+                # 工作进程异常退出等情况
+                result = {'file': path, 'output': None, 'ok': False, 'seconds': 0.0,
+                          'error': f'{type(e).__name__}: {e}', 'cache': None, 'stages': []}
+            result['latency'] = round(time.monotonic() - detected, 3)
+            self.record(result)
+            results.append(result)
+        return results
+
+    def record(self, result):
+        """更新统计"""
+        key = 'processed' if result['ok'] else 'failed'
+        self.stats[key] += 1
+        done = self.stats['processed'] + self.stats['failed']
+        for name, value in (('latency_seconds', result['latency']), ('process_seconds', result['seconds'])):
+            metric = self.stats[name]
+            metric['avg'] = round(((metric['avg'] or 0) * (done - 1) + value) / done, 3)
+            metric['max'] = max(metric['max'] or 0, value)
+            metric['last'] = value
+
+    def update_status(self, now):
+        """更新队列深度，并写入状态文件（先写临时文件再替换）"""
+        waiting = len(self.waiting)
+        ready = sum(1 for _, changed, _ in self.waiting.values() if now - changed >= self.debounce)
+        self.stats['waiting'] = waiting
+        self.stats['running'] = len(self.running)
+        self.stats['queue_depth'] = ready + len(self.running)
+        if self.status_file:
+            status = dict(self.stats, directory=self.directory, mode=self.mode, updated=time.time())
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(self.status_file)))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(status, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.status_file)
+
+    def run(self, interval=DEFAULT_INTERVAL, once=False, callback=None):
+        """
+        开始监视
+
+        Args:
+            interval: 扫描间隔（秒）
+            once: 为True时处理完当前需要处理的文件后返回
+            callback: 每个文件处理完成时调用，参数为结果字典
+        """
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            self._executor = executor
+            self.poll(time.monotonic(), initial=True)
+            while True:
+                now = time.monotonic()
+                self.dispatch(now)
+                results = self.collect()
+                self.update_status(now)
+                if callback is not None:
+                    for result in results:
+                        callback(result, self.stats)
+                if once and not self.waiting and not self.running:
+                    return
+                time.sleep(interval)
+                self.poll(time.monotonic())
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='监视目录，自动合并/拆分新增或修改的测试用例工作簿')
+    parser.add_argument('mode', choices=sorted(DEFAULT_SUFFIXES), help='merge合并 或 split拆分')
+    parser.add_argument('directory', help='监视的目录')
+    parser.add_argument('--suffix', default=None,
+                        help='输出文件名后缀，输出写在输入旁边（默认merge为-merged，split为-split）')
+    parser.add_argument('--engine', choices=['full', 'stream', 'xml'], default='full',
+                        help='处理引擎（xml只用于merge）')
+    parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'并发进程数（默认{DEFAULT_WORKERS}）')
+    parser.add_argument('--max-queue', type=int, default=None,
+                        help='同时提交到进程池的文件数上限，其余文件排队等待（默认进程数的2倍）')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'扫描间隔秒数（默认{DEFAULT_INTERVAL}）')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f'文件大小和修改时间保持不变多少秒后才处理，避免处理写了一半的文件（默认{DEFAULT_DEBOUNCE}）')
+    parser.add_argument('-r', '--recursive', action='store_true', help='同时监视子目录')
+    parser.add_argument('--status', default=None, help='把队列深度、处理耗时和延迟等状态实时写入JSON文件')
+    parser.add_argument('--once', action='store_true', help='处理完当前需要处理的文件后退出，不继续监视')
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    if args.engine == 'xml' and args.mode != 'merge':
+        parser.error('xml 引擎只支持 merge')
+    if not os.path.isdir(args.directory):
+        print(f"错误: 目录不存在: {args.directory}")
+        sys.exit(1)
+
+    watcher = Watcher(args.mode, args.directory, args.suffix, args.engine, args.workers, args.max_queue,
+                      args.debounce, args.recursive,
+                      (args.cache_dir, args.cache_size) if args.cache else None, args.status)
+
+    def report(result, stats):
+        name = os.path.relpath(result['file'], watcher.directory)
+        if result['ok']:
+            cached = '，缓存命中' if result['cache'] == 'hit' else ''
+            print(f"  ✅ {name} → {os.path.basename(result['output'])}（处理 {result['seconds']:.2f}秒，"
+                  f"延迟 {result['latency']:.2f}秒{cached}，队列 {stats['queue_depth']}）", flush=True)
+        else:
+            print(f"  ❌ {name}: {result['error']}", flush=True)
+
+    action = '合并' if args.mode == 'merge' else '拆分'
+    print(f"监视 {watcher.directory}，新增或修改的xlsx将自动{action}，输出为 <文件名>{watcher.suffix}.xlsx"
+          f"（{args.workers} 个进程，去抖 {args.debounce} 秒）" + ('' if args.once else '，Ctrl+C 停止'), flush=True)
+    try:
+        watcher.run(args.interval, args.once, report)
+    except KeyboardInterrupt:
+        pass
+    stats = watcher.stats
+    print(f"\n已处理 {stats['processed']} 个，失败 {stats['failed']} 个，"
+          f"平均延迟 {stats['latency_seconds']['avg'] or 0:.2f} 秒")
+    if args.once and stats['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
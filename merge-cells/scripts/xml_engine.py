@@ -0,0 +1,853 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+XML快速合并引擎
+合并只是纯文本变换（加#号、拼接、删空行），openpyxl对象模型的开销远大于变换本身。
+这里直接从xlsx压缩包中流式读取sheet的XML和共享字符串表，只重写受影响的<row>/<c>元素，
+其余文本和压缩包中的其他成员原样复制；结果与默认引擎逐值一致。
+
+sheet用到快速路径处理不了的特性（公式、超链接、条件格式、数据验证、表格、批注、图片等，
+或者步骤描述/预期结果列有合并单元格、日期时间值）时抛出UnsupportedSheet，
+由调用方回退到完整加载引擎。
+"""
+
+import codecs
+import html
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import zipfile
+from array import array
+from bisect import bisect_right
+from itertools import chain
+from xml.etree.ElementTree import iterparse, parse
+from xml.sax.saxutils import escape
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+
+from instrumentation import Recorder
+from result_cache import replace_output
+from sheet_model import FIRST_DATA_ROW, cell_text, add_hash_prefix
+from stream_engine import require_columns
+
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# 这些元素引用了行号（删行后会错位）或者需要重新计算，出现时不走快速路径
+UNSUPPORTED_TAG_RE = re.compile(
+    r'<(conditionalFormatting|dataValidations|hyperlinks|tableParts|autoFilter|sortState|rowBreaks'
+    r'|drawing|legacyDrawing|oleObjects|controls|protectedRanges|extLst)\b'
+    r'|<([A-Za-z_][\w.-]*:[A-Za-z_][\w.-]*)'
+)
+# sheet关联了这些部件时同理
+UNSUPPORTED_REL_TYPES = ('/comments', '/table', '/drawing', '/vmlDrawing', '/pivotTable')
+
+WORKSHEET_RE = re.compile(r'<worksheet\b[^>]*\bxmlns\s*=\s*"' + re.escape(MAIN_NS) + '"')
+SHEET_DATA_RE = re.compile(r'<sheetData\b[^>]*?(/?)>')
+SHEET_DATA_END = '</sheetData>'
+ROW_RE = re.compile(r'\s*<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+CELL_RE = re.compile(r'<c\b([^>]*?)(/>|>(.*?)</c>)', re.S)
+ATTR_RE = re.compile(r'([\w:]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+ROW_NUMBER_RE = re.compile(r'(\br\s*=\s*["\'])(\d+)')
+CELL_REF_RE = re.compile(r'(\br\s*=\s*["\'][A-Z]+)(\d+)')
+SPANS_RE = re.compile(r'\s+spans\s*=\s*(?:"[^"]*"|\'[^\']*\')')
+VALUE_RE = re.compile(r'<v>(.*?)</v>', re.S)
+INLINE_RE = re.compile(r'<is>(.*?)</is>', re.S)
+TEXT_RE = re.compile(r'<t\b[^>]*?(?:/>|>(.*?)</t>)', re.S)
+PHONETIC_RE = re.compile(r'<rPh\b.*?</rPh>', re.S)
+DIMENSION_RE = re.compile(r'(<dimension\b[^>]*?\bref\s*=\s*["\'][A-Z]+\d+:[A-Z]+)(\d+)')
+MERGE_CELLS_RE = re.compile(r'<mergeCells\b[^>]*?(?:/>|>.*?</mergeCells>)', re.S)
+MERGE_CELL_RE = re.compile(r'<mergeCell\b[^>]*?\bref\s*=\s*["\']([^"\']+)["\']')
+
+CHUNK_SIZE = 1 << 20
+
+# 日期等转换规则复杂的值：只需要知道它非空
+NON_TEXT = object()
+
+
+class UnsupportedSheet(Exception):
+    """sheet使用了XML快速路径无法处理的特性，需要回退到完整加载引擎"""
+
+
+class XmlRow(object):
+    """
+    sheet XML中的一个<row>元素
+
+    Attributes:
+        number: 行号
+        attrs: <row>开始标签中的属性文本
+        cells: 单元格列表，每项为(列号, <c>属性文本, <c>属性之后的原文, 属性字典, 内容)
+    """
+
+    __slots__ = ('number', 'attrs', 'cells')
+
+    def __init__(self, number, attrs, cells):
+        self.number = number
+        self.attrs = attrs
+        self.cells = cells
+
+
+def resolve_part(base_part, target):
+    """
+    把关系中的Target解析为压缩包内的路径
+
+    Args:
+        base_part: 关系所属部件的路径（如xl/workbook.xml）
+        target: 关系的Target
+
+    Returns:
+        压缩包内的路径
+    """
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+
+def read_rels(zf, part):
+    """
+    读取某个部件的关系表
+
+    Args:
+        zf: 输入压缩包
+        part: 部件路径
+
+    Returns:
+        {关系Id: (Type, Target, TargetMode)}
+    """
+    rels_path = posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+    if rels_path not in zf.namelist():
+        return {}
+    root = parse(zf.open(rels_path)).getroot()
+    return {
+        rel.get('Id'): (rel.get('Type', ''), rel.get('Target', ''), rel.get('TargetMode'))
+        for rel in root.iter(f'{{{PACKAGE_REL_NS}}}Relationship')
+    }
+
+
+def find_active_sheet(zf):
+    """
+    找到openpyxl中wb.active对应的sheet（第一个workbookView的activeTab，默认第一个）
+
+    Args:
+        zf: 输入压缩包
+
+    Returns:
+        (sheet名称, sheet XML路径, {部件类型: 路径})，部件类型为sharedStrings、styles等关系类型的最后一段
+    """
+    workbook_part = None
+    for rel_type, target, _ in read_rels(zf, '').values():
+        if rel_type.endswith('/officeDocument'):
+            workbook_part = resolve_part('', target)
+    if workbook_part is None or workbook_part not in zf.namelist():
+        raise UnsupportedSheet('找不到workbook.xml')
+
+    workbook = parse(zf.open(workbook_part)).getroot()
+    if workbook.tag != f'{{{MAIN_NS}}}workbook':
+        raise UnsupportedSheet('工作簿使用了非标准命名空间')
+
+    active = 0
+    for view in workbook.iter(f'{{{MAIN_NS}}}workbookView'):
+        if view.get('activeTab') is not None:
+            active = int(view.get('activeTab'))
+            break
+    sheets = workbook.findall(f'{{{MAIN_NS}}}sheets/{{{MAIN_NS}}}sheet')
+    if not 0 <= active < len(sheets):
+        raise UnsupportedSheet('找不到活动sheet')
+
+    rels = read_rels(zf, workbook_part)
+    rel_type, target, _ = rels.get(sheets[active].get(f'{{{REL_NS}}}id'), ('', '', None))
+    if not rel_type.endswith('/worksheet'):
+        raise UnsupportedSheet('活动sheet不是普通工作表')
+
+    parts = {rel_type.rsplit('/', 1)[-1]: resolve_part(workbook_part, part_target)
+             for rel_type, part_target, _ in rels.values()}
+    return sheets[active].get('name'), resolve_part(workbook_part, target), parts
+
+
+def check_sheet_rels(zf, sheet_part):
+    """
+    sheet关联了批注、表格、图片等部件时不走快速路径
+
+    Args:
+        zf: 输入压缩包
+        sheet_part: sheet XML路径
+    """
+    for rel_type, _, _ in read_rels(zf, sheet_part).values():
+        for unsupported in UNSUPPORTED_REL_TYPES:
+            if rel_type.endswith(unsupported):
+                raise UnsupportedSheet(f'sheet包含{unsupported[1:]}')
+
+
+def check_features(xml_text):
+    """
+    检查sheet XML片段中是否有快速路径不支持的元素
+
+    Args:
+        xml_text: sheet XML片段（<sheetData>之外的部分）
+    """
+    match = UNSUPPORTED_TAG_RE.search(xml_text)
+    if match:
+        raise UnsupportedSheet(f'sheet包含{match.group(1) or match.group(2)}')
+
+
+def read_shared_strings(zf, strings_part):
+    """
+    读取共享字符串表（与openpyxl相同：纯文本加所有文本段，不含注音）
+
+    Args:
+        zf: 输入压缩包
+        strings_part: 共享字符串表路径（None表示没有）
+
+    Returns:
+        字符串列表
+    """
+    if strings_part is None or strings_part not in zf.namelist():
+        return []
+
+    si_tag = f'{{{MAIN_NS}}}si'
+    t_tag = f'{{{MAIN_NS}}}t'
+    r_tag = f'{{{MAIN_NS}}}r'
+    strings = []
+    for _, node in iterparse(zf.open(strings_part)):
+        if node.tag != si_tag:
+            continue
+        parts = []
+        plain = node.find(t_tag)
+        if plain is not None and plain.text:
+            parts.append(plain.text)
+        for run in node.findall(r_tag):
+            text = run.find(t_tag)
+            if text is not None and text.text:
+                parts.append(text.text)
+        strings.append(''.join(parts).replace('x005F_', ''))
+        node.clear()
+    return strings
+
+
+def read_sheet_tail(zf, sheet_part):
+    """
+    第一遍：只解压不解析，取出</sheetData>之后的部分（合并区域等都在这里）
+
+    Args:
+        zf: 输入压缩包
+        sheet_part: sheet XML路径
+
+    Returns:
+        </sheetData>之后的文本（不含</sheetData>）
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    tail = None
+    carry = ''
+    with zf.open(sheet_part) as stream:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            text = decoder.decode(chunk, final=not chunk)
+            if tail is not None:
+                tail.append(text)
+            else:
+                text = carry + text
+                idx = text.find(SHEET_DATA_END)
+                if idx >= 0:
+                    tail = [text[idx + len(SHEET_DATA_END):]]
+                else:
+                    carry = text[-len(SHEET_DATA_END):]
+            if not chunk:
+                break
+    if tail is None:
+        raise UnsupportedSheet('sheet没有数据区')
+    return ''.join(tail)
+
+
+def iter_sheet_xml(zf, sheet_part):
+    """
+    第二遍：流式切分sheet XML
+
+    Args:
+        zf: 输入压缩包
+        sheet_part: sheet XML路径
+
+    Yields:
+        ('prefix', <sheetData>及之前的文本)，然后每行一个('row', 属性文本, 行内容)，
+        最后('suffix', </sheetData>及之后的文本)
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with zf.open(sheet_part) as stream:
+        buf = ''
+        eof = False
+
+        def read_more():
+            chunk = stream.read(CHUNK_SIZE)
+            return decoder.decode(chunk, final=not chunk), not chunk
+
+        while True:
+            match = SHEET_DATA_RE.search(buf)
+            if match or eof:
+                break
+            text, eof = read_more()
+            buf += text
+        if not match or match.group(1):
+            raise UnsupportedSheet('sheet没有数据区')
+        yield ('prefix', buf[:match.end()])
+
+        pos = match.end()
+        while True:
+            match = ROW_RE.match(buf, pos)
+            if match and (match.end() < len(buf) or eof):
+                yield ('row', match.group(1), match.group(2) or '')
+                pos = match.end()
+                continue
+
+            rest = buf[pos:].lstrip()
+            if rest.startswith(SHEET_DATA_END):
+                break
+            if eof:
+                raise UnsupportedSheet('无法解析的行数据')
+            text, eof = read_more()
+            buf = buf[pos:] + text
+            pos = 0
+
+        tail = [buf[pos:]]
+        while not eof:
+            text, eof = read_more()
+            tail.append(text)
+        yield ('suffix', ''.join(tail))
+
+
+def parse_row(attrs_text, body):
+    """
+    解析<row>元素
+
+    Args:
+        attrs_text: <row>开始标签中的属性文本
+        body: <row>的内容
+
+    Returns:
+        XmlRow对象
+    """
+    match = ROW_NUMBER_RE.search(attrs_text)
+    if not match:
+        raise UnsupportedSheet('行缺少行号')
+
+    cells = []
+    for cell_match in CELL_RE.finditer(body):
+        cell_attrs = cell_match.group(1)
+        content = cell_match.group(3) or ''
+        if '<f' in content:
+            raise UnsupportedSheet('sheet包含公式')
+        attrs = {name: double if double is not None else single
+                 for name, double, single in ATTR_RE.findall(cell_attrs)}
+        ref = attrs.get('r')
+        if not ref:
+            raise UnsupportedSheet('单元格缺少坐标')
+        letters = ref.rstrip('0123456789')
+        col = column_index_from_string(letters)
+        cells.append((col, cell_attrs, cell_match.group(0)[2 + len(cell_attrs):], attrs, content))
+    return XmlRow(int(match.group(2)), attrs_text, cells)
+
+
+def inline_text(content):
+    """
+    内联字符串的文本（与openpyxl相同：纯文本加所有文本段，不含注音）
+
+    Args:
+        content: <c>的内容
+
+    Returns:
+        文本；没有<is>元素时返回None
+    """
+    match = INLINE_RE.search(content)
+    if match is None:
+        return None
+    body = PHONETIC_RE.sub('', match.group(1))
+    return ''.join(html.unescape(text or '') for text in TEXT_RE.findall(body))
+
+
+def read_date_styles(zf, styles_part):
+    """
+    找出数字格式为日期/时间的单元格样式（openpyxl会把这些数字读成datetime）
+
+    Args:
+        zf: 输入压缩包
+        styles_part: 样式表路径（None表示没有）
+
+    Returns:
+        样式编号（<c>的s属性）集合
+    """
+    if styles_part is None or styles_part not in zf.namelist():
+        return set()
+    root = parse(zf.open(styles_part)).getroot()
+    formats = dict(BUILTIN_FORMATS)
+    for fmt in root.iter(f'{{{MAIN_NS}}}numFmt'):
+        formats[int(fmt.get('numFmtId'))] = fmt.get('formatCode', '')
+    cell_xfs = root.find(f'{{{MAIN_NS}}}cellXfs')
+    if cell_xfs is None:
+        return set()
+    return {
+        str(idx) for idx, xf in enumerate(cell_xfs.findall(f'{{{MAIN_NS}}}xf'))
+        if is_date_format(formats.get(int(xf.get('numFmtId', 0)), ''))
+    }
+
+
+def cell_value(attrs, content, shared_strings, date_styles):
+    """
+    单元格的值（与openpyxl以data_only读取时一致）
+
+    Args:
+        attrs: <c>属性字典
+        content: <c>的内容
+        shared_strings: 共享字符串列表
+        date_styles: read_date_styles()的返回值
+
+    Returns:
+        单元格值；空单元格返回None；日期时间返回NON_TEXT
+    """
+    data_type = attrs.get('t', 'n')
+    if data_type == 'inlineStr':
+        return inline_text(content)
+
+    match = VALUE_RE.search(content)
+    raw = match.group(1) if match else None
+    if not raw:
+        return None
+    if data_type == 's':
+        return shared_strings[int(raw)]
+    if data_type in ('str', 'e'):
+        return html.unescape(raw)
+    if data_type == 'b':
+        return bool(int(raw))
+    if data_type == 'n' and attrs.get('s', '0') not in date_styles:
+        if '.' in raw or 'E' in raw or 'e' in raw:
+            return float(raw)
+        return int(raw)
+    return NON_TEXT
+
+
+def is_value_empty(value):
+    """单元格值是否为空（同is_row_empty对单个值的判断）"""
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def build_covered_index(ranges):
+    """
+    建立合并区域的索引，用于判断单元格是否被合并覆盖（合并区域中除左上角外的单元格）
+
+    Args:
+        ranges: 合并区域列表，每项为(min_col, min_row, max_col, max_row)
+
+    Returns:
+        {列号: (起始行列表, 区间列表)}，区间按起始行排序
+    """
+    by_col = {}
+    for min_col, min_row, max_col, max_row in ranges:
+        for col in range(min_col, max_col + 1):
+            by_col.setdefault(col, []).append((min_row, max_row, min_col))
+    index = {}
+    for col, spans in by_col.items():
+        spans.sort()
+        index[col] = ([span[0] for span in spans], spans)
+    return index
+
+
+def is_covered(index, row, col):
+    """
+    单元格是否被合并覆盖（openpyxl中为MergedCell，值为None）
+
+    Args:
+        index: build_covered_index()的返回值
+        row: 行号
+        col: 列号
+
+    Returns:
+        被覆盖返回True
+    """
+    entry = index.get(col)
+    if entry is None:
+        return False
+    starts, spans = entry
+    pos = bisect_right(starts, row) - 1
+    if pos < 0:
+        return False
+    min_row, max_row, min_col = spans[pos]
+    return row <= max_row and not (row == min_row and col == min_col)
+
+
+def render_cell(col, row_number, value, cell_attrs):
+    """
+    生成重写后的<c>元素，只保留原单元格的样式
+
+    Args:
+        col: 列号
+        row_number: 新行号
+        value: 新值（None表示清空）
+        cell_attrs: 原单元格属性字典（没有原单元格时为None）
+
+    Returns:
+        <c>元素文本
+    """
+    style = ''
+    if cell_attrs and cell_attrs.get('s'):
+        style = f' s="{cell_attrs["s"]}"'
+    ref = f'{get_column_letter(col)}{row_number}'
+    if value is None:
+        return f'<c r="{ref}"{style}/>'
+    text = escape(value).replace('\r', '&#13;')
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def render_row(row_number, row, updates):
+    """
+    生成重新编号后的<row>元素：updates中的列重写，其他单元格原样复制
+
+    Args:
+        row_number: 新行号
+        row: XmlRow对象（原XML中不存在的行为None）
+        updates: {列号: 新值}，新值为None表示清空
+
+    Returns:
+        <row>元素文本
+    """
+    renumber = lambda match: match.group(1) + str(row_number)
+    if row is None:
+        attrs = f' r="{row_number}"'
+        cells = []
+    else:
+        attrs = ROW_NUMBER_RE.sub(renumber, row.attrs, count=1)
+        cells = row.cells
+
+    pieces = []
+    pending = dict(updates)
+    for col, cell_attrs, rest, attr_dict, _ in cells:
+        if col in pending:
+            pieces.append((col, render_cell(col, row_number, pending.pop(col), attr_dict)))
+        else:
+            pieces.append((col, '<c' + CELL_REF_RE.sub(renumber, cell_attrs, count=1) + rest))
+
+    inserted = [(col, render_cell(col, row_number, value, None))
+                for col, value in pending.items() if value is not None]
+    if inserted:
+        pieces = sorted(pieces + inserted, key=lambda piece: piece[0])
+        attrs = SPANS_RE.sub('', attrs)
+
+    if not pieces:
+        return f'<row{attrs}/>'
+    return f'<row{attrs}>' + ''.join(text for _, text in pieces) + '</row>'
+
+
+def iter_model_rows(rows, merged_max_row):
+    """
+    按SheetModel的行范围（第2行到openpyxl的max_row）逐行产出，XML中缺失的行补为None
+
+    openpyxl的max_row由单元格和合并区域决定，没有单元格的行要等到后面出现
+    有单元格的行（或合并区域覆盖到）才算在范围内。
+
+    Args:
+        rows: 第2行起的XmlRow迭代器（行号递增）
+        merged_max_row: 合并区域覆盖到的最大行号
+
+    Yields:
+        (行号, XmlRow或None)
+    """
+    next_row = FIRST_DATA_ROW
+    held = []
+    for row in rows:
+        if row.number < next_row:
+            raise UnsupportedSheet('行号未按顺序排列')
+        held.extend((number, None) for number in range(next_row, row.number))
+        held.append((row.number, row))
+        next_row = row.number + 1
+        if row.cells:
+            yield from held
+            held = []
+
+    held.extend((number, None) for number in range(next_row, merged_max_row + 1))
+    for number, row in held:
+        if number <= merged_max_row:
+            yield number, row
+
+
+def iter_rows(parts, suffix):
+    """
+    解析iter_sheet_xml()产出的行，并把</sheetData>之后的文本收集到suffix
+
+    Args:
+        parts: iter_sheet_xml()的生成器（已取出prefix）
+        suffix: 列表，收集尾部文本
+
+    Yields:
+        XmlRow对象
+    """
+    for part in parts:
+        if part[0] == 'row':
+            yield parse_row(part[1], part[2])
+        else:
+            suffix.append(part[1])
+
+
+def remap_merged_ranges(ranges, row_map):
+    """
+    按新行号重新计算合并区域（同flush_sheet：取区域内保留下来的首行和末行）
+
+    Args:
+        ranges: 合并区域列表，每项为(min_col, min_row, max_col, max_row)
+        row_map: 每个数据行的新行号（0表示被删除），row_map[行号 - 2]
+
+    Returns:
+        新的合并区域坐标列表
+    """
+    def new_row_of(row):
+        if row < FIRST_DATA_ROW:
+            return row
+        idx = row - FIRST_DATA_ROW
+        return row_map[idx] if idx < len(row_map) else 0
+
+    refs = []
+    for min_col, min_row, max_col, max_row in ranges:
+        first = next((new_row_of(row) for row in range(min_row, max_row + 1) if new_row_of(row)), 0)
+        if not first:
+            continue
+        last = next(new_row_of(row) for row in range(max_row, min_row - 1, -1) if new_row_of(row))
+        if first == last and min_col == max_col:
+            continue
+        refs.append(f'{get_column_letter(min_col)}{first}:{get_column_letter(max_col)}{last}')
+    return refs
+
+
+def write_package(input_file, output_file, sheet_part, sheet_size, sheet_chunks):
+    """
+    写出新的xlsx：sheet XML替换为新内容，其他成员原样复制；先写临时文件再替换
+
+    Args:
+        input_file: 输入Excel文件路径
+        output_file: 输出Excel文件路径
+        sheet_part: sheet XML路径
+        sheet_size: 新sheet XML的字节数
+        sheet_chunks: 新sheet XML的字节块可迭代对象
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', dir=output_dir)
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(input_file) as zin, zipfile.ZipFile(tmp_path, 'w') as zout:
+            for info in zin.infolist():
+                out_info = zipfile.ZipInfo(info.filename, info.date_time)
+                out_info.compress_type = info.compress_type
+                out_info.external_attr = info.external_attr
+                if info.filename == sheet_part:
+                    out_info.file_size = sheet_size
+                    with zout.open(out_info, 'w') as dst:
+                        for chunk in sheet_chunks:
+                            dst.write(chunk)
+                    continue
+                out_info.file_size = info.file_size
+                with zin.open(info) as src, zout.open(out_info, 'w') as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        replace_output(tmp_path, output_file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def xml_merge_cells(input_file, output_file=None, recorder=None):
+    """
+    直接读写XML合并Excel测试用例单元格（处理逻辑同merge_cells.merge_cells）
+
+    Args:
+        input_file: 输入Excel文件路径
+        output_file: 输出Excel文件路径（如果为None，则覆盖原文件）
+        recorder: Recorder对象（可选）
+
+    Raises:
+        UnsupportedSheet: sheet使用了快速路径无法处理的特性
+    """
+    recorder = recorder or Recorder('merge_cells')
+    if output_file is None:
+        output_file = input_file
+
+    try:
+        zf = zipfile.ZipFile(input_file)
+    except zipfile.BadZipFile:
+        raise UnsupportedSheet('不是xlsx压缩包')
+
+    with zf:
+        with recorder.stage('load', '读取sheet结构、共享字符串和样式'):
+            title, sheet_part, workbook_parts = find_active_sheet(zf)
+            check_sheet_rels(zf, sheet_part)
+
+            # 第一遍只取出合并区域等尾部信息，第二遍逐行处理
+            tail = read_sheet_tail(zf, sheet_part)
+            check_features(tail)
+            ranges = [range_boundaries(ref) for ref in MERGE_CELL_RE.findall(tail)]
+            covered = build_covered_index(ranges)
+            merged_max_row = max([rng[3] for rng in ranges if rng[0] != rng[2] or rng[1] != rng[3]] + [0])
+            shared_strings = read_shared_strings(zf, workbook_parts.get('sharedStrings'))
+            date_styles = read_date_styles(zf, workbook_parts.get('styles'))
+
+            parts = iter_sheet_xml(zf, sheet_part)
+            _, prefix = next(parts)
+            if not WORKSHEET_RE.search(prefix):
+                raise UnsupportedSheet('sheet使用了非标准命名空间')
+            check_features(prefix)
+
+            def value_of(row_number, col, attrs, content):
+                if is_covered(covered, row_number, col):
+                    return None
+                return cell_value(attrs, content, shared_strings, date_styles)
+
+            # 表头行原样保留
+            suffix = []
+            rows = iter_rows(parts, suffix)
+            header_row = next(rows, None)
+            header = []
+            if header_row is not None and header_row.number == 1:
+                for col, _, _, attrs, content in header_row.cells:
+                    value = value_of(1, col, attrs, content)
+                    header.extend([None] * (col - len(header)))
+                    header[col - 1] = value if value is not NON_TEXT else None
+            elif header_row is not None:
+                rows = chain([header_row], rows)
+                header_row = None
+
+        recorder.set(sheet=title)
+        recorder.log(f"处理Sheet: {title}（XML快速路径）")
+        columns = require_columns(tuple(header), recorder)
+        case_name_col = columns['case_name']
+        step_desc_col = columns['step_desc']
+        expected_result_col = columns['expected_result']
+        recorder.log(f"用例名称列: {get_column_letter(case_name_col)} (列{case_name_col})")
+        recorder.log(f"步骤描述列: {get_column_letter(step_desc_col)} (列{step_desc_col})")
+        recorder.log(f"预期结果列: {get_column_letter(expected_result_col)} (列{expected_result_col})")
+        target_cols = (step_desc_col, expected_result_col)
+        for min_col, min_row, max_col, max_row in ranges:
+            if max_row >= FIRST_DATA_ROW and any(min_col <= col <= max_col for col in target_cols):
+                raise UnsupportedSheet('步骤描述/预期结果列有合并单元格')
+
+        with recorder.stage('steps', '步骤1-3（逐行读取、处理、写出）'):
+            stats = {'rows_in': 0, 'rows_out': 0, 'prefixed': 0, 'cases': 0, 'merged': 0, 'deleted': 0}
+            row_map = array('l')
+            out_rows = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+            if header_row is not None:
+                out_rows.write(render_row(1, header_row, {}).encode('utf-8'))
+
+            def target_texts(row_number, row):
+                """步骤描述和预期结果列加#号前缀后的值；未修改的保留原值"""
+                values = {}
+                texts = []
+                cells = {cell[0]: cell for cell in row.cells} if row is not None else {}
+                for col in target_cols:
+                    cell = cells.get(col)
+                    value = value_of(row_number, col, cell[3], cell[4]) if cell else None
+                    if value is NON_TEXT:
+                        raise UnsupportedSheet('步骤描述/预期结果列包含日期时间值')
+                    text = cell_text(value)
+                    new_text = add_hash_prefix(text)
+                    if text is None or new_text != text:
+                        stats['prefixed'] += 1
+                        values[col] = new_text
+                    texts.append(new_text)
+                return values, texts
+
+            def has_other_content(row_number, row):
+                """除步骤描述和预期结果外是否还有非空单元格"""
+                if row is None:
+                    return False
+                for col, _, _, attrs, content in row.cells:
+                    if col in target_cols:
+                        continue
+                    if not is_value_empty(value_of(row_number, col, attrs, content)):
+                        return True
+                return False
+
+            def emit(row, updates):
+                new_row = stats['rows_out'] + FIRST_DATA_ROW
+                row_map.append(new_row)
+                stats['rows_out'] += 1
+                out_rows.write(render_row(new_row, row, updates).encode('utf-8'))
+
+            def flush_block(block):
+                # 加了#号前缀后块内每一行都贡献一个片段，全部拼接到块首行，其余行清空
+                joined = [[], []]
+                for row_number, row in block:
+                    _, texts = target_texts(row_number, row)
+                    joined[0].append(texts[0])
+                    joined[1].append(texts[1])
+                stats['cases'] += 1
+                if len(block) > 1:
+                    stats['merged'] += 1
+                first_number, first_row = block[0]
+                emit(first_row, {step_desc_col: ''.join(joined[0]), expected_result_col: ''.join(joined[1])})
+                for row_number, row in block[1:]:
+                    if has_other_content(row_number, row):
+                        emit(row, {step_desc_col: None, expected_result_col: None})
+                    else:
+                        row_map.append(0)
+                        stats['deleted'] += 1
+
+            block = None
+            for row_number, row in iter_model_rows(rows, merged_max_row):
+                stats['rows_in'] += 1
+                case_cell = None
+                if row is not None:
+                    case_cell = next((cell for cell in row.cells if cell[0] == case_name_col), None)
+                is_case_row = case_cell is not None and not is_value_empty(
+                    value_of(row_number, case_name_col, case_cell[3], case_cell[4]))
+
+                if is_case_row:
+                    if block:
+                        flush_block(block)
+                    block = [(row_number, row)]
+                elif block is not None:
+                    block.append((row_number, row))
+                else:
+                    # 第一个用例名称之前的行：只加#号前缀，不合并，加了前缀后一定非空
+                    values, _ = target_texts(row_number, row)
+                    emit(row, values)
+            if block:
+                flush_block(block)
+
+            # 更新dimension和合并区域
+            last_row = stats['rows_out'] + 1
+            prefix = DIMENSION_RE.sub(lambda match: match.group(1) + str(last_row), prefix, count=1)
+            suffix_text = ''.join(suffix)
+            refs = remap_merged_ranges(ranges, row_map)
+            merge_xml = ''
+            if refs:
+                merge_xml = f'<mergeCells count="{len(refs)}">' + ''.join(
+                    f'<mergeCell ref="{ref}"/>' for ref in refs) + '</mergeCells>'
+            suffix_text = MERGE_CELLS_RE.sub(merge_xml, suffix_text, count=1)
+
+    prefix_bytes = prefix.encode('utf-8')
+    suffix_bytes = suffix_text.encode('utf-8')
+    sheet_size = len(prefix_bytes) + out_rows.tell() + len(suffix_bytes)
+
+    def sheet_chunks():
+        yield prefix_bytes
+        out_rows.seek(0)
+        while True:
+            chunk = out_rows.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        yield suffix_bytes
+
+    recorder.log(f"已为 {stats['prefixed']} 个单元格添加#号前缀")
+    recorder.log(f"找到 {stats['cases']} 个用例名称有值的行，共合并了 {stats['merged']} 组内容")
+    recorder.log(f"删除了 {stats['deleted']} 个空行（初始行数: {stats['rows_in'] + 1}, 最终行数: {last_row}）")
+    recorder.count(rows_before=stats['rows_in'] + 1, rows_after=last_row, columns=len(header),
+                   prefixed=stats['prefixed'], cases=stats['cases'], merged_blocks=stats['merged'],
+                   deleted=stats['deleted'])
+
+    try:
+        with recorder.stage('save', '保存文件'):
+            write_package(input_file, output_file, sheet_part, sheet_size, sheet_chunks())
+        recorder.log(f"\n✅ 处理完成！文件已保存到: {output_file}")
+    except Exception as e:
+        recorder.fail(f"\n❌ 保存文件时出错: {e}")
+    finally:
+        out_rows.close()
@@ -1,27 +1,389 @@
-import pandas as pd
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流式查看Excel文件
+用openpyxl只读模式逐行读取，按块写出，内存占用与文件大小无关。
+可指定行范围、只输出部分列、截断过长的单元格，输出格式为文本（默认）、JSONL或TSV。
+列名、数据形状和数据类型概况不需要读完整个sheet：形状取自sheet的dimension记录，
+数据类型按前几行推断。
+
+用法：
+    python read_excel.py <Excel文件> [<输出文件>] [--rows 2:50] [--columns 用例名称,K]
+                         [--max-width 200] [--format text|jsonl|tsv] [--summary-only]
+"""
+
+import argparse
+import datetime
+import json
 import sys
+import zipfile
+
+from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.exceptions import InvalidFileException
+
+
+DEFAULT_MAX_WIDTH = 200
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_SAMPLE_ROWS = 20
+ELLIPSIS = '…'
+
+
+def parse_row_range(text):
+    """
+    解析行范围（Excel行号，含两端）："2:50"、"100:"、":30"、"7"
+
+    Args:
+        text: 行范围字符串
+
+    Returns:
+        (起始行, 结束行)；结束行为None表示到最后一行
+
+    Raises:
+        ValueError: 格式错误或起始行大于结束行
+    """
+    try:
+        if ':' not in text:
+            row = int(text)
+            return row, row
+        start, end = text.split(':', 1)
+        start, end = (int(start) if start else None), (int(end) if end else None)
+    except ValueError:
+        raise ValueError(f"行范围格式错误: {text}（应为 2:50、100:、:30 或 7）")
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"行范围错误: {text}（起始行大于结束行）")
+    return start, end
+
+
+def resolve_columns(spec, header, n_cols):
+    """
+    解析要输出的列：逗号分隔，每项可以是表头名称、列字母（K）或列号（11，从1开始）；
+    表头名称优先（ID既是表头也是合法的列字母）
+
+    Args:
+        spec: 列选择字符串；为空时选择全部列
+        header: 表头行的值
+        n_cols: sheet的列数
+
+    Returns:
+        列号列表（1-based，按指定顺序）
+    """
+    if not spec:
+        return list(range(1, n_cols + 1))
+
+    names = {}
+    for idx, value in enumerate(header, 1):
+        if value is not None:
+            names.setdefault(str(value).strip(), idx)
+
+    columns = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item in names:
+            col = names[item]
+        elif item.isdigit():
+            col = int(item)
+        elif item.isalpha() and item.isascii() and len(item) <= 3:
+            col = column_index_from_string(item.upper())
+        else:
+            col = 0
+        if not 1 <= col <= n_cols:
+            raise ValueError(f"找不到列: {item}（共{n_cols}列）")
+        columns.append(col)
+    return columns
+
+
+def column_names(header, columns):
+    """选中列的名称：表头为空的列用列字母代替"""
+    names = []
+    for col in columns:
+        value = header[col - 1] if col <= len(header) else None
+        names.append(str(value) if value is not None else get_column_letter(col))
+    return names
+
+
+def format_value(value, max_width):
+    """
+    单元格值转为字符串，超过max_width个字符时截断
+
+    Args:
+        value: 单元格值
+        max_width: 最大字符数，0表示不截断
+
+    Returns:
+        字符串；空单元格返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        text = value.isoformat()
+    else:
+        text = str(value)
+    if max_width and len(text) > max_width:
+        text = text[:max_width] + ELLIPSIS
+    return text
+
+
+def escape(text):
+    """把换行和制表符转义，保证每个单元格、每一行都只占一行"""
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\r', '\\r').replace('\n', '\\n')
+
+
+def type_name(value):
+    """数据类型概况中使用的类型名称"""
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, datetime.datetime):
+        return 'datetime'
+    if isinstance(value, (datetime.date, datetime.time)):
+        return type(value).__name__
+    return 'str'
+
+
+def open_sheet(file_path, sheet=None):
+    """
+    以只读模式打开sheet
+
+    Args:
+        file_path: Excel文件路径
+        sheet: sheet名称，默认第一个sheet
+
+    Returns:
+        (workbook, worksheet)
+
+    Raises:
+        ValueError: 不是有效的xlsx文件，或找不到指定的sheet
+    """
+    try:
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile) as e:
+        raise ValueError(f"无法读取工作簿 {file_path}: {e}")
+    if sheet is None:
+        return wb, wb.worksheets[0]
+    if sheet not in wb.sheetnames:
+        wb.close()
+        raise ValueError(f"找不到sheet: {sheet}（可用: {', '.join(wb.sheetnames)}）")
+    return wb, wb[sheet]
+
+
+def sheet_summary(ws, header_row=1, sample_rows=DEFAULT_SAMPLE_ROWS):
+    """
+    表头、形状和数据类型概况：形状取自dimension记录（没有记录时才逐行统计），
+    数据类型按表头下面的前sample_rows行推断
+
+    Args:
+        ws: 只读worksheet
+        header_row: 表头所在行
+        sample_rows: 推断数据类型使用的行数
+
+    Returns:
+        字典：header、rows（数据行数）、columns、dimension、dimension_source、dtypes
+    """
+    if ws.max_row is None or ws.max_column is None:
+        ws.calculate_dimension(force=True)
+        source = 'scan'
+    else:
+        source = 'dimension'
+
+    header = next(ws.iter_rows(min_row=header_row, max_row=header_row, values_only=True), ())
+    header = tuple(header)
+    while header and header[-1] is None:
+        header = header[:-1]
+    n_cols = max(len(header), ws.max_column or 0)
+
+    types = [set() for _ in range(n_cols)]
+    if sample_rows:
+        for values in ws.iter_rows(min_row=header_row + 1, max_row=header_row + sample_rows,
+                                   max_col=n_cols, values_only=True):
+            for idx, value in enumerate(values):
+                if value is not None:
+                    types[idx].add(type_name(value))
+
+    names = column_names(header, range(1, n_cols + 1))
+    return {
+        'header': list(header),
+        'rows': max((ws.max_row or header_row) - header_row, 0),
+        'columns': n_cols,
+        'dimension': ws.calculate_dimension() if ws.max_row else None,
+        'dimension_source': source,
+        'dtypes': {name: '/'.join(sorted(found)) or 'empty' for name, found in zip(names, types)},
+    }
+
+
+def iter_selected_rows(ws, columns, start_row, end_row):
+    """
+    逐行产生选中列的值
+
+    Args:
+        ws: 只读worksheet
+        columns: 列号列表（1-based）
+        start_row: 起始行号
+        end_row: 结束行号（None表示到最后一行）
+
+    Yields:
+        (行号, 选中列的值tuple)
+    """
+    min_col, max_col = min(columns), max(columns)
+    offsets = [col - min_col for col in columns]
+    width = max_col - min_col + 1
+    for row_idx, values in enumerate(ws.iter_rows(min_row=start_row, max_row=end_row,
+                                                  min_col=min_col, max_col=max_col,
+                                                  values_only=True), start_row):
+        if len(values) < width:
+            values = tuple(values) + (None,) * (width - len(values))
+        yield row_idx, tuple(values[offset] for offset in offsets)
+
+
+def render_summary(summary, sample_rows):
+    """文本格式的概况部分"""
+    lines = ['=== 列名 ===', str(summary['header']), '']
+    lines.append('=== 数据形状 ===')
+    source = '（dimension记录）' if summary['dimension_source'] == 'dimension' else '（逐行统计）'
+    lines.append(f"行数: {summary['rows']}, 列数: {summary['columns']}{source}")
+    lines.append('')
+    lines.append(f'=== 数据类型（按前{sample_rows}行推断）===')
+    width = max((len(name) for name in summary['dtypes']), default=0)
+    for name, dtype in summary['dtypes'].items():
+        lines.append(f'{name:<{width}}  {dtype}')
+    lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def render_row(fmt, row_idx, names, values, max_width):
+    """
+    把一行转为输出格式
+
+    Args:
+        fmt: 'text'、'jsonl' 或 'tsv'
+        row_idx: Excel行号
+        names: 选中列的名称
+        values: 选中列的值
+        max_width: 单元格最大字符数
+
+    Returns:
+        以换行结尾的字符串
+    """
+    cells = [format_value(value, max_width) for value in values]
+    if fmt == 'jsonl':
+        record = {'行号': row_idx}
+        record.update(zip(names, cells))
+        return json.dumps(record, ensure_ascii=False) + '\n'
+    if fmt == 'tsv':
+        return '\t'.join([str(row_idx)] + ['' if cell is None else escape(cell) for cell in cells]) + '\n'
+    lines = [f'行{row_idx}:']
+    for name, cell in zip(names, cells):
+        if cell is not None:
+            lines.append(f'  {name}: {escape(cell)}')
+    return '\n'.join(lines) + '\n'
+
+
+def dump_excel(file_path, out, sheet=None, rows=None, columns=None, max_width=DEFAULT_MAX_WIDTH,
+               fmt='text', summary_only=False, header_row=1, sample_rows=DEFAULT_SAMPLE_ROWS,
+               chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    流式输出Excel内容
+
+    Args:
+        file_path: Excel文件路径
+        out: 可写的文本文件对象
+        sheet: sheet名称，默认第一个sheet
+        rows: 行范围字符串（Excel行号，如"2:50"），默认表头之后的所有行
+        columns: 列选择字符串（表头名称/列字母/列号，逗号分隔），默认全部列
+        max_width: 单元格最大字符数，0表示不截断
+        fmt: 'text'（概况+逐行）、'jsonl'（每行一个JSON对象）或 'tsv'（第一行为表头）
+        summary_only: 只输出列名、形状和数据类型概况（jsonl/tsv格式下输出一个JSON对象）
+        header_row: 表头所在行
+        sample_rows: 推断数据类型使用的行数
+        chunk_size: 每攒够多少行写出一次
+
+    Returns:
+        输出的数据行数
+    """
+    wb, ws = open_sheet(file_path, sheet)
+    try:
+        if summary_only or fmt == 'text':
+            summary = sheet_summary(ws, header_row, sample_rows)
+            if summary_only:
+                if fmt == 'text':
+                    out.write(render_summary(summary, sample_rows))
+                else:
+                    out.write(json.dumps(summary, ensure_ascii=False, default=str) + '\n')
+                return 0
+            header = tuple(summary['header'])
+            n_cols = summary['columns']
+        else:
+            header = tuple(next(ws.iter_rows(min_row=header_row, max_row=header_row, values_only=True), ()))
+            n_cols = max(len(header), ws.max_column or 0)
+
+        selected = resolve_columns(columns, header, n_cols)
+        start_row, end_row = parse_row_range(rows) if rows else (None, None)
+        start_row = max(start_row or header_row + 1, 1)
+        if not selected:
+            return 0
+        names = column_names(header, selected)
+
+        if fmt == 'text':
+            out.write(render_summary(summary, sample_rows))
+            end_text = end_row if end_row is not None else '末行'
+            out.write(f'=== 数据（第{start_row}-{end_text}行，{len(names)}列）===\n')
+        elif fmt == 'tsv':
+            out.write('\t'.join(['行号'] + [escape(name) for name in names]) + '\n')
 
-# 读取测试用例
-file_path = sys.argv[1]
-output_file = sys.argv[2]
+        count = 0
+        buffer = []
+        for row_idx, values in iter_selected_rows(ws, selected, start_row, end_row):
+            buffer.append(render_row(fmt, row_idx, names, values, max_width))
+            count += 1
+            if len(buffer) >= chunk_size:
+                out.write(''.join(buffer))
+                buffer.clear()
+        out.write(''.join(buffer))
+        return count
+    finally:
+        wb.close()
 
-df = pd.read_excel(file_path)
 
-with open(output_file, 'w', encoding='utf-8') as f:
-    f.write('=== 列名 ===\n')
-    f.write(str(df.columns.tolist()))
-    f.write('\n\n')
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='流式查看Excel文件：按行范围/列选择输出，内存占用与文件大小无关')
+    parser.add_argument('file_path', help='Excel文件路径')
+    parser.add_argument('output_file', nargs='?', default=None, help='输出文件路径（默认输出到标准输出）')
+    parser.add_argument('--sheet', default=None, help='sheet名称（默认第一个sheet）')
+    parser.add_argument('--rows', default=None,
+                        help='行范围，Excel行号，含两端：2:50、100:、:30（默认表头之后的所有行）')
+    parser.add_argument('--columns', default=None,
+                        help='只输出这些列，逗号分隔，可用表头名称、列字母或列号：用例名称,K,12')
+    parser.add_argument('--max-width', type=int, default=DEFAULT_MAX_WIDTH,
+                        help=f'每个单元格最多输出的字符数，超出部分截断，0表示不截断（默认{DEFAULT_MAX_WIDTH}）')
+    parser.add_argument('--format', dest='fmt', choices=['text', 'jsonl', 'tsv'], default='text',
+                        help='输出格式：text（概况+逐行，跳过空单元格）、jsonl（每行一个JSON对象）、tsv（默认text）')
+    parser.add_argument('--summary-only', action='store_true', help='只输出列名、数据形状和数据类型概况，不读取数据行')
+    parser.add_argument('--header-row', type=int, default=1, help='表头所在行（默认1）')
+    parser.add_argument('--sample', type=int, default=DEFAULT_SAMPLE_ROWS,
+                        help=f'推断数据类型使用的行数（默认{DEFAULT_SAMPLE_ROWS}）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'每攒够多少行写出一次（默认{DEFAULT_CHUNK_SIZE}）')
 
-    f.write('=== 数据形状 ===\n')
-    f.write(f'行数: {df.shape[0]}, 列数: {df.shape[1]}\n\n')
+    args = parser.parse_args()
 
-    f.write('=== 前20行数据 ===\n')
-    f.write(df.head(20).to_string())
-    f.write('\n\n')
+    try:
+        if args.output_file:
+            with open(args.output_file, 'w', encoding='utf-8') as f:
+                dump_excel(args.file_path, f, args.sheet, args.rows, args.columns, args.max_width, args.fmt,
+                           args.summary_only, args.header_row, args.sample, args.chunk_size)
+        else:
+            dump_excel(args.file_path, sys.stdout, args.sheet, args.rows, args.columns, args.max_width, args.fmt,
+                       args.summary_only, args.header_row, args.sample, args.chunk_size)
+    except (OSError, ValueError) as e:
+        print(f'错误: {e}', file=sys.stderr)
+        sys.exit(1)
 
-    f.write('=== 数据类型 ===\n')
-    f.write(str(df.dtypes))
-    f.write('\n\n')
 
-    f.write('=== 所有数据 ===\n')
-    f.write(df.to_string())
+if __name__ == "__main__":
+    main()